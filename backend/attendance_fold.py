@@ -0,0 +1,228 @@
+"""
+Folds per-student attendance rows (the `attendance` table used before
+revision 0003) into sessions and exception rows (models.AttendanceSession,
+models.AttendanceException).
+
+Each (class, subject, date) becomes one session. Its filled_through is the
+longest run of the class's students, in id order, that all have a record,
+so every Present record in that run is implied by the session; all other
+records are kept as exception rows. Sessions written by auto-present cover
+the whole class and keep only their absentees. Duplicate rows for a cell keep
+the latest (highest id), and statuses are encoded from their names
+(attendance_status.encode). Statuses it does not know are kept as written in
+status_text next to their OTHER code.
+
+Used by migration 0003 and by snapshot restores of older snapshots. The
+rows are streamed in session order through one server-side cursor and each
+session is folded as soon as its last row is read, so memory holds one
+session, its class's roster and a batch of rows to insert.
+
+filled_through is an enrollment version (models.AttendanceSession), so the
+students must be stamped first: stamp_enrollments numbers each class's
+students in id order, the order they were added in before versions existed.
+
+Migration 0003 keeps the folded rows, renamed to attendance_legacy. Once the
+app has been checked on the sessions, this compares every legacy cell with
+what the sessions record for it and, with --drop, drops the table if they
+all match. Cells marked again since the migration differ, so run it soon
+after upgrading:
+
+    python attendance_fold.py [--drop]
+"""
+import argparse
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import (
+    Column, Date, Integer, MetaData, String, Table, and_, case, func, insert, inspect, select, update
+)
+
+import attendance_status
+import models
+from bulk_attendance import dialect_insert
+
+BATCH_SIZE = 5000
+
+LEGACY_TABLE = Table(
+    "attendance", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("date", Date),
+    Column("status", String(10)),
+    Column("student_id", Integer),
+    Column("class_id", Integer),
+    Column("subject_id", Integer),
+)
+# Where migration 0003 keeps the folded rows until they are verified
+KEPT_TABLE = LEGACY_TABLE.to_metadata(MetaData(), name="attendance_legacy")
+
+Cells = Dict[int, Tuple[int, Optional[str]]]
+
+
+def _insert(conn, table, rows: list) -> None:
+    for i in range(0, len(rows), BATCH_SIZE):
+        conn.execute(insert(table), rows[i:i + BATCH_SIZE])
+
+
+def _sessions(conn, att: Table = LEGACY_TABLE) -> Iterator[Tuple[tuple, Cells, int]]:
+    """
+    Yields ((class_id, subject_id, date), {student_id: (code, text)}, legacy
+    rows) for every session, in key order, reading one batch of rows at a time.
+    """
+    student = models.Student
+    rows = conn.execute(
+        select(student.class_id, att.c.subject_id, att.c.date, att.c.student_id, att.c.status)
+        # By the student's class, like the registers
+        .join(student, student.id == att.c.student_id)
+        .where(student.class_id.is_not(None))
+        # In id order within a session, so the latest duplicate wins
+        .order_by(student.class_id, att.c.subject_id, att.c.date, att.c.id),
+        execution_options={"yield_per": BATCH_SIZE}
+    )
+    for key, group in groupby(rows, key=itemgetter(0, 1, 2)):
+        recorded, count = {}, 0
+        for *_, student_id, status in group:
+            code = attendance_status.encode(status)
+            recorded[student_id] = (code, status if code == attendance_status.OTHER else None)
+            count += 1
+        yield key, recorded, count
+
+
+def _roster(conn, class_id: int) -> list:
+    """(student id, enrolled_version) rows of a class, in enrollment order."""
+    student = models.Student
+    return conn.execute(
+        select(student.id, student.enrolled_version)
+        .where(student.class_id == class_id)
+        .order_by(student.enrolled_version, student.id)
+    ).all()
+
+
+def _flush(conn, sessions: list, exceptions: list, totals: list) -> None:
+    """Inserts and empties the pending rows, counting them in totals."""
+    _insert(conn, models.AttendanceSession.__table__, sessions)
+    _insert(conn, models.AttendanceException.__table__, exceptions)
+    totals[1] += len(sessions)
+    totals[2] += len(exceptions)
+    sessions.clear()
+    exceptions.clear()
+
+
+def fold(conn) -> Tuple[int, int, int]:
+    """
+    Folds every row of the legacy table on `conn`, which must have stamped
+    students and no sessions yet. Returns (legacy rows, sessions, exceptions).
+    """
+    sessions, exceptions = [], []
+    totals = [0, 0, 0]
+    roster_class, roster = None, []
+    for (class_id, subject_id, day), recorded, rows in _sessions(conn):
+        if class_id != roster_class:
+            roster_class, roster = class_id, _roster(conn, class_id)
+        filled_through, covered = None, set()
+        for student_id, version in roster:
+            if student_id not in recorded:
+                break
+            filled_through = version
+            covered.add(student_id)
+        sessions.append({"class_id": class_id, "subject_id": subject_id, "date": day, "filled_through": filled_through})
+        exceptions += [
+            {"class_id": class_id, "subject_id": subject_id, "date": day, "student_id": student_id,
+             "status_code": code, "status_text": text}
+            for student_id, (code, text) in recorded.items()
+            if code != attendance_status.PRESENT or student_id not in covered
+        ]
+        totals[0] += rows
+        if len(sessions) >= BATCH_SIZE or len(exceptions) >= BATCH_SIZE:
+            _flush(conn, sessions, exceptions, totals)
+    _flush(conn, sessions, exceptions, totals)
+    rows, sessions, exceptions = totals
+    print(f"Folded {rows} attendance rows into {sessions} sessions and {exceptions} exception rows.")
+    return rows, sessions, exceptions
+
+
+def _stored(conn) -> Iterator[Tuple[tuple, Optional[int], Cells]]:
+    """Yields ((class_id, subject_id, date), filled_through, exceptions) for every session, in key order."""
+    sess, exc = models.AttendanceSession, models.AttendanceException
+    rows = conn.execute(
+        select(sess.class_id, sess.subject_id, sess.date, sess.filled_through,
+               exc.student_id, exc.status_code, exc.status_text)
+        .outerjoin(exc, and_(exc.class_id == sess.class_id, exc.subject_id == sess.subject_id, exc.date == sess.date))
+        .order_by(sess.class_id, sess.subject_id, sess.date),
+        execution_options={"yield_per": BATCH_SIZE}
+    )
+    for key, group in groupby(rows, key=itemgetter(0, 1, 2)):
+        group = list(group)
+        yield key, group[0][3], {
+            student_id: (code, text) for *_, student_id, code, text in group if student_id is not None
+        }
+
+
+def verify(conn) -> int:
+    """
+    Compares every cell of attendance_legacy with the status the sessions
+    give that student, walking both in session order. Returns the number of
+    cells that differ, after printing the sessions they are in.
+    """
+    present = (attendance_status.PRESENT, None)
+    stored = _stored(conn)
+    current = next(stored, None)
+    roster_class, enrolled = None, {}
+    differ = 0
+    for key, recorded, _ in _sessions(conn, KEPT_TABLE):
+        while current is not None and current[0] < key:
+            current = next(stored, None)
+        filled_through, marked = current[1:] if current is not None and current[0] == key else (None, {})
+        if key[0] != roster_class:
+            roster_class, enrolled = key[0], dict(_roster(conn, key[0]))
+        wrong = [
+            student_id for student_id, cell in recorded.items()
+            if marked.get(student_id, present if filled_through is not None
+                          and enrolled[student_id] <= filled_through else None) != cell
+        ]
+        if wrong:
+            print(f"Class {key[0]}, subject {key[1]}, {key[2]}: {len(wrong)} of {len(recorded)} cells differ")
+            differ += len(wrong)
+    return differ
+
+
+def stamp_enrollments(conn) -> None:
+    """
+    Numbers each class's students 1..N in id order (enrolled_version) and
+    raises each class's data version to at least N, so students added later
+    are stamped after all of them.
+    """
+    students, versions = models.Student.__table__, models.ClassDataVersion.__table__
+    earlier = students.alias()
+    conn.execute(update(students).values(enrolled_version=select(func.count()).where(
+        earlier.c.class_id == students.c.class_id, earlier.c.id <= students.c.id
+    ).scalar_subquery()))
+    stmt = dialect_insert(conn.dialect.name)(versions).from_select(
+        ["class_id", "version"],
+        select(students.c.class_id, func.count())
+        .where(students.c.class_id.is_not(None))
+        .group_by(students.c.class_id)
+    )
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=["class_id"],
+        set_={"version": case((versions.c.version < stmt.excluded.version, stmt.excluded.version),
+                              else_=versions.c.version)}
+    ))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--drop", action="store_true", help="drop attendance_legacy if every cell matches")
+    args = arg_parser.parse_args()
+
+    from database import engine
+    with engine.begin() as conn:
+        if not inspect(conn).has_table(KEPT_TABLE.name):
+            raise SystemExit(f"There is no {KEPT_TABLE.name} table.")
+        differ = verify(conn)
+        if differ:
+            raise SystemExit(f"{differ} legacy cells differ from the sessions; {KEPT_TABLE.name} is kept.")
+        print("Every legacy cell matches the sessions.")
+        if args.drop:
+            KEPT_TABLE.drop(conn)
+            print(f"Dropped {KEPT_TABLE.name}.")
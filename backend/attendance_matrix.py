@@ -0,0 +1,262 @@
+"""
+In-process attendance registers for the sheet, subject stats and chat queries.
+
+Each (class, subject) register is a students x dates uint8 matrix with one
+status code per cell, expanded from the sessions and their exception rows
+(bulk_attendance.py) with two queries and answered with NumPy instead of
+per-record ORM objects. Registers are tagged with the class data version
+(data_version.py) they were loaded at. Every read checks it with a primary-key
+lookup and reloads on mismatch, so writes made by other workers or tools that
+bump the version are never served stale.
+
+Writes made by this process patch the cached register after their commit
+(on_commit), provided the version advanced by exactly that write. Cells of
+a day the register already has are patched in place, so a write costs its
+own cells rather than a copy of the matrix; a reader running meanwhile may
+see part of that committed write, never anything uncommitted. Only the first
+write of a new day copies the register, to insert its column, so readers
+never see days and cells of different shapes. The least recently used
+registers are evicted once the cache exceeds ATTENDANCE_MATRIX_BUDGET_MB.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import attendance_status
+import models
+from attendance_status import PRESENT, ABSENT, OD, OTHER
+
+ATTENDANCE_MATRIX_BUDGET = int(float(os.getenv("ATTENDANCE_MATRIX_BUDGET_MB", "64")) * 1024 * 1024)
+
+# Cells hold attendance_status codes; 0 means no record for that student and day
+NONE = 0
+# Letters shown in the attendance sheet, indexed by cell code
+SHEET_LETTERS = np.array(["-", "P", "A", "O", "-", "-"], dtype=object)
+
+
+class Register:
+    def __init__(self, version: int, student_ids: np.ndarray, names: List[str], rolls: List[str],
+                 days: np.ndarray, codes: np.ndarray):
+        self.version = version
+        self.student_ids = student_ids      # int64, ordered by roll number
+        self.names = names
+        self.rolls = rolls
+        self.days = days                    # int64 date ordinals, ascending
+        self.codes = codes                  # uint8, students x days
+        self.row_of = {sid: i for i, sid in enumerate(student_ids.tolist())}
+
+    @classmethod
+    def build(cls, version: int, students, cells) -> "Register":
+        """
+        `students` are (id, name, roll_number, enrolled_version) rows. `cells`
+        are (date, filled_through, student_id, status_code) rows: every
+        session, joined with its exceptions (student_id None when it has none).
+        """
+        student_ids = np.array([s[0] for s in students], dtype=np.int64)
+        enrolled = np.array([s[3] for s in students], dtype=np.int64)
+        days = np.array(sorted({d.toordinal() for d, _, _, _ in cells}), dtype=np.int64)
+        codes = np.zeros((len(students), len(days)), dtype=np.uint8)
+        register = cls(version, student_ids, [s[1] for s in students], [s[2] for s in students], days, codes)
+        if cells:
+            # Filled sessions first, one assignment per distinct filled_through
+            filled = {}
+            for day, filled_through, _, _ in cells:
+                if filled_through is not None:
+                    filled.setdefault(filled_through, set()).add(day.toordinal())
+            for filled_through, ordinals in filled.items():
+                cols = np.searchsorted(days, sorted(ordinals))
+                codes[np.ix_(enrolled <= filled_through, cols)] = PRESENT
+            # Then the exceptions over them
+            rows, cols, values = [], [], []
+            for day, _, student_id, code in cells:
+                row = register.row_of.get(student_id) if student_id is not None else None
+                if row is not None:
+                    rows.append(row)
+                    cols.append(day.toordinal())
+                    values.append(code or OTHER)
+            if rows:
+                codes[rows, np.searchsorted(days, cols)] = values
+        return register
+
+    @property
+    def nbytes(self) -> int:
+        strings = sum(len(n or "") + len(r or "") for n, r in zip(self.names, self.rolls))
+        return self.codes.nbytes + self.student_ids.nbytes + self.days.nbytes + strings + 100 * len(self.names)
+
+    def _columns(self, start: Optional[date] = None, end: Optional[date] = None) -> slice:
+        lo = np.searchsorted(self.days, start.toordinal()) if start else 0
+        hi = np.searchsorted(self.days, end.toordinal(), side="right") if end else len(self.days)
+        return slice(lo, hi)
+
+    # --- QUERIES ---
+    def sheet(self) -> dict:
+        """Register grid: every student against every date with at least one record."""
+        dates = [date.fromordinal(d).isoformat() for d in self.days.tolist()]
+        letters = SHEET_LETTERS[self.codes].tolist()
+        return {
+            "dates": dates,
+            "students": [
+                {"id": sid, "name": name, "roll": roll, "attendance": dict(zip(dates, row))}
+                for sid, name, roll, row in zip(self.student_ids.tolist(), self.names, self.rolls, letters)
+            ]
+        }
+
+    def student_stats(self, start: Optional[date] = None, end: Optional[date] = None) -> List[dict]:
+        """Present/OD and Absent counts and percentage per student over the sessions in [start, end]."""
+        codes = self.codes[:, self._columns(start, end)]
+        working_days = codes.shape[1]
+        present = np.count_nonzero((codes == PRESENT) | (codes == OD), axis=1)
+        absent = np.count_nonzero(codes == ABSENT, axis=1)
+        percent = np.round(present / working_days * 100, 1) if working_days else np.zeros(len(present))
+        return [
+            {
+                "roll_number": roll,
+                "name": name,
+                "present_count": p,
+                "absent_count": a,
+                "attendance_percentage": pct if working_days else 0
+            }
+            for roll, name, p, a, pct in zip(self.rolls, self.names, present.tolist(), absent.tolist(), percent.tolist())
+        ]
+
+    def names_with_status(self, day: date, status: str) -> List[str]:
+        col = np.searchsorted(self.days, day.toordinal())
+        if col == len(self.days) or self.days[col] != day.toordinal():
+            return []
+        return [self.names[i] for i in np.flatnonzero(self.codes[:, col] == attendance_status.encode(status)).tolist()]
+
+    # --- PATCHES ---
+    def _write(self, codes: np.ndarray, col: int, statuses: Dict[int, str], fill_present: bool) -> None:
+        for student_id, status in statuses.items():
+            row = self.row_of.get(student_id)
+            if row is not None:
+                codes[row, col] = attendance_status.encode(status)
+        if fill_present:
+            column = codes[:, col]
+            column[column == NONE] = PRESENT
+
+    def patch(self, version: int, day: date, statuses: Dict[int, str], fill_present: bool) -> bool:
+        """
+        Writes `statuses` on `day` and, if fill_present, every empty cell of
+        that day Present, in place, and moves the register to `version`.
+        Returns False, changing nothing, when `day` has no column yet.
+        """
+        col = np.searchsorted(self.days, day.toordinal())
+        if col == len(self.days) or self.days[col] != day.toordinal():
+            return False
+        self._write(self.codes, col, statuses, fill_present)
+        self.version = version
+        return True
+
+    def patched(self, version: int, day: date, statuses: Dict[int, str], fill_present: bool) -> "Register":
+        """Copy with a column inserted for `day`, then patched like patch()."""
+        col = np.searchsorted(self.days, day.toordinal())
+        days = np.insert(self.days, col, day.toordinal())
+        codes = np.insert(self.codes, col, NONE, axis=1)
+        self._write(codes, col, statuses, fill_present)
+        return Register(version, self.student_ids, self.names, self.rolls, days, codes)
+
+
+_registers: "OrderedDict[Tuple[int, int], Register]" = OrderedDict()
+_size = 0
+_lock = threading.Lock()
+
+
+def _version_query(class_id: int):
+    return select(models.ClassDataVersion.version).where(models.ClassDataVersion.class_id == class_id)
+
+
+def _students_query(class_id: int):
+    return (
+        select(models.Student.id, models.Student.name, models.Student.roll_number, models.Student.enrolled_version)
+        .where(models.Student.class_id == class_id)
+        .order_by(models.Student.roll_number)
+    )
+
+
+def _cells_query(class_id: int, subject_id: int):
+    sess, exc = models.AttendanceSession, models.AttendanceException
+    return (
+        select(sess.date, sess.filled_through, exc.student_id, exc.status_code)
+        .outerjoin(exc, and_(exc.class_id == sess.class_id, exc.subject_id == sess.subject_id, exc.date == sess.date))
+        .where(sess.class_id == class_id, sess.subject_id == subject_id)
+    )
+
+
+def _lookup(class_id: int, subject_id: int, version: int) -> Optional[Register]:
+    with _lock:
+        register = _registers.get((class_id, subject_id))
+        if register is not None and register.version == version:
+            _registers.move_to_end((class_id, subject_id))
+            return register
+    return None
+
+
+def _store(class_id: int, subject_id: int, register: Register) -> None:
+    global _size
+    with _lock:
+        old = _registers.pop((class_id, subject_id), None)
+        if old is not None:
+            _size -= old.nbytes
+        _registers[(class_id, subject_id)] = register
+        _size += register.nbytes
+        while _size > ATTENDANCE_MATRIX_BUDGET and len(_registers) > 1:
+            _, evicted = _registers.popitem(last=False)
+            _size -= evicted.nbytes
+
+
+def get_register(db: Session, class_id: int, subject_id: int) -> Register:
+    """Return the register of a class and subject, reloading it if the class changed since it was cached."""
+    version = db.execute(_version_query(class_id)).scalar() or 0
+    register = _lookup(class_id, subject_id, version)
+    if register is None:
+        register = Register.build(
+            version,
+            db.execute(_students_query(class_id)).all(),
+            db.execute(_cells_query(class_id, subject_id)).all()
+        )
+        _store(class_id, subject_id, register)
+    return register
+
+
+async def get_register_async(db: AsyncSession, class_id: int, subject_id: int) -> Register:
+    version = (await db.execute(_version_query(class_id))).scalar() or 0
+    register = _lookup(class_id, subject_id, version)
+    if register is None:
+        register = Register.build(
+            version,
+            (await db.execute(_students_query(class_id))).all(),
+            (await db.execute(_cells_query(class_id, subject_id))).all()
+        )
+        _store(class_id, subject_id, register)
+    return register
+
+
+def on_commit(class_id: int, version: int, subject_id: Optional[int] = None, day: Optional[date] = None,
+              statuses: Optional[Dict[int, str]] = None, fill_present: bool = False) -> None:
+    """
+    Bring the class's cached registers to `version` after a committed write.
+    Pass subject_id, day and statuses when the write changed attendance.
+    Registers that missed another write in between are dropped instead.
+    """
+    global _size
+    with _lock:
+        for key in [k for k in _registers if k[0] == class_id]:
+            register = _registers[key]
+            if register.version != version - 1:
+                del _registers[key]
+                _size -= register.nbytes
+            elif key[1] == subject_id and (statuses or fill_present):
+                if not register.patch(version, day, statuses or {}, fill_present):
+                    patched = register.patched(version, day, statuses or {}, fill_present)
+                    _registers[key] = patched
+                    _size += patched.nbytes - register.nbytes
+            else:
+                register.version = version
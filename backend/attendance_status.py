@@ -0,0 +1,36 @@
+"""
+Attendance status codec shared by the parser, the write paths and the readers.
+
+attendance_exceptions.status_code stores each status as a small integer, so
+counts and filters compare integers instead of lowercasing free-form strings
+per row. Every write goes through encode(), and readers show decode(). Rows of
+the old attendance table, some written before it had a status_code, are
+converted when migration 0003 folds them into sessions.
+"""
+from typing import Optional
+
+PRESENT, ABSENT, OD, LEAVE, OTHER = 1, 2, 3, 4, 5
+
+NAMES = {PRESENT: "Present", ABSENT: "Absent", OD: "OD", LEAVE: "Leave", OTHER: "Other"}
+
+# Lowercase spellings stored or sent by clients, including the sheet's letters
+ALIASES = {
+    "present": PRESENT, "p": PRESENT,
+    "absent": ABSENT, "a": ABSENT,
+    "od": OD, "o": OD, "on duty": OD,
+    "leave": LEAVE, "l": LEAVE,
+}
+
+
+def encode(status: Optional[str]) -> int:
+    """Code of a status name or letter in any case; OTHER if it is not one."""
+    return ALIASES.get(status.strip().lower(), OTHER) if status else OTHER
+
+
+def decode(code: Optional[int]) -> str:
+    return NAMES.get(code, NAMES[OTHER])
+
+
+def canonical(status: Optional[str]) -> str:
+    """"p", "PRESENT", "od" -> "Present", "Present", "OD"."""
+    return decode(encode(status))
@@ -0,0 +1,117 @@
+"""
+Throughput of /chat/ under concurrent teachers.
+
+Every simulated teacher owns one class of 70 students and sends a stream of
+attendance messages. While they run, a probe keeps hitting "/" to measure how
+responsive the event loop stays. Requests go through httpx's ASGI transport,
+so the numbers reflect the app and database, not the network.
+
+By default this runs against a throwaway SQLite file. Set DATABASE_URL to
+measure against PostgreSQL (it must point at a disposable database):
+
+    python bench_async.py --teachers 1 5 20 --messages 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    # database.py uses ./attmate.db as its fallback, so work in a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="attmate-bench-"))
+
+import httpx
+
+import database
+import models
+from main import app
+
+STUDENTS_PER_CLASS = 70
+MESSAGES = ["3, 5 absent", "7 od, 12 absent", "1 to 4 absent", "everyone present except 9, 10"]
+
+
+def seed(teachers: int):
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        subject = models.Subject(name=f"Bench Subject {time.time_ns()}")
+        db.add(subject)
+        db.flush()
+        class_ids = []
+        for t in range(teachers):
+            cls = models.Class(name=f"BENCH{time.time_ns()}{t}")
+            db.add(cls)
+            db.flush()
+            db.add_all([
+                models.Student(roll_number=f"BN{cls.id}{i:03d}", name=f"Student {i}", class_id=cls.id)
+                for i in range(1, STUDENTS_PER_CLASS + 1)
+            ])
+            class_ids.append(cls.id)
+        db.commit()
+        return subject.id, class_ids
+    finally:
+        db.close()
+
+
+async def teacher(client, class_id, subject_id, messages, latencies):
+    for n in range(messages):
+        start = time.perf_counter()
+        response = await client.post("/chat/", params={
+            "message": MESSAGES[n % len(MESSAGES)], "class_id": class_id, "subject_id": subject_id
+        })
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def probe(client, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+
+def p95(values):
+    return statistics.quantiles(values, n=20)[-1] if len(values) > 1 else values[0]
+
+
+async def run(teachers: int, messages: int):
+    subject_id, class_ids = seed(teachers)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        chat_latencies, probe_latencies = [], []
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop, probe_latencies))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            teacher(client, class_id, subject_id, messages, chat_latencies) for class_id in class_ids
+        ])
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await probe_task
+
+    total = teachers * messages
+    print(
+        f"{teachers:>8} | {total / elapsed:>10.1f} | {statistics.median(chat_latencies) * 1000:>12.1f} | "
+        f"{p95(chat_latencies) * 1000:>11.1f} | {p95(probe_latencies) * 1000:>14.1f}"
+    )
+
+
+async def main(levels, messages):
+    print(f"Database: {database.engine.url.render_as_string(hide_password=True)}")
+    print(f"{'teachers':>8} | {'chat req/s':>10} | {'chat p50 ms':>12} | {'chat p95 ms':>11} | {'probe p95 ms':>14}")
+    for teachers in levels:
+        await run(teachers, messages)
+    await database.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--teachers", type=int, nargs="+", default=[1, 5, 20], help="concurrency levels")
+    arg_parser.add_argument("--messages", type=int, default=20, help="chat messages per teacher")
+    args = arg_parser.parse_args()
+    asyncio.run(main(args.teachers, args.messages))
@@ -0,0 +1,279 @@
+"""
+Endpoint benchmarks against generated datasets, with regression thresholds.
+
+For every dataset size, loads a generate_dataset.py institution and calls
+every route of the app through TestClient, ITERATIONS times each after a
+warm-up call. Per endpoint it records p50 and p95 latency, the first (cold
+cache) call, SQL statements per request and the peak Python memory one
+request allocates (tracemalloc, measured in a separate pass so it does not
+slow the timed one).
+
+Results are compared with the JSON baseline. A hot path (HOT_PATHS) fails
+the run when it sends more statements than the baseline, or when its latency
+or peak memory grows past the thresholds; other endpoints only warn.
+Routes that are neither benchmarked nor listed in SKIPPED fail too, so new
+endpoints get a benchmark:
+
+    python bench_endpoints.py [--sizes small medium large] [--iterations 30]
+    python bench_endpoints.py --save        # record a new baseline
+
+Latencies depend on the machine, so save the baseline where the comparison
+runs (statement counts and memory are portable). By default this runs against
+a throwaway SQLite file; set DATABASE_URL to benchmark PostgreSQL (it must
+point at a disposable database). Baselines are kept per dialect.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+if not os.getenv("DATABASE_URL"):
+    # Set explicitly, so a DATABASE_URL in .env is never overwritten
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-bench-"), "bench.db")
+# Warm-up queries would be counted against whichever endpoint runs first
+os.environ["WARMUP_ENABLED"] = "false"
+
+from fastapi.routing import APIRoute, APIWebSocketRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+import check_query_plans
+import database
+import generate_dataset
+import models
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+SIZES = {
+    "small": generate_dataset.Options(departments=1, classes=2, students=40, subjects=4, months=1),
+    "medium": generate_dataset.Options(departments=2, classes=4, students=60, subjects=6, months=3),
+    "large": generate_dataset.Options(),
+}
+
+# Endpoints (by key prefix) whose regressions fail the run
+HOT_PATHS = ("POST /chat/", "GET /teacher/class-stats/", "GET /teacher/attendance-sheet/", "GET /teacher/subject-stats/")
+
+SKIPPED = {
+    ("GET", "/seed-db"): "runs seed_db.py against the app's database",
+    ("POST", "/admin/reset-history"): "deletes the records every other endpoint reads",
+    ("WEBSOCKET", "/ws/{class_id}/{subject_id}"): "long-lived; see bench_async.py",
+    ("GET", "/events/{class_id}/{subject_id}"): "long-lived event stream",
+}
+
+# Differences below these are noise, whatever the relative change
+MIN_LATENCY_DELTA_MS = 2.0
+MIN_MEMORY_DELTA_KB = 64
+
+
+def fixtures(ids: dict) -> dict:
+    """check_query_plans' ids plus the advisor's login and class 1's roster as CSV."""
+    with database.engine.connect() as conn:
+        email = conn.execute(select(models.User.email).where(models.User.id == ids["user_id"])).scalar_one()
+        roster = conn.execute(
+            select(models.Student.roll_number, models.Student.reg_number, models.Student.name)
+            .where(models.Student.class_id == 1).order_by(models.Student.id)
+        ).all()
+    csv = "Roll Number,Reg Number,Name\n" + "".join(f"{roll},{reg or ''},{name}\n" for roll, reg, name in roster)
+    return {**ids, "email": email, "roster_csv": csv.encode("utf-8")}
+
+
+def requests(f: dict):
+    """(method, route, url, kwargs) per endpoint; kwargs may be a function of the iteration number."""
+    user_id, subject_id, day, mid = f["user_id"], f["subject_id"], f["day"], f["message_id"]
+    return [
+        ("GET", "/", "/", {}),
+        ("GET", "/metrics", "/metrics", {}),
+        ("POST", "/login", "/login", {"json": {"email": f["email"], "password": "123", "role": "teacher"}}),
+        ("GET", "/admin/stats", "/admin/stats", {}),
+        ("GET", "/admin/classes", "/admin/classes", {}),
+        ("GET", "/admin/faculty", "/admin/faculty", {}),
+        ("GET", "/admin/subjects", "/admin/subjects", {}),
+        ("GET", "/teacher/my-classes", "/teacher/my-classes", {"params": {"user_id": user_id}}),
+        ("GET", "/teacher/my-advisory-class", "/teacher/my-advisory-class", {"params": {"user_id": user_id}}),
+        ("GET", "/teacher/bootstrap", "/teacher/bootstrap", {"params": {"user_id": user_id}}),
+        ("GET", "/teacher/class-stats/{class_id}", "/teacher/class-stats/1", {"params": {"user_id": user_id}}),
+        ("GET", "/teacher/attendance-sheet/{class_id}/{subject_id}", f"/teacher/attendance-sheet/1/{subject_id}", {}),
+        ("GET", "/teacher/day-details/{class_id}/{date_str}", f"/teacher/day-details/1/{day}", {}),
+        ("GET", "/teacher/calendar/{class_id}/{subject_id}", f"/teacher/calendar/1/{subject_id}", {}),
+        ("GET", "/teacher/subject-stats/{class_id}/{subject_id:int}", f"/teacher/subject-stats/1/{subject_id}", {}),
+        ("GET", "/teacher/subject-stats/{class_id}/{subject_name}", f"/teacher/subject-stats/1/{f['subject_name']}", {}),
+        ("GET", "/teacher/session-logs/{class_id}/{subject_id}", f"/teacher/session-logs/1/{subject_id}", {}),
+        ("GET", "/chat/history/{class_id}/{subject_id}", f"/chat/history/1/{subject_id}", {"params": {"limit": 50, "before": mid}}),
+        ("GET", "/export/attendance", "/export/attendance", {"params": {"class_id": 1, "subject_id": subject_id}}),
+        ("POST", "/chat/", "/chat/", {"params": {"class_id": 1, "subject_id": subject_id, "message": "3, 5 absent, 7 od"}}),
+        ("POST", "/teacher/update-attendance", "/teacher/update-attendance", {"json": {
+            "student_id": 2, "class_id": 1, "subject_id": subject_id, "date": day, "status": "Absent"
+        }}),
+        ("POST", "/teacher/session-logs", "/teacher/session-logs", {"json": {
+            "date": day, "content": "Revision", "class_id": 1, "subject_id": subject_id, "faculty_id": 1
+        }}),
+        ("POST", "/upload_csv/{class_id}", "/upload_csv/1",
+         lambda n: {"files": {"file": ("roster.csv", io.BytesIO(f["roster_csv"]), "text/csv")}}),
+        ("POST", "/admin/classes", "/admin/classes", lambda n: {"json": {"name": f"BENCH{n}"}}),
+        ("POST", "/admin/subjects", "/admin/subjects", lambda n: {"json": {"name": f"Bench Subject {n}"}}),
+        ("POST", "/admin/faculty", "/admin/faculty", lambda n: {
+            "params": {"name": f"Bench Faculty {n}", "dept": "BENCH"},
+            "json": {"name": f"Bench Faculty {n}", "department": "BENCH", "user_id": user_id}
+        }),
+        ("POST", "/admin/assign", "/admin/assign", {"json": {"faculty_id": 1, "subject_id": subject_id, "class_id": 1}}),
+    ]
+
+
+def uncovered(app, benchmarked) -> list:
+    covered = {(method, route) for method, route, _, _ in benchmarked} | set(SKIPPED)
+    missing = []
+    for route in app.routes:
+        if isinstance(route, APIWebSocketRoute):
+            methods = {"WEBSOCKET"}
+        elif isinstance(route, APIRoute):
+            methods = route.methods
+        else:
+            continue  # /docs, /openapi.json
+        missing += [f"{method} {route.path}" for method in sorted(methods) if (method, route.path) not in covered]
+    return missing
+
+
+def percentile(values, p):
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        self.engines = list(database.labelled_engines().values())
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self)
+
+
+def measure(client, method, url, kwargs, iterations: int, counter: StatementCounter) -> dict:
+    def call(n):
+        response = client.request(method, url, **(kwargs(n) if callable(kwargs) else kwargs))
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {url}: {response.status_code} {response.text[:200]}")
+
+    start = time.perf_counter()
+    call(0)
+    first = time.perf_counter() - start
+
+    gc.collect()  # Do not bill this endpoint for the previous one's garbage
+    latencies, statements = [], []
+    for n in range(1, iterations + 1):
+        counter.count = 0
+        start = time.perf_counter()
+        call(n)
+        latencies.append(time.perf_counter() - start)
+        statements.append(counter.count)
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for n in range(iterations + 1, iterations + 4):
+            tracemalloc.reset_peak()
+            call(n)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "first_ms": round(first * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "statements": max(statements),
+        "peak_kb": round(peak / 1024),
+    }
+
+
+def run(sizes, iterations: int) -> dict:
+    from main import app
+    results = {}
+    with TestClient(app) as client, StatementCounter() as counter:
+        for n, size in enumerate(sizes):
+            print(f"\n== {size} ==")
+            f = fixtures(check_query_plans.seed(SIZES[size], replace=n > 0))
+            endpoints = requests(f)
+            missing = uncovered(app, endpoints)
+            if missing:
+                raise SystemExit("Routes without a benchmark (add them to requests() or SKIPPED): " + ", ".join(missing))
+            results[size] = {}
+            print(f"{'endpoint':<62} {'first':>8} {'p50':>8} {'p95':>8} {'stmts':>6} {'peak KB':>8}")
+            for method, route, url, kwargs in endpoints:
+                key = f"{method} {route}"
+                r = results[size][key] = measure(client, method, url, kwargs, iterations, counter)
+                print(f"{key:<62} {r['first_ms']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                      f"{r['statements']:>6} {r['peak_kb']:>8}")
+    return results
+
+
+def compare(results: dict, baseline: dict, latency_threshold: float, memory_threshold: float) -> int:
+    """Prints regressions against the baseline; returns how many hot paths regressed."""
+    failures = 0
+    for size, endpoints in results.items():
+        for key, current in endpoints.items():
+            before = baseline.get(size, {}).get(key)
+            if before is None:
+                continue
+            problems = []
+            if current["statements"] > before["statements"]:
+                problems.append(f"{before['statements']} -> {current['statements']} statements")
+            # p95 rests on the few slowest calls, so it gets twice the slack
+            for name, threshold in (("p50_ms", latency_threshold), ("p95_ms", 2 * latency_threshold)):
+                if current[name] > before[name] * (1 + threshold) and current[name] - before[name] > MIN_LATENCY_DELTA_MS:
+                    problems.append(f"{name[:3]} {before[name]:.1f} -> {current[name]:.1f} ms")
+            if current["peak_kb"] > before["peak_kb"] * (1 + memory_threshold) \
+                    and current["peak_kb"] - before["peak_kb"] > MIN_MEMORY_DELTA_KB:
+                problems.append(f"peak {before['peak_kb']} -> {current['peak_kb']} KB")
+            if not problems:
+                continue
+            hot = key.startswith(HOT_PATHS)
+            failures += hot
+            print(f"{'FAIL' if hot else 'warn'} [{size}] {key}: {'; '.join(problems)}")
+    return failures
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"])
+    arg_parser.add_argument("--iterations", type=int, default=30, help="timed calls per endpoint")
+    arg_parser.add_argument("--baseline", default=BASELINE)
+    arg_parser.add_argument("--save", action="store_true", help="write the results to the baseline instead of comparing")
+    arg_parser.add_argument("--latency-threshold", type=float, default=0.5, help="allowed p50 growth (0.5 = 50%%); p95 gets twice this")
+    arg_parser.add_argument("--memory-threshold", type=float, default=0.5, help="allowed peak memory growth")
+    args = arg_parser.parse_args()
+
+    dialect = database.engine.dialect.name
+    results = run(args.sizes, args.iterations)
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+    if args.save:
+        stored[dialect] = {**stored.get(dialect, {}), **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"\nSaved {dialect} baseline for {', '.join(results)} to {args.baseline}")
+        sys.exit(0)
+    if dialect not in stored:
+        print(f"\nNo {dialect} baseline in {args.baseline}; run with --save to record one.")
+        sys.exit(0)
+    print()
+    failures = compare(results, stored[dialect], args.latency_threshold, args.memory_threshold)
+    print(f"{failures} hot path regression(s)." if failures else "No hot path regressions.")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,86 @@
+"""
+Parser microbenchmark.
+
+Times SmartAttendanceParser.parse on the messages from test_parser.py plus a
+long roll list. Pass --baseline with a copy of the previous smart_parser.py to
+compare against it; the baseline gets a fresh parser per message, the way
+/chat/ used to build one per request. Results are compared with statuses
+canonicalized through attendance_status (parsers from before status codes
+spell OD "Od"), and messages parsed differently are flagged, not timed.
+
+    git show <commit>:backend/smart_parser.py > /tmp/old_parser.py
+    python bench_parser.py --baseline /tmp/old_parser.py
+"""
+import argparse
+import importlib.util
+import timeit
+
+import attendance_status
+from smart_parser import default_parser
+
+MESSAGES = [
+    "Log: Today we covered React Hooks and State Management",
+    "101 absent, 102 present, 103 OD Session 1",
+    "Who is absent today?",
+    "Everyone present except 115, 116",
+    "Roll 1 to 5 absent",
+    "144, 145 od",
+    "Just 133 absent please",
+    ", ".join(str(i) for i in range(1, 41)) + " absent, 41 od",
+]
+
+
+def load_baseline(path):
+    spec = importlib.util.spec_from_file_location("baseline_parser", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.AdvancedAttendanceParser
+
+
+def canonical(result: dict) -> dict:
+    """`result` with its statuses spelled the way attendance_status spells them."""
+    result = dict(result)
+    if "status" in result:
+        result["status"] = attendance_status.canonical(result["status"])
+    if "entries" in result:
+        result["entries"] = [{**e, "status": attendance_status.canonical(e["status"])} for e in result["entries"]]
+    return result
+
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(number, baseline) -> int:
+    """Returns how many messages the baseline parses differently."""
+    baseline_cls = load_baseline(baseline) if baseline else None
+    differences = 0
+    header = f"{'current us':>10}"
+    if baseline_cls:
+        header += f" | {'baseline us':>11} | {'speedup':>7}"
+    print(f"{header} | message")
+    for message in MESSAGES:
+        current = per_call_us(lambda: default_parser.parse(message, 1, 1), number)
+        row = f"{current:>10.2f}"
+        if baseline_cls:
+            old = canonical(baseline_cls().parse(message, 1, 1))
+            if old != canonical(default_parser.parse(message, 1, 1)):
+                differences += 1
+                print(f"{row} | {'':>11} | {'DIFFERS':>7} | {message[:50]}")
+                print(f"{'':>10}   baseline: {old}")
+                print(f"{'':>10}   current:  {canonical(default_parser.parse(message, 1, 1))}")
+                continue
+            previous = per_call_us(lambda: baseline_cls().parse(message, 1, 1), number)
+            row += f" | {previous:>11.2f} | {previous / current:>6.1f}x"
+        print(f"{row} | {message[:50]}")
+    if differences:
+        print(f"{differences} message(s) parsed differently by the baseline.")
+    return differences
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--number", type=int, default=5000, help="calls per timing run")
+    arg_parser.add_argument("--baseline", help="path to an older smart_parser.py to compare against")
+    args = arg_parser.parse_args()
+    raise SystemExit(1 if main(args.number, args.baseline) else 0)
@@ -0,0 +1,114 @@
+"""
+Cold start cost: how long `import main` takes, and how long a fresh uvicorn
+process takes to answer its first request and its first database-backed
+request. Fails (exit 1) when a limit is exceeded, or when importing the app
+pulls in a module that should only load on demand (LAZY_MODULES), so it can
+run in CI:
+
+    python bench_startup.py [--runs 5] [--max-import-ms 1500] [--max-first-response-ms 4000]
+
+By default this runs against a throwaway SQLite file, migrated before
+anything is timed. Set DATABASE_URL to measure against PostgreSQL.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-startup-"), "startup.db")
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+# Only needed by import/export, migrations, the keep-alive pinger, the chat parser or the registers
+LAZY_MODULES = ["pandas", "openpyxl", "alembic", "requests", "smart_parser", "numpy", "attendance_matrix"]
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+print(json.dumps({"ms": (time.perf_counter() - started) * 1000, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure_import() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, deadline: float) -> None:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.01)
+    raise SystemExit(f"No response from {url}")
+
+
+def measure_first_response(timeout: float = 30) -> dict:
+    """Milliseconds from spawning uvicorn to the first answer from / and from a database-backed route."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        _wait_for(f"http://127.0.0.1:{port}/", deadline)
+        first = time.perf_counter()
+        _wait_for(f"http://127.0.0.1:{port}/admin/stats", deadline)
+        query = time.perf_counter()
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first_response_ms": (first - started) * 1000, "first_query_ms": (query - started) * 1000}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement (the median counts)")
+    arg_parser.add_argument("--max-import-ms", type=float, default=1500)
+    arg_parser.add_argument("--max-first-response-ms", type=float, default=4000)
+    args = arg_parser.parse_args()
+
+    sys.path.insert(0, BACKEND)
+    import migrate
+    migrate.upgrade()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    starts = [measure_first_response() for _ in range(args.runs)]
+    import_ms = statistics.median(r["ms"] for r in imports)
+    first_ms = statistics.median(r["first_response_ms"] for r in starts)
+    query_ms = statistics.median(r["first_query_ms"] for r in starts)
+    loaded = sorted({m for r in imports for m in r["loaded"]})
+
+    print(f"import main           {import_ms:8.0f} ms  (limit {args.max_import_ms:.0f})")
+    print(f"first response        {first_ms:8.0f} ms  (limit {args.max_first_response_ms:.0f})")
+    print(f"first database query  {query_ms:8.0f} ms")
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append("import main is too slow")
+    if first_ms > args.max_first_response_ms:
+        failures.append("first response is too slow")
+    if loaded:
+        failures.append("importing main loads " + ", ".join(loaded))
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,104 @@
+"""
+Set-based attendance writes for /chat/ and /teacher/update-attendance.
+
+Attendance is stored per session (models.AttendanceSession) with exception
+rows for the students who are not the implied Present. Marking students
+upserts their exception rows; auto-present moves the session's
+filled_through up to the class's current data version, which marks every
+student enrolled by then (models.Student.enrolled_version) without a record
+Present without writing a row for each of them. A message
+costs a fixed number of statements however large the class. Rolls are
+resolved by roster_index.
+
+All statements rely on the tables' primary keys, so concurrent submissions
+for the same class can never produce duplicate rows, and every write starts
+by locking its session row (lock_statement), so writes to one session apply
+one at a time. The statements are only built here:
+repository.write_attendance, the one write path, runs them on an
+AsyncSession together with the daily summary delta (daily_summary.py).
+Statuses are stored as attendance_status codes.
+"""
+from datetime import date
+from typing import Dict, Optional
+
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import attendance_status
+import models
+
+SESSION_KEY = ["class_id", "subject_id", "date"]
+EXCEPTION_KEY = SESSION_KEY + ["student_id"]
+
+
+def dialect_insert(dialect_name: str):
+    """The dialect's INSERT construct, which supports ON CONFLICT clauses."""
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def _class_version(class_id: int):
+    """The class's data version as a scalar subquery, 0 if it has never been bumped."""
+    versions = models.ClassDataVersion
+    return func.coalesce(
+        select(versions.version).where(versions.class_id == class_id).scalar_subquery(), 0
+    )
+
+
+def lock_statement(dialect_name: str, class_id: int, subject_id: int, day: date):
+    """
+    INSERT of the session row that leaves an existing row as it is. Either
+    way the row stays locked until commit. Returns the session's
+    filled_through and the class's current data version.
+    """
+    table = models.AttendanceSession.__table__
+    stmt = dialect_insert(dialect_name)(table).values(class_id=class_id, subject_id=subject_id, date=day)
+    return stmt.on_conflict_do_update(
+        index_elements=SESSION_KEY, set_={"filled_through": table.c.filled_through}
+    ).returning(table.c.filled_through, _class_version(class_id))
+
+
+def upsert_statement(dialect_name: str, class_id: int, subject_id: int, day: date, statuses: Dict[int, str]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE writing `statuses` ({student_id: status})
+    as exception rows of one session.
+    """
+    rows = [
+        {"class_id": class_id, "subject_id": subject_id, "date": day,
+         "student_id": student_id, "status_code": attendance_status.encode(status)}
+        for student_id, status in statuses.items()
+    ]
+    stmt = dialect_insert(dialect_name)(models.AttendanceException).values(rows)
+    # A legacy status text belongs to the status it replaces
+    return stmt.on_conflict_do_update(
+        index_elements=EXCEPTION_KEY, set_={"status_code": stmt.excluded.status_code, "status_text": None}
+    )
+
+
+def fill_statement(class_id: int, subject_id: int, day: date,
+                   filled_through: Optional[int], version: int, exclude_ids):
+    """
+    UPDATE of the session's filled_through to `version`, the class data
+    version lock_statement read: every student enrolled by then without a
+    record becomes Present. Existing records are never overwritten. Returns
+    how many students it fills: those enrolled after `filled_through` (the
+    session's value before the write), without a record and not in
+    exclude_ids, whose marks are written next. Students added by
+    transactions that have not committed yet are stamped with a later
+    version, so they are not covered.
+    """
+    sess, exc, student = models.AttendanceSession.__table__, models.AttendanceException, models.Student
+    newly_filled = select(func.count()).where(
+        student.class_id == class_id,
+        student.id.not_in(exclude_ids),
+        student.enrolled_version > (-1 if filled_through is None else filled_through),
+        student.enrolled_version <= version,
+        ~exists().where(
+            exc.class_id == class_id, exc.subject_id == subject_id, exc.date == day,
+            exc.student_id == student.id
+        )
+    ).scalar_subquery()
+    return update(sess).where(
+        sess.c.class_id == class_id, sess.c.subject_id == subject_id, sess.c.date == day
+    ).values(filled_through=version).returning(newly_filled)
@@ -0,0 +1,178 @@
+"""
+Fail if an endpoint's queries fall back to sequential scans.
+
+Loads a small generate_dataset.py institution into a migrated database, then
+calls the teacher endpoints. Every statement they send is run through EXPLAIN
+on the same connection, and any full scan of a table in WATCHED is reported.
+Exits 1 if there is one, so it can run in CI after every schema or query
+change:
+
+    python check_query_plans.py [--verbose]
+
+By default this runs against a throwaway SQLite file. Set DATABASE_URL to
+check PostgreSQL (it must point at a disposable database); there the planner
+is told to avoid sequential scans, so one only shows up when no index fits.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+if not os.getenv("DATABASE_URL"):
+    # Set explicitly, so a DATABASE_URL in .env is never seeded
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-plans-"), "plans.db")
+# Warm-up queries would be explained as part of whichever endpoint runs first
+os.environ["WARMUP_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import and_, event, func, select
+
+import database
+import generate_dataset
+import models
+import snapshot
+
+# Tables that grow with use; small lookup tables (users, subjects) may be scanned
+WATCHED = {
+    "classes", "faculty", "faculty_subjects", "students", "attendance_sessions", "attendance_exceptions",
+    "attendance_daily_summary", "class_data_versions", "chat_messages", "session_logs",
+}
+
+SQLITE_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+# A small institution from generate_dataset.py
+DATASET = generate_dataset.Options(departments=2, classes=3, students=40, subjects=4, months=1)
+
+
+def seed(options: generate_dataset.Options = DATASET, replace: bool = False) -> dict:
+    """Loads the dataset; returns the ids and names the requests below refer to (class 1, its subjects and advisor)."""
+    snapshot.load(database.engine, generate_dataset.generate(options), replace)
+    with database.engine.connect() as conn:
+        user_id = conn.execute(
+            select(models.Faculty.user_id).join(models.Class, models.Class.advisor_id == models.Faculty.id)
+            .where(models.Class.id == 1)
+        ).scalar_one()
+        subject_ids = conn.execute(
+            select(models.FacultySubject.subject_id).where(models.FacultySubject.class_id == 1)
+            .order_by(models.FacultySubject.subject_id)
+        ).scalars().all()
+        subject_name = conn.execute(select(models.Subject.name).where(models.Subject.id == subject_ids[-1])).scalar_one()
+        day, message_id = conn.execute(
+            select(func.min(models.AttendanceSession.date), func.max(models.ChatMessage.id))
+            .where(models.AttendanceSession.class_id == 1, models.AttendanceSession.subject_id == subject_ids[0])
+            .join(models.ChatMessage, and_(models.ChatMessage.class_id == 1, models.ChatMessage.subject_id == subject_ids[0]))
+        ).one()
+    return {"user_id": user_id, "subject_id": subject_ids[0], "other_subject_id": subject_ids[1],
+            "subject_name": subject_name, "day": day.isoformat(), "message_id": message_id // 2}
+
+
+def requests(ids: dict):
+    user_id, subject_id, day, mid = ids["user_id"], ids["subject_id"], ids["day"], ids["message_id"]
+    return [
+        ("GET", "/teacher/my-classes", {"params": {"user_id": user_id}}),
+        ("GET", "/teacher/my-advisory-class", {"params": {"user_id": user_id}}),
+        ("GET", "/teacher/bootstrap", {"params": {"user_id": user_id}}),
+        ("GET", "/teacher/class-stats/1", {"params": {"user_id": user_id}}),
+        ("GET", f"/teacher/attendance-sheet/1/{subject_id}", {}),
+        ("GET", f"/teacher/day-details/1/{day}", {}),
+        ("GET", f"/teacher/calendar/1/{subject_id}", {}),
+        ("GET", f"/teacher/subject-stats/1/{ids['other_subject_id']}", {"params": {"start_date": day}}),
+        ("GET", f"/teacher/subject-stats/1/{ids['subject_name']}", {}),
+        ("GET", f"/teacher/session-logs/1/{subject_id}", {}),
+        ("GET", f"/chat/history/1/{subject_id}", {"params": {"limit": 20}}),
+        ("GET", f"/chat/history/1/{subject_id}", {"params": {"limit": 20, "before": mid}}),
+        ("GET", f"/chat/history/1/{subject_id}", {"params": {"after": mid}}),
+        ("POST", "/chat/", {"params": {"class_id": 1, "subject_id": subject_id, "message": "3, 5 absent, 7 od"}}),
+        ("POST", "/chat/", {"params": {"class_id": 1, "subject_id": subject_id, "message": "who is absent today"}}),
+        ("POST", "/teacher/update-attendance", {"json": {
+            "student_id": 2, "class_id": 1, "subject_id": subject_id, "date": day, "status": "Absent"
+        }}),
+        ("POST", "/teacher/session-logs", {"json": {
+            "date": day, "content": "Revision", "class_id": 1, "subject_id": subject_id, "faculty_id": 1
+        }}),
+    ]
+
+
+def _explain(cursor, dialect: str, statement: str, parameters):
+    """Full scans of WATCHED tables in the plan, and the plan as text."""
+    if dialect == "postgresql":
+        cursor.execute("SET enable_seqscan = off")
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan = cursor.fetchone()[0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scans, nodes = [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in WATCHED:
+                scans.append(node["Relation Name"])
+            nodes.extend(node.get("Plans", []))
+        return scans, json.dumps(plan, indent=1)
+
+    cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+    details = [row[3] for row in cursor.fetchall()]
+    scans = []
+    for detail in details:
+        match = SQLITE_SCAN_RE.match(detail)
+        if match and match.group(1) in WATCHED:
+            scans.append(match.group(1))
+    return scans, "\n".join(details)
+
+
+def check(verbose: bool = False) -> int:
+    ids = seed()
+
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")):
+            return
+        # A separate cursor on the same connection, so the statement's own results are untouched
+        explain_cursor = conn.connection.cursor()
+        try:
+            scans, plan = _explain(explain_cursor, conn.dialect.name, statement, parameters)
+        finally:
+            explain_cursor.close()
+        captured.append((statement, scans, plan))
+
+    engines = list(database.labelled_engines().values())
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+    failures = 0
+    try:
+        with TestClient(main_app()) as client:
+            for method, path, kwargs in requests(ids):
+                captured.clear()
+                response = client.request(method, path, **kwargs)
+                if response.status_code >= 400:
+                    print(f"ERROR {method} {path}: {response.status_code} {response.text}")
+                    failures += 1
+                    continue
+                bad = [(statement, scans, plan) for statement, scans, plan in captured if scans]
+                print(f"{'FAIL' if bad else 'ok  '} {method} {path} ({len(captured)} statements)")
+                for statement, scans, plan in (captured if verbose else bad):
+                    print(f"    {' '.join(statement.split())}")
+                    if scans:
+                        print(f"    sequential scan of {', '.join(sorted(set(scans)))}")
+                    print("    " + plan.replace("\n", "\n    "))
+                failures += bool(bad)
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    print(f"{failures} endpoint(s) with sequential scans or errors." if failures else "No sequential scans.")
+    return failures
+
+
+def main_app():
+    from main import app
+    return app
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--verbose", action="store_true", help="print every statement and its plan")
+    args = arg_parser.parse_args()
+    sys.exit(1 if check(args.verbose) else 0)
@@ -0,0 +1,54 @@
+"""
+database.py builds its engines from the environment when it is first
+imported, so test modules that configure it (ISOLATED) cannot share a process
+with each other or with the tests that use the default database. Each of them
+runs in its own pytest process instead, and one `python -m pytest` still runs
+them all.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ISOLATED = {
+    "test_read_replica.py", "test_write_queue.py", "test_attendance_sessions.py", "test_etags.py",
+    "test_chat_history.py", "test_roster_import.py", "test_attendance_export.py", "test_live.py",
+}
+
+# Set in the child process, which collects the module normally
+CHILD_FLAG = "ATTMATE_ISOLATED_TEST"
+
+
+class IsolatedFailure(Exception):
+    pass
+
+
+class IsolatedRun(pytest.Item):
+    def runtest(self):
+        result = subprocess.run(
+            [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", str(self.path)],
+            cwd=self.config.rootpath, env={**os.environ, CHILD_FLAG: "1"},
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise IsolatedFailure(result.stdout + result.stderr)
+
+    def repr_failure(self, excinfo):
+        if isinstance(excinfo.value, IsolatedFailure):
+            return str(excinfo.value)
+        return super().repr_failure(excinfo)
+
+    def reportinfo(self):
+        return self.path, None, f"{self.path.name} (own process)"
+
+
+class IsolatedModule(pytest.File):
+    def collect(self):
+        yield IsolatedRun.from_parent(self, name=self.path.name)
+
+
+def pytest_pycollect_makemodule(module_path, parent):
+    if module_path.name in ISOLATED and not os.getenv(CHILD_FLAG):
+        return IsolatedModule.from_parent(parent, path=module_path)
+    return None
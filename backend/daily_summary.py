@@ -0,0 +1,171 @@
+"""
+Per-(class, subject, date) attendance counts in attendance_daily_summary.
+
+Class stats, day details and the calendar read these rows instead of
+expanding sessions. Every attendance write adds what it changes to the
+summary row of its session, in the same transaction (delta_statement): the
+students it fills as Present, and each marked student moving from their
+previous status to the new one. Only full recounts read whole sessions.
+
+Migration 0004 fills the table on upgrade (fill_statement), so existing
+databases start with correct counts. Databases written to by other tools are
+brought up to date with a rebuild. It recounts each class in its own
+transaction, several classes at a time:
+
+    python daily_summary.py [--workers 4]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, Optional
+
+from sqlalchemy import Date, Integer, and_, case, delete, false, func, literal, select, true
+from sqlalchemy.orm import Session
+
+import attendance_status
+import models
+from bulk_attendance import dialect_insert
+from database import engine
+
+# Summary column -> status code counted in it
+STATUS_BUCKETS = {
+    "present": attendance_status.PRESENT,
+    "absent": attendance_status.ABSENT,
+    "od": attendance_status.OD,
+    "leave": attendance_status.LEAVE,
+}
+COUNT_COLUMNS = [*STATUS_BUCKETS, "total"]
+SUMMARY_KEY = ["class_id", "subject_id", "date"]
+# The students of the exception rows. Built once: a new alias per statement
+# leaves its column proxies behind as garbage on every write.
+_MEMBERS = models.Student.__table__.alias("members")
+
+
+def _counts_select(*where):
+    """
+    Counts per session: its exceptions by status, plus the students it filled
+    (enrolled by filled_through) that have no exception, as Present.
+    """
+    sess, exc, student = models.AttendanceSession, models.AttendanceException, models.Student
+    member = _MEMBERS
+    filled = select(func.count()).where(
+        student.class_id == sess.class_id, student.enrolled_version <= sess.filled_through
+    ).scalar_subquery()
+    # Exceptions of filled students replace their implied Present
+    overridden = func.coalesce(func.sum(case((member.c.enrolled_version <= sess.filled_through, 1), else_=0)), 0)
+    counts = {
+        name: func.coalesce(func.sum(case((exc.status_code == code, 1), else_=0)), 0)
+        for name, code in STATUS_BUCKETS.items()
+    }
+    counts["present"] = counts["present"] + filled - overridden
+    return select(
+        sess.class_id, sess.subject_id, sess.date,
+        *counts.values(),
+        func.count(exc.student_id) + filled - overridden
+    ).select_from(sess).outerjoin(exc, and_(
+        exc.class_id == sess.class_id, exc.subject_id == sess.subject_id, exc.date == sess.date
+    )).outerjoin(member, and_(
+        member.c.id == exc.student_id, member.c.class_id == sess.class_id
+    )).where(*where).group_by(sess.class_id, sess.subject_id, sess.date, sess.filled_through)
+
+
+def _upsert_counts(dialect_name: str, counts):
+    stmt = dialect_insert(dialect_name)(models.AttendanceDailySummary).from_select(SUMMARY_KEY + COUNT_COLUMNS, counts)
+    return stmt.on_conflict_do_update(
+        index_elements=SUMMARY_KEY,
+        set_={col: stmt.excluded[col] for col in COUNT_COLUMNS}
+    )
+
+
+def fill_statement(dialect_name: str):
+    """Recounts the summary rows of every session."""
+    return _upsert_counts(dialect_name, _counts_select())
+
+
+def delta_statement(dialect_name: str, class_id: int, subject_id: int, day: date,
+                    statuses: Dict[int, str], filled_through: Optional[int], filled: int):
+    """
+    INSERT ... ON CONFLICT DO UPDATE adding a write's changes to its
+    session's summary row: `filled` students newly Present, and every student
+    in `statuses` ({student_id: status}) counted under their new status
+    instead of the one they had. Reads their previous statuses, so it runs
+    before the write's exception upsert; filled_through is the session's
+    value before the write.
+    """
+    exc, student = models.AttendanceException, models.Student
+    covered = false() if filled_through is None else and_(
+        student.class_id == class_id, student.enrolled_version <= filled_through
+    )
+    # The previous status code of each marked student, NULL if they had no record
+    previous = select(case(
+        (exc.student_id.is_not(None), exc.status_code),
+        (covered, attendance_status.PRESENT)
+    ).label("code")).select_from(student).outerjoin(exc, and_(
+        exc.class_id == class_id, exc.subject_id == subject_id, exc.date == day, exc.student_id == student.id
+    )).where(student.id.in_(list(statuses))).subquery()
+    before = select(
+        *[func.count(case((previous.c.code == code, 1))).label(name) for name, code in STATUS_BUCKETS.items()],
+        func.count(previous.c.code).label("total")
+    ).subquery()
+
+    after = dict.fromkeys(COUNT_COLUMNS, 0)
+    for status in statuses.values():
+        code = attendance_status.encode(status)
+        for name, bucket in STATUS_BUCKETS.items():
+            after[name] += code == bucket
+    after["present"] += filled
+    after["total"] = len(statuses) + filled
+    counts = select(
+        literal(class_id, Integer), literal(subject_id, Integer), literal(day, Date),
+        *[literal(after[col], Integer) - before.c[col] for col in COUNT_COLUMNS]
+    ).where(true())  # SQLite needs a WHERE to parse INSERT ... SELECT ... ON CONFLICT
+    summary = models.AttendanceDailySummary.__table__
+    stmt = dialect_insert(dialect_name)(summary).from_select(SUMMARY_KEY + COUNT_COLUMNS, counts)
+    return stmt.on_conflict_do_update(
+        index_elements=SUMMARY_KEY,
+        set_={col: summary.c[col] + stmt.excluded[col] for col in COUNT_COLUMNS}
+    )
+
+
+def clear(db: Session) -> None:
+    db.execute(delete(models.AttendanceDailySummary))
+
+
+# --- REBUILD ---
+def rebuild_class(class_id: int) -> int:
+    """Replaces every summary row of a class. Returns the number of rows written."""
+    with engine.begin() as conn:
+        conn.execute(delete(models.AttendanceDailySummary).where(models.AttendanceDailySummary.class_id == class_id))
+        return conn.execute(_upsert_counts(
+            engine.dialect.name, _counts_select(models.AttendanceSession.class_id == class_id)
+        )).rowcount
+
+
+def rebuild(workers: int = 4) -> int:
+    models.AttendanceDailySummary.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        class_ids = conn.execute(select(models.AttendanceSession.class_id).distinct()).scalars().all()
+        # Summary rows of classes that no longer have any attendance
+        conn.execute(delete(models.AttendanceDailySummary).where(
+            models.AttendanceDailySummary.class_id.not_in(class_ids)
+        ))
+        conn.commit()
+
+    if engine.dialect.name == "sqlite":
+        # SQLite allows one writer at a time; parallel transactions would only wait on each other
+        workers = 1
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for class_id, rows in zip(class_ids, pool.map(rebuild_class, class_ids)):
+            print(f"Class {class_id}: {rows} summary rows")
+            total += rows
+    print(f"Rebuilt {total} summary rows for {len(class_ids)} classes.")
+    return total
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--workers", type=int, default=4, help="classes rebuilt in parallel")
+    args = arg_parser.parse_args()
+    rebuild(args.workers)
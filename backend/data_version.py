@@ -0,0 +1,120 @@
+"""
+Per-class data versions for conditional GETs.
+
+class_data_versions holds one counter per class. Every write path bumps it in
+the same transaction as the write: chat, manual attendance edits, roster
+uploads, session logs, subject assignments and history resets. Read endpoints
+for a class depend on not_modified(), which answers a matching If-None-Match
+with 304 Not Modified after a single primary-key lookup, before any
+attendance query runs, and otherwise tags the response with a weak ETag;
+/teacher/bootstrap does the same over all of a teacher's classes
+(teacher_etag). Bumping also keeps the class's reads on the primary for a
+short while (see database.read_sessionmaker), and not_modified reads the
+version from the same database as the endpoint, so an ETag never outruns the data it tags.
+"""
+import hashlib
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import BigInteger, func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+import database
+from bulk_attendance import dialect_insert
+
+
+def bump_statement(dialect_name: str, class_ids: List[int]):
+    versions = models.ClassDataVersion
+    stmt = dialect_insert(dialect_name)(versions).values([
+        {"class_id": class_id, "version": 1} for class_id in class_ids
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=["class_id"],
+        set_={"version": versions.version + 1}
+    ).returning(versions.version)
+
+
+def bump_all_statement(dialect_name: str):
+    """Bumps every class, including ones that have never been written to."""
+    versions = models.ClassDataVersion
+    stmt = dialect_insert(dialect_name)(versions).from_select(
+        ["class_id", "version"],
+        # The WHERE keeps SQLite from reading ON CONFLICT as part of the SELECT
+        select(models.Class.id, literal(1, BigInteger)).where(models.Class.id.is_not(None))
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["class_id"],
+        set_={"version": versions.version + 1}
+    )
+
+
+def bump(db: Session, class_id: Optional[int]) -> Optional[int]:
+    """Returns the class's new version."""
+    if class_id is not None:
+        database.mark_written(class_id)
+        return db.execute(bump_statement(db.get_bind().dialect.name, [class_id])).scalar_one()
+    return None
+
+
+def bump_all(db: Session) -> None:
+    database.mark_written()
+    db.execute(bump_all_statement(db.get_bind().dialect.name))
+
+
+async def current(db: AsyncSession, class_id: int) -> int:
+    version = await db.scalar(
+        select(models.ClassDataVersion.version).where(models.ClassDataVersion.class_id == class_id)
+    )
+    return version or 0
+
+
+def etag(class_id: int, version: int) -> str:
+    return f'W/"{class_id}-{version}"'
+
+
+def _matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison: the W/ prefix is ignored on both sides
+    candidates = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in candidates or tag.removeprefix("W/") in candidates
+
+
+def teacher_etag(db: Session, faculty_id: int) -> str:
+    """
+    Weak ETag of a teacher's home screen (/teacher/bootstrap), from one query:
+    the versions of every class they teach or advise. It changes with any
+    write to those classes and whenever a class joins or leaves the list.
+    """
+    classes, versions, assigned = models.Class, models.ClassDataVersion, models.FacultySubject
+    rows = db.execute(
+        select(classes.id, func.coalesce(versions.version, 0))
+        .outerjoin(versions, versions.class_id == classes.id)
+        .where(or_(
+            classes.advisor_id == faculty_id,
+            classes.id.in_(select(assigned.class_id).where(assigned.faculty_id == faculty_id))
+        ))
+        .order_by(classes.id)
+    ).all()
+    digest = hashlib.sha1(",".join(f"{class_id}:{version}" for class_id, version in rows).encode()).hexdigest()
+    return f'W/"t{faculty_id}-{digest[:16]}"'
+
+
+def respond(request: Request, response: Response, tag: str) -> None:
+    """Answers a matching If-None-Match with 304 Not Modified, or tags the response."""
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if _matches(request.headers.get("if-none-match"), tag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+async def not_modified(
+    request: Request,
+    response: Response,
+    class_id: int,
+    db: AsyncSession = Depends(database.get_async_read_db)
+) -> None:
+    """Dependency for read endpoints with a class_id path parameter."""
+    respond(request, response, etag(class_id, await current(db, class_id)))
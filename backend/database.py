@@ -1,8 +1,14 @@
 import os
 import sqlite3
-from sqlalchemy import create_engine
+import time
+import uuid
+from typing import Iterable, List, Optional
+from fastapi import Request
+from sqlalchemy import create_engine, event, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
 from pathlib import Path
@@ -14,23 +20,195 @@ load_dotenv(dotenv_path=env_path)
 DATABASE_URL = os.getenv("DATABASE_URL")
 # Fallback: SQLite (for local development only)
 SQLITE_URL = "sqlite:///./attmate.db"
+# Optional read replica for the dashboard reads (get_read_db)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+# After a write to a class, its reads stay on the primary this long, so the
+# writer sees their change even if the replica lags
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+# --- POOL SETTINGS (PostgreSQL) ---
+# Each engine (sync and async) gets its own pool of this size.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Replace connections older than this, before Supabase or a proxy drops them
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+# Test each connection on checkout, so ones killed while Render slept are replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() != "false"
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# Transaction pooling (Supabase's pooler on port 6543, pgbouncer): "auto" detects the port
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "auto").lower()
+PGBOUNCER_PORT = 6543
+
+# --- SQLITE SETTINGS ---
+# Set on every SQLite connection. WAL lets readers run alongside the writer,
+# and synchronous=NORMAL is crash-safe under WAL (only the last commits can be
+# lost on power failure). cache_size is per connection.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+SQLITE_CACHE_SIZE_MB = int(os.getenv("SQLITE_CACHE_SIZE_MB", "16"))
+# Serialize the async attendance writes through write_queue.py (group commits)
+SQLITE_WRITE_QUEUE = os.getenv("SQLITE_WRITE_QUEUE", "true").lower() != "false"
+
+# Called with (pool label, seconds) after every checkout; metrics.instrument adds its own
+pool_wait_listeners = []
+
+
+class _WaitTimedPool:
+    """Times how long each checkout waited for a connection (including opening a new one)."""
+    label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            for listener in pool_wait_listeners:
+                listener(self.label, waited)
+
+
+class SyncPool(_WaitTimedPool, QueuePool):
+    label = "sync"
+
+
+class AsyncPool(_WaitTimedPool, AsyncAdaptedQueuePool):
+    label = "async"
+
+
+class ReadPool(_WaitTimedPool, QueuePool):
+    label = "read"
+
+
+class AsyncReadPool(_WaitTimedPool, AsyncAdaptedQueuePool):
+    label = "async-read"
+
+
+class WritePool(_WaitTimedPool, AsyncAdaptedQueuePool):
+    label = "write"
+
+
+# (asynchronous, replica) -> pool class
+POOL_CLASSES = {(False, False): SyncPool, (True, False): AsyncPool, (False, True): ReadPool, (True, True): AsyncReadPool}
+
+
+def uses_pgbouncer(url) -> bool:
+    if DB_PGBOUNCER == "auto":
+        return url.get_backend_name() == "postgresql" and url.port == PGBOUNCER_PORT
+    return DB_PGBOUNCER == "true"
+
+
+def _set_local_statement_timeout(conn):
+    # A transaction pooler hands server connections to other clients between
+    # transactions, so session settings cannot be used; scope it to each transaction.
+    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+
+
+def engine_options(url, asynchronous: bool = False, replica: bool = False) -> dict:
+    """create_engine keyword arguments for `url`: pool sizing and timeouts on PostgreSQL."""
+    poolclass = POOL_CLASSES[(asynchronous, replica)]
+    if url.get_backend_name() != "postgresql":
+        # SQLite: the default pool, timed, for files; in-memory databases keep their single-connection pool
+        return {"poolclass": poolclass} if url.database not in (None, "", ":memory:") else {}
+
+    pgbouncer = uses_pgbouncer(url)
+    timeout = DB_STATEMENT_TIMEOUT_MS if DB_STATEMENT_TIMEOUT_MS > 0 and not pgbouncer else None
+    if asynchronous:
+        connect_args = {"timeout": DB_CONNECT_TIMEOUT}
+        if timeout:
+            connect_args["server_settings"] = {"statement_timeout": str(timeout)}
+        if pgbouncer:
+            # Named prepared statements do not survive a change of server connection
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        connect_args = {"connect_timeout": DB_CONNECT_TIMEOUT}
+        if timeout:
+            connect_args["options"] = f"-c statement_timeout={timeout}"
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def _sqlite_pragmas(url) -> dict:
+    pragmas = {
+        "synchronous": "NORMAL",
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -SQLITE_CACHE_SIZE_MB * 1024,  # negative: KiB
+    }
+    if url.database not in (None, "", ":memory:"):
+        pragmas.update({"journal_mode": "WAL", "mmap_size": SQLITE_MMAP_SIZE_MB * 1024 * 1024})
+    return pragmas
+
+
+def _set_sqlite_pragmas(pragmas: dict):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def _configure(engine, sync_engine=None):
+    """
+    Per-connection SQLite pragmas, or the per-transaction statement timeout
+    behind a transaction pooler (sync_engine: the async engine's).
+    """
+    if engine.url.get_backend_name() == "sqlite":
+        event.listen(sync_engine or engine, "connect", _set_sqlite_pragmas(_sqlite_pragmas(engine.url)))
+    elif uses_pgbouncer(engine.url) and DB_STATEMENT_TIMEOUT_MS > 0:
+        event.listen(sync_engine or engine, "begin", _set_local_statement_timeout)
+    return engine
+
+
+def _sync_url(database_url: str):
+    url = make_url(database_url)
+    if url.drivername in ("postgresql", "postgres"):
+        # Supabase hands out plain postgresql:// URLs; psycopg2 is the driver installed
+        url = url.set(drivername="postgresql+psycopg2")
+    return url
+
 
 def get_engine():
+    """The engine for DATABASE_URL, or the SQLite fallback. Nothing connects yet (check_connections)."""
     if DATABASE_URL:
         try:
-            # Try connecting to Supabase PostgreSQL
-            engine = create_engine(DATABASE_URL)
-            engine.connect()
-            print("INFO: Successfully connected to Supabase PostgreSQL.")
-            return engine
+            # Usually Supabase PostgreSQL; a sqlite:/// URL runs SQLite production mode
+            url = _sync_url(DATABASE_URL)
+            return _configure(create_engine(url, **engine_options(url)))
         except Exception as e:
-            print(f"WARNING: Supabase connection failed ({e}). Falling back to SQLite.")
-    
-    # Fallback to local SQLite file
-    return create_engine(SQLITE_URL, connect_args={"check_same_thread": False})
+            print(f"WARNING: DATABASE_URL is unusable ({e}). Falling back to {SQLITE_URL}.")
+    return get_fallback_engine()
+
+def get_fallback_engine():
+    """The local SQLite file."""
+    url = make_url(SQLITE_URL)
+    return _configure(create_engine(url, connect_args={"check_same_thread": False}, **engine_options(url)))
 
-engine = get_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_read_engine(primary):
+    """The replica's engine, or `primary` when there is none (or the primary is the SQLite fallback)."""
+    if not DATABASE_READ_URL or primary.url.render_as_string(hide_password=False) == SQLITE_URL:
+        return primary
+    try:
+        url = _sync_url(DATABASE_READ_URL)
+        connect_args = {"check_same_thread": False} if url.get_backend_name() == "sqlite" else {}
+        options = engine_options(url, replica=True)
+        options["connect_args"] = {**options.get("connect_args", {}), **connect_args}
+        return _configure(create_engine(url, **options))
+    except Exception as e:
+        print(f"WARNING: DATABASE_READ_URL is unusable ({e}). Reading from the primary.")
+        return primary
 
 Base = declarative_base()
 
@@ -40,3 +218,178 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# --- ASYNC ENGINE ---
+# Used by the async endpoints (chat, history, attendance) so database round
+# trips never block the event loop. It always targets the same database the
+# sync engine settled on: asyncpg for PostgreSQL, aiosqlite for the fallback.
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def get_async_url(url):
+    async_url = url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+    # asyncpg does not understand libpq's sslmode parameter
+    if "sslmode" in async_url.query:
+        async_url = async_url.update_query_dict({"ssl": async_url.query["sslmode"]})
+        async_url = async_url.difference_update_query(["sslmode"])
+    if uses_pgbouncer(url):
+        # SQLAlchemy's own prepared statement cache, on top of asyncpg's
+        async_url = async_url.update_query_dict({"prepared_statement_cache_size": "0"})
+    return async_url
+
+def get_async_engine(sync_engine, replica: bool = False):
+    url = get_async_url(sync_engine.url)
+    async_engine = create_async_engine(url, **engine_options(url, asynchronous=True, replica=replica))
+    return _configure(async_engine, async_engine.sync_engine)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# --- SQLITE WRITER ---
+# write_queue.py's single connection. Its transactions start with BEGIN
+# IMMEDIATE, so they take the write lock up front instead of failing with
+# "database is locked" when a read transaction tries to become a write.
+def _begin_immediate_on_connect(dbapi_connection, connection_record):
+    # The driver stops opening transactions itself; _begin_immediate does
+    dbapi_connection.isolation_level = None
+
+
+def _begin_immediate(conn):
+    # On the driver connection, like COMMIT, so it is not counted as a statement
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+    finally:
+        cursor.close()
+
+
+def get_write_engine(async_engine):
+    """The async writer engine for a file-backed SQLite database, or None (write in the request's session)."""
+    if not SQLITE_WRITE_QUEUE or async_engine.dialect.name != "sqlite" or async_engine.url.database in (None, "", ":memory:"):
+        return None
+    write_engine = create_async_engine(async_engine.url, poolclass=WritePool, pool_size=1, max_overflow=0)
+    event.listen(write_engine.sync_engine, "connect", _begin_immediate_on_connect)
+    event.listen(write_engine.sync_engine, "begin", _begin_immediate)
+    return _configure(write_engine, write_engine.sync_engine)
+
+
+# --- ENGINES AND SESSIONS ---
+def _bind(primary, replica) -> None:
+    """Sets every engine and sessionmaker of this module from the sync primary and replica engines."""
+    global engine, SessionLocal, read_engine, ReadSessionLocal, async_engine, AsyncSessionLocal
+    global async_read_engine, AsyncReadSessionLocal, async_write_engine, AsyncWriteSessionLocal
+    engine, read_engine = primary, replica
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    async_engine = get_async_engine(engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    async_read_engine = async_engine if read_engine is engine else get_async_engine(read_engine, replica=True)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    async_write_engine = get_write_engine(async_engine)
+    AsyncWriteSessionLocal = async_write_engine and async_sessionmaker(
+        async_write_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+_primary = get_engine()
+_bind(_primary, get_read_engine(_primary))
+
+
+def _connects(target, name: str) -> bool:
+    try:
+        # Returned to the pool, where it serves the first request
+        with target.connect():
+            pass
+        return True
+    except Exception as e:
+        print(f"WARNING: {name} connection failed ({e}).")
+        return False
+
+
+def check_connections() -> None:
+    """
+    Opens the first connection to the primary and the replica. Run by the
+    app's startup hook rather than on import, so importing this module (the
+    app, scripts, migrations) never waits on the network. An unreachable
+    primary is replaced by the SQLite fallback, and an unreachable replica by
+    the primary, before any request is served.
+    """
+    primary, replica = engine, read_engine
+    if not _connects(primary, "DATABASE_URL"):
+        if primary.url.render_as_string(hide_password=False) == SQLITE_URL:
+            return
+        print(f"WARNING: Falling back to {SQLITE_URL}.")
+        primary = replica = get_fallback_engine()
+    else:
+        print(f"INFO: Connected to {primary.url.render_as_string()}.")
+        if replica is not primary:
+            if _connects(replica, "Read replica"):
+                print("INFO: Dashboard reads go to the read replica.")
+            else:
+                print("WARNING: Reading from the primary.")
+                replica = primary
+    if (primary, replica) != (engine, read_engine):
+        for old in {engine, read_engine} - {primary, replica}:
+            old.dispose()
+        _bind(primary, replica)
+
+
+def labelled_engines() -> dict:
+    """{pool label: sync engine} for every distinct engine, for metrics."""
+    engines = {"sync": engine, "async": async_engine.sync_engine}
+    if read_engine is not engine:
+        engines.update({"read": read_engine, "async-read": async_read_engine.sync_engine})
+    if async_write_engine is not None:
+        engines["write"] = async_write_engine.sync_engine
+    return engines
+
+
+# --- READ ROUTING ---
+# class_id -> time.monotonic() of its latest write in this process. Other
+# workers do not see it, so with several workers keep READ_YOUR_WRITES_SECONDS
+# above the replica's lag.
+_recent_writes = {}
+_all_written_at = 0.0
+
+
+def mark_written(class_id: Optional[int] = None) -> None:
+    """Send the class's reads (every class's, when None) to the primary for READ_YOUR_WRITES_SECONDS."""
+    global _all_written_at
+    if class_id is None:
+        _all_written_at = time.monotonic()
+    else:
+        _recent_writes[class_id] = time.monotonic()
+
+
+def recently_written(class_ids: Optional[Iterable[int]]) -> bool:
+    """Whether one of class_ids (any class, when None) was written within READ_YOUR_WRITES_SECONDS."""
+    since = time.monotonic() - READ_YOUR_WRITES_SECONDS
+    if class_ids is None:
+        class_ids = list(_recent_writes)
+    return _all_written_at > since or any(_recent_writes.get(class_id, 0.0) > since for class_id in class_ids)
+
+
+def read_sessionmaker(class_ids: Optional[Iterable[int]] = (), asynchronous: bool = False):
+    """The replica's sessionmaker, unless there is none or one of class_ids (None: any) was just written."""
+    if read_engine is engine or recently_written(class_ids):
+        return AsyncSessionLocal if asynchronous else SessionLocal
+    return AsyncReadSessionLocal if asynchronous else ReadSessionLocal
+
+
+def _path_class_ids(request: Request) -> List[int]:
+    class_id = request.path_params.get("class_id")
+    return [int(class_id)] if class_id is not None else []
+
+
+def get_read_db(request: Request):
+    """Like get_db, but reads from the replica when the route's class_id was not written recently."""
+    db = read_sessionmaker(_path_class_ids(request))()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    async with read_sessionmaker(_path_class_ids(request), asynchronous=True)() as db:
+        yield db
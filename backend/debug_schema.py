@@ -5,12 +5,14 @@ import models
 from database import engine
 from sqlalchemy import inspect
 inspector = inspect(engine)
-columns = inspector.get_columns('attendance')
-print('ATTENDANCE COLUMNS:')
-for col in columns:
-    print(f"- {col['name']} ({col['type']})")
+for table in ('attendance_sessions', 'attendance_exceptions'):
+    columns = inspector.get_columns(table)
+    print(f'{table.upper()} COLUMNS:')
+    for col in columns:
+        print(f"- {col['name']} ({col['type']})")
+    print()
 
 columns = inspector.get_columns('chat_messages')
-print('\nCHAT_MESSAGES COLUMNS:')
+print('CHAT_MESSAGES COLUMNS:')
 for col in columns:
     print(f"- {col['name']} ({col['type']})")
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+Deterministic synthetic institution for load tests and benchmarks.
+
+Generates departments of classes with rosters, subjects and faculty
+assignments, then months of timetabled sessions. Each session marks every
+student of the class the way chat does (exception rows for the absentees,
+everyone else Present through the session row), with the chat message that
+marked it, the system's reply and a session log. Daily summaries are
+derived from the same records. The same seed and options always produce
+the same database.
+
+Absences are uneven, as in real registers:
+- each student has their own absence rate (most rarely miss, a few often do);
+- some days are worse for the whole class;
+- on duty comes in groups of students away at the same event;
+- leave is rare.
+
+Rows go through snapshot.load, the same bulk loader as restore (COPY on
+PostgreSQL, batched executemany on SQLite), into an empty database:
+
+    python generate_dataset.py [--url sqlite:///./bench.db] [--replace] [--departments 4]
+        [--classes 4] [--students 60] [--subjects 6] [--months 5] [--seed 1]
+
+The defaults produce about 410k attendance records (7k sessions and 48k
+exception rows); --departments 10 --months 12 about 2.2M.
+"""
+import argparse
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List
+
+import attendance_status
+import models
+import snapshot
+from snapshot import Batch
+
+DEPARTMENT_CODES = ["CSE", "ECE", "EEE", "MECH", "CIVIL", "IT", "AIDS", "CSBS", "BME", "CHEM"]
+SESSION_HOURS = [9, 10, 11, 13, 14, 15, 16]
+TOPICS = ["Introduction", "Worked examples", "Problem solving", "Lab walkthrough", "Revision", "Quiz", "Case study"]
+
+STATUS_NAMES = {code: attendance_status.decode(code) for code in attendance_status.NAMES}
+
+
+@dataclass
+class Options:
+    departments: int = 4
+    classes: int = 4              # per department
+    students: int = 60            # per class
+    subjects: int = 6             # per class, shared by the department's classes
+    months: int = 5
+    start: date = date(2026, 1, 5)
+    seed: int = 1
+    year: int = 25
+
+
+def _columns(table) -> List[str]:
+    return [c.name for c in table.__table__.columns]
+
+
+def _rows(table, items: List[dict]) -> Batch:
+    columns = _columns(table)
+    return table.__tablename__, columns, [[item.get(c) for c in columns] for item in items]
+
+
+def _working_days(options: Options) -> List[date]:
+    end = options.start + timedelta(days=round(options.months * 30.4))
+    rng = random.Random(options.seed * 7919)
+    days, day = [], options.start
+    while day < end:
+        # Weekends off, plus the odd holiday
+        if day.weekday() < 5 and rng.random() > 0.04:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def generate(options: Options) -> Iterator[Batch]:
+    """(table, columns, rows) batches, parents first, class by class for the bulk tables."""
+    rng = random.Random(options.seed)
+    days = _working_days(options)
+
+    users, faculty, subjects, classes, assignments, students = [], [], [], [], [], []
+    users.append({"id": 1, "email": "admin@generated.test", "password": "123", "role": "admin"})
+    teaching = {}  # (class_id, subject_id) -> faculty_id
+    for d in range(options.departments):
+        dept = DEPARTMENT_CODES[d] if d < len(DEPARTMENT_CODES) else f"D{d + 1}"
+        dept_subjects = []
+        for k in range(options.subjects):
+            subject_id = len(subjects) + 1
+            subjects.append({"id": subject_id, "name": f"{dept} Subject {k + 1}", "code": f"{dept}{300 + k + 1}"})
+            dept_subjects.append(subject_id)
+        # About one teacher per two class-subjects
+        dept_faculty = []
+        for f in range(max(1, options.classes * options.subjects // 2)):
+            faculty_id = len(faculty) + 1
+            user_id = len(users) + 1
+            users.append({"id": user_id, "email": f"{dept.lower()}.faculty{f + 1}@generated.test", "password": "123", "role": "teacher"})
+            faculty.append({"id": faculty_id, "user_id": user_id, "name": f"{dept} Faculty {f + 1}", "department": dept})
+            dept_faculty.append(faculty_id)
+        for c in range(options.classes):
+            class_id = len(classes) + 1
+            classes.append({"id": class_id, "name": f"{options.year}{dept}{chr(ord('A') + c % 26)}{c // 26 or ''}",
+                            "advisor_id": dept_faculty[c % len(dept_faculty)]})
+            for subject_id in dept_subjects:
+                faculty_id = rng.choice(dept_faculty)
+                teaching[(class_id, subject_id)] = faculty_id
+                assignments.append({"id": len(assignments) + 1, "faculty_id": faculty_id, "subject_id": subject_id, "class_id": class_id})
+            for i in range(1, options.students + 1):
+                roll = f"{options.year}{dept}{chr(ord('A') + c % 26)}{i:03d}"
+                students.append({
+                    "id": len(students) + 1, "roll_number": roll, "roll_suffix": models.roll_suffix(roll),
+                    "reg_number": f"7140{options.year}{d:02d}{c:03d}{i:04d}", "name": f"Student {dept} {c + 1}-{i}",
+                    "class_id": class_id, "enrolled_version": 0
+                })
+
+    for table, items in ((models.User, users), (models.Faculty, faculty), (models.Subject, subjects),
+                         (models.Class, classes), (models.FacultySubject, assignments), (models.Student, students)):
+        yield _rows(table, items)
+
+    counters = {"summary": 0, "chat": 0, "log": 0}
+    for cls in classes:
+        roster = [s for s in students if s["class_id"] == cls["id"]]
+        yield from _class_sessions(rng, cls["id"], roster, teaching, days, counters)
+
+
+def _class_sessions(rng, class_id, roster, teaching, days, counters) -> Iterator[Batch]:
+    # Most students rarely miss a class; a long tail misses often
+    absence_rate = {s["id"]: min(0.6, rng.betavariate(1.2, 14)) for s in roster}
+    subject_ids = [subject_id for (c, subject_id) in teaching if c == class_id]
+    # Each subject meets on three or four fixed weekdays, at a fixed hour
+    timetable = {
+        subject_id: (set(rng.sample(range(5), rng.choice((3, 4)))), rng.choice(SESSION_HOURS))
+        for subject_id in subject_ids
+    }
+
+    sessions, exceptions, summaries, messages, logs = [], [], [], [], []
+    # Every student is enrolled from the start (version 0), so each session fills them all
+    filled_through = 0
+    for day in days:
+        # Some days are worse for everyone (exams nearby, bad weather, festivals)
+        day_factor = rng.choice((1, 1, 1, 1, 1.5, 2.5))
+        on_duty = set(rng.sample([s["id"] for s in roster], k=min(len(roster), rng.randint(3, 8)))) \
+            if rng.random() < 0.05 else set()
+        for subject_id in subject_ids:
+            weekdays, hour = timetable[subject_id]
+            if day.weekday() not in weekdays:
+                continue
+            counts = dict.fromkeys(attendance_status.NAMES, 0)
+            marked = []
+            for student in roster:
+                if student["id"] in on_duty:
+                    code = attendance_status.OD
+                elif rng.random() < 0.008:
+                    code = attendance_status.LEAVE
+                elif rng.random() < absence_rate[student["id"]] * day_factor:
+                    code = attendance_status.ABSENT
+                else:
+                    code = attendance_status.PRESENT
+                counts[code] += 1
+                if code != attendance_status.PRESENT:
+                    marked.append((student["roll_number"], code))
+                    exceptions.append([class_id, subject_id, day.isoformat(), student["id"], code])
+            # Marked the way chat does: the absentees, and everyone else Present through the session
+            sessions.append([class_id, subject_id, day.isoformat(), filled_through])
+            counters["summary"] += 1
+            summaries.append([
+                counters["summary"], class_id, subject_id, day.isoformat(),
+                counts[attendance_status.PRESENT], counts[attendance_status.ABSENT],
+                counts[attendance_status.OD], counts[attendance_status.LEAVE], len(roster)
+            ])
+            at = datetime.combine(day, time(hour, rng.randint(0, 9)))
+            faculty_id = teaching[(class_id, subject_id)]
+            text = ", ".join(f"{models.roll_suffix(roll)} {STATUS_NAMES[code].lower()}" for roll, code in marked) \
+                or "everyone present"
+            for offset, (message_text, message_type, sender) in enumerate((
+                (text, "teacher", faculty_id),
+                (f"Marked {len(marked)} students, the rest Present.", "system", None),
+            )):
+                counters["chat"] += 1
+                messages.append([
+                    counters["chat"], class_id, subject_id, message_text, message_type,
+                    (at + timedelta(seconds=offset)).isoformat(), sender
+                ])
+            counters["log"] += 1
+            logs.append([
+                counters["log"], day.isoformat(), f"{rng.choice(TOPICS)}: unit {rng.randint(1, 5)}",
+                class_id, subject_id, faculty_id, (at + timedelta(minutes=50)).isoformat()
+            ])
+        if len(exceptions) >= snapshot.BATCH_SIZE:
+            yield "attendance_sessions", _SESSION_COLUMNS, sessions
+            yield "attendance_exceptions", _EXCEPTION_COLUMNS, exceptions
+            sessions, exceptions = [], []
+    if sessions:
+        yield "attendance_sessions", _SESSION_COLUMNS, sessions
+        yield "attendance_exceptions", _EXCEPTION_COLUMNS, exceptions
+    yield "attendance_daily_summary", _SUMMARY_COLUMNS, summaries
+    yield "chat_messages", _CHAT_COLUMNS, messages
+    yield "session_logs", _LOG_COLUMNS, logs
+
+
+_SESSION_COLUMNS = ["class_id", "subject_id", "date", "filled_through"]
+_EXCEPTION_COLUMNS = ["class_id", "subject_id", "date", "student_id", "status_code"]
+_SUMMARY_COLUMNS = ["id", "class_id", "subject_id", "date", "present", "absent", "od", "leave", "total"]
+_CHAT_COLUMNS = ["id", "class_id", "subject_id", "message_text", "message_type", "timestamp", "faculty_id"]
+_LOG_COLUMNS = ["id", "date", "content", "class_id", "subject_id", "faculty_id", "timestamp"]
+
+
+if __name__ == "__main__":
+    defaults = Options()
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--url", help="target database (default: the app's); must be empty unless --replace")
+    arg_parser.add_argument("--replace", action="store_true", help="delete the target's existing rows first")
+    arg_parser.add_argument("--departments", type=int, default=defaults.departments)
+    arg_parser.add_argument("--classes", type=int, default=defaults.classes, help="classes per department")
+    arg_parser.add_argument("--students", type=int, default=defaults.students, help="students per class")
+    arg_parser.add_argument("--subjects", type=int, default=defaults.subjects, help="subjects per class")
+    arg_parser.add_argument("--months", type=int, default=defaults.months, help="months of attendance")
+    arg_parser.add_argument("--start", type=date.fromisoformat, default=defaults.start, help="first day (YYYY-MM-DD)")
+    arg_parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = arg_parser.parse_args()
+    options = Options(args.departments, args.classes, args.students, args.subjects, args.months, args.start, args.seed)
+    engine = snapshot.engine_for(args.url)
+    print(f"Generating into {engine.url.render_as_string()}")
+    snapshot.load(engine, generate(options), args.replace)
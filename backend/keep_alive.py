@@ -1,4 +1,3 @@
-import requests
 import time
 import os
 import threading
@@ -11,6 +10,7 @@ def ping_server():
         print("⚠ No RENDER_EXTERNAL_URL found. Keep-alive ping disabled.")
         return
 
+    import requests  # Only needed when pinging; keeps it out of app startup
     while True:
         try:
             print(f"⏰ Keep-alive: Pinging {PING_URL}...")
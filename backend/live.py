@@ -0,0 +1,149 @@
+"""
+Live chat and attendance updates per class/subject channel.
+
+chat_interaction and update_attendance publish to an in-process hub after
+they commit; every client subscribed to the channel (WebSocket, or Server-Sent
+Events where WebSockets are unavailable) receives the new chat messages and
+the attendance cells that changed.
+
+Each subscriber has a bounded queue. Events are encoded once per publish and
+dropped into every queue without waiting; a subscriber whose queue is full is
+disconnected with a "resync" event instead of buffering without limit, and
+catches up through /chat/history?after= and the attendance sheet.
+
+The hub lives in one process. Deployments running several workers only reach
+the clients connected to the worker that handled the write.
+"""
+import asyncio
+import json
+import os
+from datetime import date
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))
+KEEPALIVE_SECONDS = 15
+
+RESYNC = json.dumps({"type": "resync"})
+
+Channel = Tuple[int, int]
+
+
+class Subscription:
+    def __init__(self, channel: Channel):
+        self.channel = channel
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    async def next(self) -> Optional[str]:
+        """The next encoded event, or None once the subscriber fell too far behind."""
+        return await self.queue.get()
+
+
+class Hub:
+    def __init__(self):
+        self._channels: Dict[Channel, Set[Subscription]] = {}
+
+    def subscribe(self, class_id: int, subject_id: int) -> Subscription:
+        subscription = Subscription((class_id, subject_id))
+        self._channels.setdefault(subscription.channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._channels.get(subscription.channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[subscription.channel]
+
+    def publish(self, class_id: int, subject_id: int, event: dict) -> None:
+        """Queue `event` for every subscriber of the channel. Must run on the event loop."""
+        subscribers = self._channels.get((class_id, subject_id))
+        if not subscribers:
+            return
+        data = json.dumps(event)
+        for subscription in list(subscribers):
+            try:
+                subscription.queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Too slow: free its backlog and tell it to start over
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(None)
+                self.unsubscribe(subscription)
+
+
+hub = Hub()
+
+
+# --- EVENTS ---
+def publish_messages(class_id: int, subject_id: int, *messages: dict) -> None:
+    for message in messages:
+        hub.publish(class_id, subject_id, {"type": "message", "message": message})
+
+
+def publish_attendance(class_id: int, subject_id: int, day: date, statuses: Dict[int, str], auto_present: bool = False) -> None:
+    """Attendance cells written for a day. auto_present means every other empty cell became Present."""
+    if not statuses and not auto_present:
+        return
+    hub.publish(class_id, subject_id, {
+        "type": "attendance",
+        "date": day.isoformat(),
+        "entries": [{"student_id": student_id, "status": status} for student_id, status in statuses.items()],
+        "auto_present": auto_present
+    })
+
+
+# --- TRANSPORTS ---
+async def serve_websocket(websocket: WebSocket, class_id: int, subject_id: int) -> None:
+    await websocket.accept()
+    subscription = hub.subscribe(class_id, subject_id)
+
+    async def send():
+        while True:
+            data = await subscription.next()
+            await websocket.send_text(RESYNC if data is None else data)
+            if data is None:
+                return
+
+    async def receive():
+        # Clients only listen; this returns when they disconnect
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.unsubscribe(subscription)
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass  # Already closed by the client
+
+
+def event_stream(request: Request, class_id: int, subject_id: int) -> StreamingResponse:
+    """Server-Sent Events fallback carrying the same events as the WebSocket."""
+    subscription = hub.subscribe(class_id, subject_id)
+
+    async def stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(subscription.next(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {RESYNC if data is None else data}\n\n"
+                if data is None:
+                    return
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
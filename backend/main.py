@@ -1,25 +1,28 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Query, Request, Response, WebSocket
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from sqlalchemy.exc import OperationalError
-from typing import List
-import pandas as pd
-import io
-import re
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func
+from typing import List, Optional
 from datetime import date, datetime
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import asyncio
+import sys
 import models, schemas, database
-from database import engine
-
-try:
-    models.Base.metadata.create_all(bind=engine)
-except OperationalError as e:
-    print(f"Warning: Could not connect to database. Error: {e}")
-except Exception as e:
-    print(f"Warning: Unexpected error: {e}")
+import roster_index, roster_import, attendance_export, repository, data_version, live, attendance_status
+import metrics, warmup, write_queue
 
+# The schema is brought up to date by `python migrate.py` (see build.sh), not
+# on import, so cold starts do not pay for it.
 app = FastAPI()
 
+@app.on_event("startup")
+async def start_up():
+    # Connecting waits for startup, so importing the app stays off the network
+    await asyncio.to_thread(database.check_connections)
+    metrics.instrument(database.labelled_engines())
+    warmup.start()
+
 # --- KEEP ALIVE (For Render Free Tier) ---
 try:
     from keep_alive import start_keep_alive
@@ -37,11 +40,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+def registers_on_commit(*args, **kwargs):
+    """attendance_matrix.on_commit, once a matrix read has imported it (and NumPy); until then nothing is cached."""
+    attendance_matrix = sys.modules.get("attendance_matrix")
+    if attendance_matrix is not None:
+        attendance_matrix.on_commit(*args, **kwargs)
 
 @app.get("/")
 def read_root():
     return {"message": "AttMate Backend is running!"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Request latency, SQL statements, database time and rows per route, in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/seed-db")
 def seed_remote_db():
     import os
@@ -130,7 +146,11 @@ def create_faculty(faculty: schemas.FacultyCreate, name: str, dept: str, db: Ses
 def assign_subject(assignment: schemas.FacultySubjectCreate, db: Session = Depends(database.get_db)):
     db_assignment = models.FacultySubject(**assignment.dict())
     db.add(db_assignment)
+    version = data_version.bump(db, assignment.class_id)
     db.commit()
+    if version is not None:
+        registers_on_commit(assignment.class_id, version)
+        roster_index.on_commit(assignment.class_id, version)
     return {"message": "Assigned successfully"}
 
 @app.get("/admin/subjects", response_model=List[schemas.Subject])
@@ -149,8 +169,11 @@ def create_subject(sub: schemas.SubjectCreate, db: Session = Depends(database.ge
 def reset_history(db: Session = Depends(database.get_db)):
     """Reset all attendance and chat history."""
     try:
-        db.query(models.Attendance).delete()
+        db.query(models.AttendanceException).delete()
+        db.query(models.AttendanceSession).delete()
+        db.query(models.AttendanceDailySummary).delete()
         db.query(models.ChatMessage).delete()
+        data_version.bump_all(db)
         db.commit()
         return {"message": "Attendance and chat history reset successfully"}
     except Exception as e:
@@ -158,32 +181,74 @@ def reset_history(db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 # --- TEACHER ENDPOINTS ---
+def _teacher_classes(db: Session, faculty: models.Faculty) -> List[dict]:
+    """The faculty's classes with the subjects they teach in each, from one join query."""
+    rows = db.query(models.Class, models.Subject).select_from(models.FacultySubject).join(
+        models.Class, models.Class.id == models.FacultySubject.class_id
+    ).join(
+        models.Subject, models.Subject.id == models.FacultySubject.subject_id
+    ).filter(
+        models.FacultySubject.faculty_id == faculty.id
+    ).order_by(models.Class.id, models.Subject.id).all()
+
+    classes = {}
+    for cls, sub in rows:
+        entry = classes.setdefault(cls.id, {"id": cls.id, "name": cls.name, "subjects": []})
+        # Skip duplicate assignments of the same subject
+        if not entry["subjects"] or entry["subjects"][-1]["id"] != sub.id:
+            entry["subjects"].append({"id": sub.id, "name": sub.name})
+    return list(classes.values())
+
+def _class_stats(db: Session, subjects_by_class: dict) -> dict:
+    """
+    Attendance stats for several classes at once: {class_id: {"overall", "subjects"}}.
+    subjects_by_class maps each class id to the subjects ({"id", "name"}) to report, in order.
+    Uses two grouped queries (roster sizes and daily summary totals) however many classes there are.
+    """
+    class_ids = list(subjects_by_class)
+    if not class_ids:
+        return {}
+    total_students = dict(db.query(models.Student.class_id, func.count()).filter(
+        models.Student.class_id.in_(class_ids)
+    ).group_by(models.Student.class_id).all())
+
+    # Sessions (summary rows) and Present/OD records per class and subject
+    summary = models.AttendanceDailySummary
+    subject_totals = {
+        (class_id, sub_id): (sessions, present_od)
+        for class_id, sub_id, sessions, present_od in db.query(
+            summary.class_id, summary.subject_id, func.count(), func.sum(summary.present + summary.od)
+        ).filter(
+            summary.class_id.in_(class_ids)
+        ).group_by(summary.class_id, summary.subject_id)
+    }
+
+    stats = {}
+    for class_id, subjects in subjects_by_class.items():
+        students = total_students.get(class_id, 0)
+        if students == 0:
+            stats[class_id] = {"overall": 0, "subjects": []}
+            continue
+
+        subject_stats = []
+        for sub in subjects:
+            sessions, present_od_count = subject_totals.get((class_id, sub["id"]), (0, 0))
+            # Total possible attendance = Sessions * Total Students
+            total_possible = sessions * students
+            att_percent = round((present_od_count / total_possible) * 100, 1) if total_possible > 0 else 0
+            subject_stats.append({**sub, "attendance": att_percent, "working_days": sessions})
+
+        # Overall class average is the average of the subject percentages
+        overall_avg = round(sum(s["attendance"] for s in subject_stats) / len(subject_stats), 1) if subject_stats else 0
+        stats[class_id] = {"overall": overall_avg, "subjects": subject_stats}
+    return stats
+
 @app.get("/teacher/my-classes")
 def get_teacher_classes(user_id: int, db: Session = Depends(database.get_db)):
     faculty = db.query(models.Faculty).filter(models.Faculty.user_id == user_id).first()
     if not faculty:
         return []
-    
-    # Get all distinct classes assigned to this faculty
-    assignments = db.query(models.FacultySubject).filter(models.FacultySubject.faculty_id == faculty.id).all()
-    class_ids = list(set([a.class_id for a in assignments]))
-    classes = db.query(models.Class).filter(models.Class.id.in_(class_ids)).all()
-    
-    result = []
-    for c in classes:
-        # Get subjects for this class for this teacher
-        # Use distinct to avoid duplicates if multiple assignments exist
-        subs = db.query(models.Subject).join(models.FacultySubject).filter(
-            models.FacultySubject.class_id == c.id, 
-            models.FacultySubject.faculty_id == faculty.id
-        ).distinct().all()
-        
-        result.append({
-            "id": c.id,
-            "name": c.name,
-            "subjects": [{"id": s.id, "name": s.name} for s in subs]
-        })
-    return result
+    return _teacher_classes(db, faculty)
 
 @app.get("/teacher/my-advisory-class")
 def get_advisory_class(user_id: int, db: Session = Depends(database.get_db)):
@@ -196,10 +261,8 @@ def get_advisory_class(user_id: int, db: Session = Depends(database.get_db)):
         return None
     return {"id": cls.id, "name": cls.name}
 
-@app.get("/teacher/class-stats/{class_id}")
-def get_class_stats(class_id: int, user_id: int, db: Session = Depends(database.get_db)):
-    from sqlalchemy import func
-    
+@app.get("/teacher/class-stats/{class_id}", dependencies=[Depends(data_version.not_modified)])
+def get_class_stats(class_id: int, user_id: int, db: Session = Depends(database.get_read_db)):
     print(f"DEBUG: get_class_stats class_id={class_id} user_id={user_id}")
     
     # 1. Verify Class Exists
@@ -245,62 +308,45 @@ def get_class_stats(class_id: int, user_id: int, db: Session = Depends(database.
             
     print(f"DEBUG: Found {len(unique_assignments)} unique subjects for stats.")
 
-    # Calculate overall attendance for the class
-    total_students = db.query(models.Student).filter(models.Student.class_id == class_id).count()
-    if total_students == 0:
-        return {"overall": 0, "subjects": []}
-    
-    # Subject wise stats
-    subject_stats = []
-    
-    total_percentage_sum = 0
-    subject_count = 0
-    # Correction: To calculate overall attendance, we should sum all subject % and divide by count?
-    # Or calculate (Total Present across all subjects / Total Sessions * Students)?
-    # Let's stick to average of percentages for now or simplified logic.
-    
-    for a in unique_assignments:
-        sub = db.query(models.Subject).filter(models.Subject.id == a.subject_id).first()
-        
-        # 1. Calculate Total Sessions (Unique Dates)
-        sessions_query = db.query(models.Attendance.date).filter(
-            models.Attendance.class_id == class_id,
-            models.Attendance.subject_id == sub.id
-        ).distinct().all()
-        sessions = len(sessions_query)
-        
-        # 2. Calculate Total Present/OD Records
-        present_od_count = db.query(models.Attendance).filter(
-            models.Attendance.class_id == class_id,
-            models.Attendance.subject_id == sub.id,
-            func.lower(models.Attendance.status).in_(['present', 'od', 'p', 'o'])
-        ).count()
-        
-        # 3. Calculate Percentage
-        # Total possible attendance = Sessions * Total Students
-        total_possible = sessions * total_students
-        
-        if total_possible > 0:
-            att_percent = round((present_od_count / total_possible) * 100, 1)
-        else:
-            att_percent = 0
-            
-        subject_stats.append({
-            "id": sub.id,
-            "name": sub.name,
-            "attendance": att_percent,
-            "working_days": sessions
-        })
-        
-        total_percentage_sum += att_percent
-        subject_count += 1
-    
-    # Calculate overall class average
-    overall_avg = round(total_percentage_sum / subject_count, 1) if subject_count > 0 else 0
-    
+    subject_ids = [a.subject_id for a in unique_assignments]
+    sub_map = {s.id: s.name for s in db.query(models.Subject).filter(models.Subject.id.in_(subject_ids))}
+    subjects = [{"id": sub_id, "name": sub_map[sub_id]} for sub_id in subject_ids]
+    return _class_stats(db, {class_id: subjects})[class_id]
+
+@app.get("/teacher/bootstrap")
+def get_teacher_bootstrap(user_id: int, request: Request, response: Response, db: Session = Depends(database.get_db)):
+    """
+    Everything the teacher home screen needs in one round trip: faculty profile,
+    classes with their subjects, advisory class and stats for each of those classes.
+    Tagged with an ETag over the versions of those classes, so revalidating an
+    unchanged screen is a 304 after two lookups.
+    """
+    faculty = db.query(models.Faculty).filter(models.Faculty.user_id == user_id).first()
+    if not faculty:
+        raise HTTPException(status_code=404, detail="Faculty not found")
+    data_version.respond(request, response, data_version.teacher_etag(db, faculty.id))
+
+    classes = _teacher_classes(db, faculty)
+    advisory = db.query(models.Class).filter(models.Class.advisor_id == faculty.id).first()
+
+    # Same subject rules as class-stats: assigned subjects, or every subject of the advisory class
+    subjects_by_class = {c["id"]: c["subjects"] for c in classes}
+    if advisory:
+        advisory_subjects = {}
+        for sub in db.query(models.Subject).join(
+            models.FacultySubject, models.FacultySubject.subject_id == models.Subject.id
+        ).filter(
+            models.FacultySubject.class_id == advisory.id
+        ).order_by(models.FacultySubject.id):
+            advisory_subjects.setdefault(sub.id, {"id": sub.id, "name": sub.name})
+        subjects_by_class[advisory.id] = list(advisory_subjects.values())
+
+    stats = _class_stats(db, subjects_by_class)
     return {
-        "overall": overall_avg,
-        "subjects": subject_stats
+        "faculty": {"id": faculty.id, "name": faculty.name, "department": faculty.department},
+        "classes": classes,
+        "advisory_class": {"id": advisory.id, "name": advisory.name} if advisory else None,
+        "stats": {str(class_id): class_stats for class_id, class_stats in stats.items()}
     }
 
 # --- CHAT & ATTENDANCE ---
@@ -310,11 +356,10 @@ async def chat_interaction(
     class_id: int, 
     subject_id: int,
     faculty_id: int = None,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     from datetime import date, datetime
-    from smart_parser import AdvancedAttendanceParser
-    from sqlalchemy import and_
+    from smart_parser import default_parser
     
     # Save user message to database
     user_msg = models.ChatMessage(
@@ -325,14 +370,11 @@ async def chat_interaction(
         faculty_id=faculty_id,
         timestamp=datetime.utcnow()
     )
-    db.add(user_msg)
-    db.flush()  # Get the ID without committing yet
-    
-    # Initialize smart parser
-    parser = AdvancedAttendanceParser()
+    # Rows to insert along with the attendance (write_queue.run below)
+    new_rows = [user_msg]
     
-    # Parse the input
-    parse_result = parser.parse(message, class_id, subject_id)
+    # Parse the input (the shared parser is stateless)
+    parse_result = default_parser.parse(message, class_id, subject_id)
     
     response_text = ""
     processed_count = 0
@@ -340,9 +382,10 @@ async def chat_interaction(
     
     # List to track students who were marked (absent/od/present)
     marked_student_ids = []
-
-    # Calculate start of day for queries
-    today_start = datetime.combine(today, datetime.min.time())
+    marked_statuses = {}
+    auto_present = False
+    status_summary = []
+    ambiguous_note = ""
 
     # Check if parsing was successful
     if "error" not in parse_result:
@@ -357,7 +400,7 @@ async def chat_interaction(
                 subject_id=subject_id,
                 faculty_id=faculty_id
             )
-            db.add(db_log)
+            new_rows.append(db_log)
             response_text = f"Logged: {log_content[:50]}..." if len(log_content) > 50 else f"Logged: {log_content}"
             processed_count = 1
 
@@ -383,16 +426,10 @@ async def chat_interaction(
                         pass # Fallback to today if unparseable
                         
             # Query the database
-            records = db.query(models.Attendance, models.Student)\
-                        .join(models.Student, models.Attendance.student_id == models.Student.id)\
-                        .filter(models.Attendance.class_id == class_id,
-                                models.Attendance.subject_id == subject_id,
-                                models.Attendance.date == target_date,
-                                func.lower(models.Attendance.status) == query_status.lower())\
-                        .all()
+            records = await repository.students_with_status(db, class_id, subject_id, target_date, query_status)
             
             if records:
-                students_list = ", ".join([student.name for att, student in records])
+                students_list = ", ".join(records)
                 response_text = f"The following students were marked {query_status} on {target_date.strftime('%b %d, %Y')}:\n{students_list}"
             else:
                 response_text = f"Nobody was marked {query_status} on {target_date.strftime('%b %d, %Y')}."
@@ -416,100 +453,38 @@ async def chat_interaction(
                 entries_to_process.append((roll, status))
 
         
-        # Normalize statuses to strict DB case BEFORE processing
-        normalized_entries = []
-        for r, s in entries_to_process:
-            if s.lower() == 'od':
-                ns = 'OD'
-            else:
-                ns = s.capitalize()
-            normalized_entries.append((r, ns))
-        entries_to_process = normalized_entries
+        # Normalize statuses to their canonical names BEFORE processing
+        entries_to_process = [(r, attendance_status.canonical(s)) for r, s in entries_to_process]
+        
+        # Resolve every roll against the class roster and write all marked rows at once
+        resolved = await roster_index.resolve_rolls_async(db, class_id, [roll for roll, _ in entries_to_process])
         
         processed_students = []
         for roll, status in entries_to_process:
-            # Zero-pad numeric roll numbers up to 3 digits (e.g. '2' -> '002', '12' -> '012')
-            search_roll = roll.zfill(3) if roll.isdigit() and len(roll) < 3 else roll
-            
-            student = db.query(models.Student).filter(
-                models.Student.roll_number.endswith(search_roll),
-                models.Student.class_id == class_id
-            ).first()
-            
-            if student:
-                marked_student_ids.append(student.id)
+            student_id = resolved.students.get(roll)
+            if student_id is not None:
+                marked_student_ids.append(student_id)
                 processed_students.append(roll)
-                
-                # Check if record exists for today
-                att = db.query(models.Attendance).filter(
-                    models.Attendance.student_id == student.id,
-                    models.Attendance.date == today,
-                    models.Attendance.subject_id == subject_id
-                ).first()
-                
-                if not att:
-                    att = models.Attendance(
-                        date=today,
-                        status=status,
-                        student_id=student.id,
-                        class_id=class_id,
-                        subject_id=subject_id
-                    )
-                    db.add(att)
-                else:
-                    att.status = status
+                marked_statuses[student_id] = status
                 processed_count += 1
         
         # 2. AUTO-PRESENT LOGIC
         # If any students were marked as 'Absent' or 'OD', mark the rest as 'Present'
         has_absent_or_od = any(status in ['Absent', 'OD'] for _, status in entries_to_process)
+        auto_present = has_absent_or_od and bool(marked_student_ids)
         
-        if has_absent_or_od and marked_student_ids:
-            # Find all students in this class NOT in the marked list
-            if marked_student_ids:
-                all_students = db.query(models.Student).filter(
-                    models.Student.class_id == class_id,
-                    ~models.Student.id.in_(marked_student_ids) # NOT IN
-                ).all()
-            else:
-                all_students = db.query(models.Student).filter(
-                     models.Student.class_id == class_id
-                ).all()
-
-            auto_present_count = 0
-            for student in all_students:
-                # Check/Create attendance 'Present' for today
-                att = db.query(models.Attendance).filter(
-                    models.Attendance.student_id == student.id,
-                    models.Attendance.date == today,
-                    models.Attendance.subject_id == subject_id
-                ).first()
-                
-                if not att:
-                    att = models.Attendance(
-                        date=today,
-                        status="Present",
-                        student_id=student.id,
-                        class_id=class_id,
-                        subject_id=subject_id
-                    )
-                    db.add(att)
-                    auto_present_count += 1
-                # If already exists, we do NOT overwrite automatically to avoid accidents
-                # unless logic dictates otherwise. For now, we only fill gaps.
-
+        if auto_present:
             status_counts = {}
             for _, s in entries_to_process:
                 status_counts[s] = status_counts.get(s, 0) + 1
-            
-            summary_parts = [f"{count} {s}" for s, count in status_counts.items()]
-            if auto_present_count > 0:
-                summary_parts.append(f"{auto_present_count} Present (auto)")
-                
-            response_text = "Marked: " + ", ".join(summary_parts)
+            status_summary = [f"{count} {s}" for s, count in status_counts.items()]
         else:
              response_text = f"Updated records for {processed_count} students."
 
+        # Never guess between students sharing a roll suffix
+        for roll, matches in resolved.ambiguous.items():
+            ambiguous_note += f"\nRoll {roll} is ambiguous ({', '.join(matches)}). Use the full roll number."
+
     else:
         # Parsing failed - provide helpful error message
         response_text = parse_result.get('error', 'Could not parse input')
@@ -517,18 +492,39 @@ async def chat_interaction(
         if suggestions:
             response_text += "\n\nTry these formats:\n" + "\n".join(f"• {s}" for s in suggestions[:3])
     
-    # Save system response to database
-    system_msg = models.ChatMessage(
-        message_text=response_text,
-        message_type='system',
-        class_id=class_id,
-        subject_id=subject_id,
-        timestamp=datetime.utcnow()
-    )
-    db.add(system_msg)
-    db.commit()
-    db.refresh(user_msg)
-    db.refresh(system_msg)
+    # Every write happens here, after the reads, in one transaction
+    async def save(db: AsyncSession):
+        nonlocal response_text
+        db.add_all(new_rows)
+        # Auto-present fills every unmarked student of the class through the session row.
+        # Existing records are NOT overwritten automatically to avoid accidents;
+        # we only fill gaps.
+        auto_present_count = await repository.write_attendance(
+            db, class_id, subject_id, today, marked_statuses, fill_present=auto_present
+        )
+        if auto_present:
+            summary_parts = status_summary + ([f"{auto_present_count} Present (auto)"] if auto_present_count > 0 else [])
+            response_text = "Marked: " + ", ".join(summary_parts)
+        response_text += ambiguous_note
+
+        # Save system response to database
+        system_msg = models.ChatMessage(
+            message_text=response_text,
+            message_type='system',
+            class_id=class_id,
+            subject_id=subject_id,
+            timestamp=datetime.utcnow()
+        )
+        db.add(system_msg)
+        version = await repository.bump_data_version(db, class_id)
+        await db.flush()
+        return system_msg, version
+
+    system_msg, version = await write_queue.run(db, save)
+    registers_on_commit(class_id, version, subject_id, today, marked_statuses, auto_present)
+    roster_index.on_commit(class_id, version)
+    live.publish_messages(class_id, subject_id, chat_message_out(user_msg), chat_message_out(system_msg))
+    live.publish_attendance(class_id, subject_id, today, marked_statuses, auto_present)
     
     return {
         "response": response_text,
@@ -540,67 +536,12 @@ async def chat_interaction(
         "timestamp": system_msg.timestamp.isoformat()
     }
 
-@app.get("/teacher/attendance-sheet/{class_id}/{subject_id}")
-def get_attendance_sheet(class_id: int, subject_id: int, db: Session = Depends(database.get_db)):
-    # 1. Get all students in class
-    students = db.query(models.Student).filter(models.Student.class_id == class_id).order_by(models.Student.roll_number).all()
-    
-    # 2. Get all distinct dates for this subject and class
-    # We want dates where at least one attendance record exists
-    dates_query = db.query(models.Attendance.date).filter(
-        models.Attendance.class_id == class_id,
-        models.Attendance.subject_id == subject_id
-    ).distinct().order_by(models.Attendance.date.asc()).all()
-    
-    # Store as string "YYYY-MM-DD"
-    dates = [f"{d[0].isoformat()}" for d in dates_query]
-
-    # 3. Fetch all attendance records for this class and subject in ONE query (Bulk Fetch)
-    all_attendance = db.query(models.Attendance).filter(
-        models.Attendance.class_id == class_id,
-        models.Attendance.subject_id == subject_id
-    ).all()
+@app.get("/teacher/attendance-sheet/{class_id}/{subject_id}", dependencies=[Depends(data_version.not_modified)])
+async def get_attendance_sheet(class_id: int, subject_id: int, db: AsyncSession = Depends(database.get_async_read_db)):
+    return await repository.attendance_sheet(db, class_id, subject_id)
 
-    # Group records by student_id for O(1) lookup
-    from collections import defaultdict
-    student_att_map = defaultdict(dict)
-    for rec in all_attendance:
-        d_str = rec.date.isoformat()
-        
-        # Normalize status
-        short_s = "-"
-        raw_s = rec.status.lower() if rec.status else ""
-        if raw_s in ["present", "p"]: short_s = "P"
-        elif raw_s in ["absent", "a"]: short_s = "A"
-        elif raw_s in ["od", "o"]: short_s = "O"
-        
-        student_att_map[rec.student_id][d_str] = short_s
-
-    # 4. Build the grid using the in-memory map
-    grid = []
-    for student in students:
-        row = {
-            "id": student.id,
-            "name": student.name,
-            "roll": student.roll_number,
-            "attendance": {}
-        }
-        
-        # Get pre-filled attendance for this student
-        att_data = student_att_map.get(student.id, {})
-        
-        for d_key in dates:
-            row["attendance"][d_key] = att_data.get(d_key, "-")
-            
-        grid.append(row)
-        
-    return {
-        "dates": dates,
-        "students": grid
-    }
-
-@app.get("/teacher/day-details/{class_id}/{date_str}")
-def get_day_details(class_id: int, date_str: str, db: Session = Depends(database.get_db)):
+@app.get("/teacher/day-details/{class_id}/{date_str}", dependencies=[Depends(data_version.not_modified)])
+def get_day_details(class_id: int, date_str: str, db: Session = Depends(database.get_read_db)):
     try:
         target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
     except ValueError:
@@ -612,25 +553,20 @@ def get_day_details(class_id: int, date_str: str, db: Session = Depends(database
         models.SessionLog.date == target_date
     ).all()
 
-    # Fetch Attendance summary for this class on this date
-    # Group by subject
-    attendance_records = db.query(models.Attendance).filter(
-        models.Attendance.class_id == class_id,
-        models.Attendance.date == target_date
+    # Attendance counts for this class on this date, one summary row per subject
+    summary = models.AttendanceDailySummary
+    rows = db.query(summary, models.Subject.name).outerjoin(
+        models.Subject, models.Subject.id == summary.subject_id
+    ).filter(
+        summary.class_id == class_id,
+        summary.date == target_date
     ).all()
 
-    subjects = db.query(models.Subject).all()
-    sub_map = {s.id: s.name for s in subjects}
-
     att_summary = {}
-    for rec in attendance_records:
-        sub_name = sub_map.get(rec.subject_id, "Unknown")
-        if sub_name not in att_summary:
-            att_summary[sub_name] = {"Present": 0, "Absent": 0, "OD": 0, "Leave": 0}
-        
-        status = rec.status
-        if status in att_summary[sub_name]:
-            att_summary[sub_name][status] += 1
+    for row, sub_name in rows:
+        att_summary[sub_name or "Unknown"] = {
+            "Present": row.present, "Absent": row.absent, "OD": row.od, "Leave": row.leave
+        }
 
     return {
         "date": date_str,
@@ -638,8 +574,21 @@ def get_day_details(class_id: int, date_str: str, db: Session = Depends(database
         "attendance": att_summary
     }
 
+@app.get("/teacher/calendar/{class_id}/{subject_id}", dependencies=[Depends(data_version.not_modified)])
+def get_attendance_calendar(class_id: int, subject_id: int, db: Session = Depends(database.get_read_db)):
+    """Status counts for every day attendance was taken, for marking a calendar."""
+    summary = models.AttendanceDailySummary
+    rows = db.query(summary).filter(
+        summary.class_id == class_id,
+        summary.subject_id == subject_id
+    ).order_by(summary.date).all()
+    return {
+        row.date.isoformat(): {"Present": row.present, "Absent": row.absent, "OD": row.od, "Leave": row.leave}
+        for row in rows
+    }
+
 @app.post("/teacher/update-attendance")
-def update_attendance(data: dict, db: Session = Depends(database.get_db)):
+async def update_attendance(data: dict, db: AsyncSession = Depends(database.get_async_db)):
     """
     Manually update/override attendance record.
     Expected data: { student_id, class_id, subject_id, date, status }
@@ -658,126 +607,150 @@ def update_attendance(data: dict, db: Session = Depends(database.get_db)):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
 
-    # Check if record exists
-    record = db.query(models.Attendance).filter(
-        models.Attendance.student_id == student_id,
-        models.Attendance.class_id == class_id,
-        models.Attendance.subject_id == subject_id,
-        models.Attendance.date == target_date
-    ).first()
+    code = attendance_status.encode(status)
+    if code == attendance_status.OTHER:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    status = attendance_status.decode(code)
 
-    if record:
-        record.status = status
-    else:
-        record = models.Attendance(
-            student_id=student_id,
-            class_id=class_id,
-            subject_id=subject_id,
-            date=target_date,
-            status=status
-        )
-        db.add(record)
-    
-    db.commit()
+    # Single-statement upsert on the (student, subject, date) key
+    async def save(db: AsyncSession):
+        await repository.write_attendance(db, class_id, subject_id, target_date, {student_id: status})
+        return await repository.bump_data_version(db, class_id)
+
+    version = await write_queue.run(db, save)
+    registers_on_commit(class_id, version, subject_id, target_date, {student_id: status})
+    roster_index.on_commit(class_id, version)
+    live.publish_attendance(class_id, subject_id, target_date, {student_id: status})
     return {"status": "success", "new_status": status}
 
-@app.get("/teacher/session-logs/{class_id}/{subject_id}")
-def get_session_logs(class_id: int, subject_id: int, db: Session = Depends(database.get_db)):
+@app.get("/teacher/session-logs/{class_id}/{subject_id}", dependencies=[Depends(data_version.not_modified)])
+def get_session_logs(class_id: int, subject_id: int, db: Session = Depends(database.get_read_db)):
     logs = db.query(models.SessionLog).filter(
         models.SessionLog.class_id == class_id,
         models.SessionLog.subject_id == subject_id
     ).order_by(models.SessionLog.timestamp.desc()).all()
     return logs
 
-@app.get("/chat/history/{class_id}/{subject_id}")
-def get_chat_history(
+@app.get("/chat/history/{class_id}/{subject_id}", dependencies=[Depends(data_version.not_modified)])
+async def get_chat_history(
     class_id: int,
     subject_id: int,
-    limit: int = 100,
-    db: Session = Depends(database.get_db)
+    limit: int = Query(100, ge=1, le=200),
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_async_read_db)
 ):
-    """Get chat history for a specific class and subject"""
-    from datetime import date, datetime
-    today = date.today()
-    today_start = datetime.combine(today, datetime.min.time())
-    
-    messages = db.query(models.ChatMessage).filter(
-        models.ChatMessage.class_id == class_id,
-        models.ChatMessage.subject_id == subject_id
-    ).order_by(models.ChatMessage.timestamp.asc()).limit(limit).all()
-    
-    msgs_out = [
-        {
-            "id": msg.id,
-            "text": msg.message_text,
-            "type": msg.message_type,
-            "timestamp": msg.timestamp.isoformat()
-        }
-        for msg in messages
-    ]
+    """
+    Chat history for a class and subject, one page at a time, newest first.
+    Without a cursor this is the latest page. Pass `before` (the oldest id
+    shown) to scroll back, or `after` (the newest id shown) to catch up.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    messages, has_more = await repository.chat_history(db, class_id, subject_id, limit, before, after)
     
     return {
         "status": "success",
-        "messages": msgs_out
+        "messages": [chat_message_out(msg) for msg in messages],
+        "has_more": has_more
     }
 
+def chat_message_out(msg: models.ChatMessage) -> dict:
+    return {
+        "id": msg.id,
+        "text": msg.message_text,
+        "type": msg.message_type,
+        "timestamp": msg.timestamp.isoformat()
+    }
+
+# --- LIVE UPDATES ---
+@app.websocket("/ws/{class_id}/{subject_id}")
+async def live_updates(websocket: WebSocket, class_id: int, subject_id: int):
+    """New chat messages and attendance changes for a class and subject, as JSON text frames."""
+    await live.serve_websocket(websocket, class_id, subject_id)
+
+@app.get("/events/{class_id}/{subject_id}")
+async def live_updates_sse(request: Request, class_id: int, subject_id: int):
+    """Server-Sent Events fallback for clients that cannot open a WebSocket."""
+    return live.event_stream(request, class_id, subject_id)
+
 
 @app.post("/upload_csv/{class_id}")
-async def upload_students(class_id: int, file: UploadFile = File(...), db: Session = Depends(database.get_db)):
-    contents = await file.read()
-    df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-    # Expecting "Roll Number", "Name"
-    for _, row in df.iterrows():
-        roll = str(row['Roll Number'])
-        name = row['Name']
-        student = db.query(models.Student).filter(models.Student.roll_number == roll, models.Student.class_id == class_id).first()
-        if not student:
-            student = models.Student(roll_number=roll, name=name, class_id=class_id)
-            db.add(student)
+def upload_students(class_id: int, file: UploadFile = File(...), db: Session = Depends(database.get_db)):
+    """
+    Import a class roster from CSV or XLSX with "Roll Number", "Name" and
+    optionally "Reg Number" columns. New students are added and existing ones
+    (matched by roll number) renamed; rows that fail validation are skipped
+    and listed in `errors`.
+    """
+    # Plain def: FastAPI runs it in the threadpool, so reading the file and the
+    # synchronous session below never block the event loop.
+    try:
+        result = roster_import.import_roster(db, class_id, file.file, file.filename)
+    except roster_import.RosterFileError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    # Imports that add students have bumped already
+    if result.changed and result.version is None:
+        data_version.bump(db, class_id)
     db.commit()
-    return {"message": "Imported students successfully"}
+    if result.changed:
+        roster_index.invalidate(class_id)
+    return result.report()
+
+# --- EXPORT ---
+@app.get("/export/attendance")
+def export_attendance(
+    class_id: Optional[List[int]] = Query(None),
+    subject_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    format: str = Query("csv", pattern="^(csv|xlsx)$")
+):
+    """
+    Attendance register, one row per record, for the given classes (repeat
+    class_id; all classes if omitted), subject and inclusive date range.
+    Streamed as CSV, or as an XLSX workbook with format=xlsx.
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    rows = attendance_export.register_rows(class_id, subject_id, start_date, end_date)
+    body = attendance_export.xlsx_stream(rows) if format == "xlsx" else attendance_export.csv_stream(rows)
+    filename = "attendance" + "".join(f"_{d.isoformat()}" for d in (start_date, end_date) if d) + f".{format}"
+    return StreamingResponse(
+        body,
+        media_type=attendance_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/teacher/subject-stats/{class_id}/{subject_id:int}", dependencies=[Depends(data_version.not_modified)])
+def get_subject_student_stats(
+    class_id: int,
+    subject_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(database.get_read_db)
+):
+    """
+    Per-student Present/OD and Absent counts for one subject, optionally limited
+    to the sessions between start_date and end_date (inclusive).
+    """
+    import attendance_matrix
+    register = attendance_matrix.get_register(db, class_id, subject_id)
+    return register.student_stats(start_date, end_date)
 
-@app.get("/teacher/subject-stats/{class_id}/{subject_name}")
-def get_subject_student_stats(class_id: int, subject_name: str, db: Session = Depends(database.get_db)):
+@app.get("/teacher/subject-stats/{class_id}/{subject_name}", dependencies=[Depends(data_version.not_modified)])
+def get_subject_student_stats_by_name(
+    class_id: int,
+    subject_name: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(database.get_read_db)
+):
     subject = db.query(models.Subject).filter(models.Subject.name == subject_name).first()
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
-        
-    students = db.query(models.Student).filter(models.Student.class_id == class_id).all()
-    result = []
-    
-    for s in students:
-        # 1. Total Working Days (Sessions where student SHOULD have been present)
-        # We query unique dates for this subject and class
-        working_days = db.query(models.Attendance.date).filter(
-            models.Attendance.class_id == class_id,
-            models.Attendance.subject_id == subject.id
-        ).distinct().count()
-
-        # 2. Present Count (Present + OD)
-        p_count = db.query(models.Attendance).filter(
-            models.Attendance.student_id == s.id,
-            models.Attendance.subject_id == subject.id,
-            func.lower(models.Attendance.status).in_(['present', 'od', 'p', 'o'])
-        ).count()
-
-        # 3. Absent Count
-        a_count = db.query(models.Attendance).filter(
-            models.Attendance.student_id == s.id,
-            models.Attendance.subject_id == subject.id,
-            func.lower(models.Attendance.status).in_(['absent', 'a'])
-        ).count()
-        
-        percent = round((p_count / working_days * 100), 1) if working_days > 0 else 0
-        
-        result.append({
-            "roll_number": s.roll_number,
-            "name": s.name,
-            "present_count": p_count,
-            "absent_count": a_count,
-            "attendance_percentage": percent
-        })
-    return result
+    return get_subject_student_stats(class_id, subject.id, start_date, end_date, db)
 
 # --- SESSION LOGS ---
 @app.post("/teacher/session-logs", response_model=schemas.SessionLog)
@@ -790,12 +763,15 @@ def create_session_log(log: schemas.SessionLogCreate, db: Session = Depends(data
         faculty_id=log.faculty_id
     )
     db.add(db_log)
+    version = data_version.bump(db, log.class_id)
     db.commit()
+    registers_on_commit(log.class_id, version)
+    roster_index.on_commit(log.class_id, version)
     db.refresh(db_log)
     return db_log
 
-@app.get("/teacher/session-logs/{class_id}/{subject_id}", response_model=List[schemas.SessionLog])
-def get_session_logs(class_id: int, subject_id: int, db: Session = Depends(database.get_db)):
+@app.get("/teacher/session-logs/{class_id}/{subject_id}", response_model=List[schemas.SessionLog], dependencies=[Depends(data_version.not_modified)])
+def get_session_logs(class_id: int, subject_id: int, db: Session = Depends(database.get_read_db)):
     return db.query(models.SessionLog).filter(
         models.SessionLog.class_id == class_id,
         models.SessionLog.subject_id == subject_id
@@ -0,0 +1,255 @@
+"""
+Per-route request and SQL metrics, served in the Prometheus text format at
+/metrics.
+
+MetricsMiddleware times every HTTP request, including the streaming of its
+body, and labels it with the matched route template (so /teacher/class-stats/7
+and /8 share a series). Cursor event hooks on the engines count the SQL
+statements each request sends, the time they take and the rows the driver
+reports: SELECT rows on PostgreSQL, only affected rows on SQLite.
+
+Connection pool activity is exported too: checkouts, new connections,
+invalidated (dead or recycled) connections, how long checkouts wait, and the
+pool's size, connections in use and overflow.
+
+A request that sends more than SQL_STATEMENT_BUDGET statements is logged and
+counted, so N+1 query loops show up in production as they do in
+bench_endpoints.py.
+
+Metrics live in the process. Deployments running several workers expose one
+set per worker.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+SQL_STATEMENT_BUDGET = int(os.getenv("SQL_STATEMENT_BUDGET", "20"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, str]  # (method, route)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "rows")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+
+# Set per request. Threadpool calls and the async engine's greenlets run in a
+# copy of the request's context, so they update the same RequestStats.
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency: Dict[Labels, Histogram] = {}
+        self.statements: Dict[Labels, Histogram] = {}
+        self.db_seconds: Dict[Labels, float] = {}
+        self.rows: Dict[Labels, int] = {}
+        self.over_budget: Dict[Labels, int] = {}
+        # Connection pools, by label ("sync", "async", "read", "async-read")
+        self.pools: Dict[str, object] = {}
+        self.pool_checkouts: Dict[Tuple[str], int] = {}
+        self.pool_connects: Dict[Tuple[str], int] = {}
+        self.pool_invalidations: Dict[Tuple[str], int] = {}
+        self.pool_wait: Dict[Tuple[str], Histogram] = {}
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        labels = (method, route)
+        with self.lock:
+            key = (method, route, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(labels, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.statements.setdefault(labels, Histogram(STATEMENT_BUCKETS)).observe(stats.statements)
+            self.db_seconds[labels] = self.db_seconds.get(labels, 0.0) + stats.db_seconds
+            self.rows[labels] = self.rows.get(labels, 0) + stats.rows
+            if stats.statements > SQL_STATEMENT_BUDGET:
+                self.over_budget[labels] = self.over_budget.get(labels, 0) + 1
+
+    def count(self, series: Dict[Tuple[str], int], pool: str) -> None:
+        with self.lock:
+            series[(pool,)] = series.get((pool,), 0) + 1
+
+    def observe_pool_wait(self, pool: str, seconds: float) -> None:
+        with self.lock:
+            self.pool_wait.setdefault((pool,), Histogram(POOL_WAIT_BUCKETS)).observe(seconds)
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            _counter(lines, "attmate_http_requests_total", "HTTP requests by route and status.",
+                     ("method", "route", "status"), self.requests)
+            _histogram(lines, "attmate_http_request_duration_seconds", "Request latency, including the streamed body.",
+                       self.latency)
+            _histogram(lines, "attmate_db_statements_per_request", "SQL statements sent by one request.",
+                       self.statements)
+            _counter(lines, "attmate_db_seconds_total", "Time spent executing SQL statements.",
+                     ("method", "route"), self.db_seconds)
+            _counter(lines, "attmate_db_rows_total", "Rows reported by the database driver.",
+                     ("method", "route"), self.rows)
+            _counter(lines, "attmate_db_statement_budget_exceeded_total",
+                     f"Requests that sent more than {SQL_STATEMENT_BUDGET} SQL statements.",
+                     ("method", "route"), self.over_budget)
+            _counter(lines, "attmate_db_pool_checkouts_total", "Connections handed out by the pool.",
+                     ("pool",), self.pool_checkouts)
+            _counter(lines, "attmate_db_pool_connects_total", "New database connections opened.",
+                     ("pool",), self.pool_connects)
+            _counter(lines, "attmate_db_pool_invalidations_total",
+                     "Connections discarded as dead (failed pre-ping, dropped by the server) or stale.",
+                     ("pool",), self.pool_invalidations)
+            _histogram(lines, "attmate_db_pool_wait_seconds", "Time a checkout waited for a connection.",
+                       self.pool_wait, ("pool",))
+            for name, help_text, read in POOL_GAUGES:
+                values = {(label,): read(engine.pool) for label, engine in self.pools.items()
+                          if hasattr(engine.pool, "checkedout")}
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                lines += [f"{name}{_labels(('pool',), key)} {value!r}" for key, value in sorted(values.items())]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _le(bound) -> str:
+    return f'le="{bound}"'
+
+
+def _counter(lines, name: str, help_text: str, names, values: dict) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for key, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(names, key)} {value!r}")
+
+
+def _histogram(lines, name: str, help_text: str, series: Dict[tuple, Histogram], names=("method", "route")) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, h in sorted(series.items()):
+        for bound, count in zip(h.buckets, h.counts):
+            lines.append(f"{name}_bucket{_labels(names, key, _le(bound))} {count}")
+        lines.append(f"{name}_bucket{_labels(names, key, _le('+Inf'))} {h.total}")
+        lines.append(f"{name}_sum{_labels(names, key)} {h.sum!r}")
+        lines.append(f"{name}_count{_labels(names, key)} {h.total}")
+
+
+POOL_GAUGES = [
+    ("attmate_db_pool_size", "Connections the pool keeps open.", lambda pool: pool.size()),
+    ("attmate_db_pool_checked_out", "Connections currently in use.", lambda pool: pool.checkedout()),
+    ("attmate_db_pool_overflow", "Connections opened beyond the pool size (negative: unused capacity).",
+     lambda pool: pool.overflow()),
+]
+
+registry = Registry()
+
+
+def render() -> str:
+    return registry.render()
+
+
+# --- SQL HOOKS ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_metrics_started", None)
+    if stats is None or started is None:
+        return
+    stats.statements += 1
+    stats.db_seconds += time.perf_counter() - started
+    if cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+
+
+def instrument(engines: Dict[str, object]) -> None:
+    """
+    Hook the cursor and pool events of {label: sync engine} (pass
+    async_engine.sync_engine for the async one).
+    """
+    import database
+    for label, engine in engines.items():
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "checkout", lambda *args, label=label: registry.count(registry.pool_checkouts, label))
+        event.listen(engine, "connect", lambda *args, label=label: registry.count(registry.pool_connects, label))
+        event.listen(engine, "invalidate", lambda *args, label=label: registry.count(registry.pool_invalidations, label))
+        event.listen(engine, "soft_invalidate", lambda *args, label=label: registry.count(registry.pool_invalidations, label))
+        registry.pools[label] = engine
+    if registry.observe_pool_wait not in database.pool_wait_listeners:
+        database.pool_wait_listeners.append(registry.observe_pool_wait)
+
+
+# --- MIDDLEWARE ---
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streamed responses are timed until their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            seconds = time.perf_counter() - started
+            # The route template once routing has matched; unmatched paths share one series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            registry.record(method, route, status, seconds, stats)
+            if stats.statements > SQL_STATEMENT_BUDGET:
+                print(
+                    f"WARNING: {method} {scope['path']} sent {stats.statements} SQL statements "
+                    f"(budget {SQL_STATEMENT_BUDGET}) in {seconds * 1000:.0f} ms, {stats.db_seconds * 1000:.0f} ms in the database"
+                )
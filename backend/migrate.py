@@ -0,0 +1,31 @@
+"""
+Bring the database to the latest schema in migrations/versions:
+
+    python migrate.py [revision]
+
+Run it before starting the app (build.sh does, on every deploy); the app does
+not migrate on startup, so cold starts stay fast. Databases created by earlier versions with
+create_all() are adopted by the baseline revision, which only creates what is
+missing. New schema changes are added as revisions:
+
+    alembic revision -m "describe the change"
+"""
+import sys
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+CONFIG_PATH = Path(__file__).parent / "alembic.ini"
+
+
+def upgrade(revision: str = "head", configure_logger: bool = False, connection=None) -> None:
+    """Upgrade database.engine's database, or the one `connection` is open on."""
+    config = Config(str(CONFIG_PATH))
+    config.attributes["configure_logger"] = configure_logger
+    config.attributes["connection"] = connection
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    upgrade(sys.argv[1] if len(sys.argv) > 1 else "head", configure_logger=True)
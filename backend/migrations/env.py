@@ -0,0 +1,65 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+import models
+from database import engine
+
+config = context.config
+
+# migrate.upgrade() runs inside the app, whose logging must be left alone
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = models.Base.metadata
+
+# Not a model: revision 0003 keeps the folded attendance rows here until attendance_fold.py --drop
+UNMANAGED_TABLES = {"attendance_legacy"}
+
+
+def _include_object(obj, name, type_, reflected, compare_to):
+    table = name if type_ == "table" else getattr(getattr(obj, "table", None), "name", None)
+    return table not in UNMANAGED_TABLES
+
+
+def _dialect_name() -> str:
+    connection = config.attributes.get("connection")
+    return (connection if connection is not None else engine).dialect.name
+
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        # SQLite can only alter tables by copying them
+        render_as_batch=_dialect_name() == "sqlite",
+        include_object=_include_object,
+        **kwargs
+    )
+
+
+def run_migrations_offline() -> None:
+    _configure(url=engine.url.render_as_string(hide_password=False), literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run(connection) -> None:
+    _configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # migrate.upgrade(connection=...) targets another database, e.g. a snapshot restore
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
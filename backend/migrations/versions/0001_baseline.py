@@ -0,0 +1,131 @@
+"""Baseline: the schema create_all() built before migrations existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Exactly the tables and indexes of the models at that point. Databases created
+before migrations existed already hold some or all of them, so this revision
+only creates the ones that are missing, and adopts those databases as well as
+empty ones. Everything added since is added by the revision that needs it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    ('ix_users_id', 'users', ['id'], False),
+    ('ix_users_email', 'users', ['email'], True),
+    ('ix_faculty_id', 'faculty', ['id'], False),
+    ('ix_subjects_id', 'subjects', ['id'], False),
+    ('ix_classes_id', 'classes', ['id'], False),
+    ('ix_classes_name', 'classes', ['name'], True),
+    ('ix_faculty_subjects_id', 'faculty_subjects', ['id'], False),
+    ('ix_students_id', 'students', ['id'], False),
+    ('ix_students_roll_number', 'students', ['roll_number'], False),
+    ('ix_attendance_id', 'attendance', ['id'], False),
+    ('ix_attendance_date', 'attendance', ['date'], False),
+    ('ix_attendance_student_id', 'attendance', ['student_id'], False),
+    ('ix_attendance_class_id', 'attendance', ['class_id'], False),
+    ('ix_attendance_subject_id', 'attendance', ['subject_id'], False),
+    ('ix_chat_messages_id', 'chat_messages', ['id'], False),
+    ('ix_chat_messages_class_id', 'chat_messages', ['class_id'], False),
+    ('ix_chat_messages_subject_id', 'chat_messages', ['subject_id'], False),
+    ('ix_chat_messages_timestamp', 'chat_messages', ['timestamp'], False),
+    ('ix_session_logs_id', 'session_logs', ['id'], False),
+    ('ix_session_logs_date', 'session_logs', ['date'], False),
+    ('ix_session_logs_class_id', 'session_logs', ['class_id'], False),
+    ('ix_session_logs_subject_id', 'session_logs', ['subject_id'], False),
+    ('ix_session_logs_faculty_id', 'session_logs', ['faculty_id'], False),
+]
+
+
+def _tables():
+    return {
+        'users': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('email', sa.String(100)),
+            sa.Column('password', sa.String(255)),
+            sa.Column('role', sa.String(20)),
+        ],
+        'faculty': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+            sa.Column('name', sa.String(100)),
+            sa.Column('department', sa.String(100)),
+        ],
+        'subjects': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(100), unique=True),
+            sa.Column('code', sa.String(20), unique=True, nullable=True),
+        ],
+        'classes': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(50)),
+            sa.Column('advisor_id', sa.Integer(), sa.ForeignKey('faculty.id'), nullable=True),
+        ],
+        'faculty_subjects': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('faculty_id', sa.Integer(), sa.ForeignKey('faculty.id')),
+            sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id')),
+            sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id')),
+        ],
+        'students': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('roll_number', sa.String(20)),
+            sa.Column('reg_number', sa.String(20), unique=True, nullable=True),
+            sa.Column('name', sa.String(100)),
+            sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id')),
+        ],
+        'attendance': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('date', sa.Date()),
+            sa.Column('status', sa.String(10)),
+            sa.Column('student_id', sa.Integer(), sa.ForeignKey('students.id')),
+            sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id')),
+            sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id')),
+        ],
+        'chat_messages': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id')),
+            sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id')),
+            sa.Column('message_text', sa.String(1000)),
+            sa.Column('message_type', sa.String(20)),
+            sa.Column('timestamp', sa.DateTime()),
+            sa.Column('faculty_id', sa.Integer(), sa.ForeignKey('faculty.id'), nullable=True),
+        ],
+        'session_logs': [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('date', sa.Date()),
+            sa.Column('content', sa.String(2000)),
+            sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id')),
+            sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id')),
+            sa.Column('faculty_id', sa.Integer(), sa.ForeignKey('faculty.id')),
+            sa.Column('timestamp', sa.DateTime()),
+        ],
+    }
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, columns in _tables().items():
+        if name not in existing:
+            op.create_table(name, *columns)
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in reversed(list(_tables())):
+        op.drop_table(name)
@@ -0,0 +1,49 @@
+"""Composite indexes for the endpoints' filters
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Composite indexes for the rosters, teacher assignments, session logs and
+chat history pages, on the baseline tables. Attendance and its summaries get
+theirs from the revisions that create their tables. PostgreSQL builds and
+drops them concurrently, without locking out writes; check_query_plans.py
+verifies the result.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns)
+INDEXES = [
+    ('ix_students_class_roll_number', 'students', ['class_id', 'roll_number']),
+    ('ix_session_logs_class_subject_date', 'session_logs', ['class_id', 'subject_id', 'date']),
+    ('ix_session_logs_class_date', 'session_logs', ['class_id', 'date']),
+    ('ix_faculty_subjects_faculty_id', 'faculty_subjects', ['faculty_id']),
+    ('ix_faculty_subjects_class_faculty', 'faculty_subjects', ['class_id', 'faculty_id']),
+    ('ix_faculty_user_id', 'faculty', ['user_id']),
+    ('ix_classes_advisor_id', 'classes', ['advisor_id']),
+    ('ix_chat_messages_class_subject_timestamp_id', 'chat_messages', ['class_id', 'subject_id', 'timestamp', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
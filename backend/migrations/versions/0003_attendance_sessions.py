@@ -0,0 +1,133 @@
+"""Attendance as sessions plus exception rows
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+The per-student attendance table is replaced by attendance_sessions, one row
+per class, subject and day, and attendance_exceptions, one row per student
+whose status is not the session's implied Present. A session's
+filled_through is the class data version it was filled at, and covers the
+students with enrolled_version up to it. Both the version counters
+(class_data_versions) and enrolled_version are added here.
+
+Existing students are stamped in id order and existing rows are folded by
+attendance_fold.py, which also collapses duplicates and encodes rows without
+a status code (the jobs of the old dedupe_attendance.py and
+migrate_status_codes.py), keeping statuses it does not know in
+attendance_exceptions.status_text. The attendance table is then renamed
+to attendance_legacy, without its foreign keys so nothing depends on it,
+rather than dropped: `python attendance_fold.py --drop` drops it once every
+legacy cell is verified against the sessions.
+
+Both new tables are keyed by their primary key alone (WITHOUT ROWID on
+SQLite). Downgrading expands the sessions, which hold any attendance taken
+since, back into one row per student, and drops attendance_legacy if it is
+still there.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LEGACY_TABLE = 'attendance_legacy'
+LEGACY_INDEXES = [
+    ('ix_attendance_id', ['id']),
+    ('ix_attendance_date', ['date']),
+    ('ix_attendance_student_id', ['student_id']),
+    ('ix_attendance_class_id', ['class_id']),
+    ('ix_attendance_subject_id', ['subject_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    import attendance_fold
+
+    op.create_table(
+        'class_data_versions',
+        sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id'), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+    )
+    op.add_column('students', sa.Column('enrolled_version', sa.BigInteger(), nullable=False, server_default='0'))
+    op.create_table(
+        'attendance_sessions',
+        sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id'), primary_key=True),
+        sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id'), primary_key=True),
+        sa.Column('date', sa.Date(), primary_key=True),
+        sa.Column('filled_through', sa.BigInteger(), nullable=True),
+        sqlite_with_rowid=False,
+    )
+    op.create_table(
+        'attendance_exceptions',
+        sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id'), primary_key=True),
+        sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id'), primary_key=True),
+        sa.Column('date', sa.Date(), primary_key=True),
+        sa.Column('student_id', sa.Integer(), sa.ForeignKey('students.id'), primary_key=True),
+        sa.Column('status_code', sa.SmallInteger(), nullable=False),
+        sa.Column('status_text', sa.String(10), nullable=True),
+        sqlite_with_rowid=False,
+    )
+    attendance_fold.stamp_enrollments(op.get_bind())
+    attendance_fold.fold(op.get_bind())
+    op.rename_table('attendance', LEGACY_TABLE)
+    # Keep students, classes and subjects deletable (only PostgreSQL names and enforces these)
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(LEGACY_TABLE):
+        if fk['name']:
+            op.drop_constraint(fk['name'], LEGACY_TABLE, type_='foreignkey')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    import attendance_status
+
+    # Its indexes still have the names the recreated table's need
+    op.drop_table(LEGACY_TABLE, if_exists=True)
+    op.create_table(
+        'attendance',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('date', sa.Date()),
+        sa.Column('status', sa.String(10)),
+        sa.Column('student_id', sa.Integer(), sa.ForeignKey('students.id')),
+        sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id')),
+        sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id')),
+    )
+    for name, columns in LEGACY_INDEXES:
+        op.create_index(name, 'attendance', columns)
+
+    sessions = sa.table('attendance_sessions', *[sa.column(c) for c in ('class_id', 'subject_id', 'date', 'filled_through')])
+    exceptions = sa.table('attendance_exceptions', *[
+        sa.column(c) for c in ('class_id', 'subject_id', 'date', 'student_id', 'status_code', 'status_text')
+    ])
+    students = sa.table('students', sa.column('id'), sa.column('class_id'), sa.column('enrolled_version'))
+    attendance = sa.table('attendance', *[sa.column(c) for c in ('date', 'status', 'student_id', 'class_id', 'subject_id')])
+    status_name = sa.func.coalesce(exceptions.c.status_text, sa.case(
+        *[(exceptions.c.status_code == code, name) for code, name in attendance_status.NAMES.items()],
+        else_=attendance_status.NAMES[attendance_status.OTHER]
+    ))
+    columns = ['date', 'status', 'student_id', 'class_id', 'subject_id']
+    op.execute(attendance.insert().from_select(columns, sa.select(
+        exceptions.c.date, status_name, exceptions.c.student_id, exceptions.c.class_id, exceptions.c.subject_id
+    )))
+    # The filled students without an exception
+    op.execute(attendance.insert().from_select(columns, sa.select(
+        sessions.c.date, sa.literal(attendance_status.NAMES[attendance_status.PRESENT]),
+        students.c.id, sessions.c.class_id, sessions.c.subject_id
+    ).join(students, sa.and_(
+        students.c.class_id == sessions.c.class_id, students.c.enrolled_version <= sessions.c.filled_through
+    )).where(~sa.exists().where(
+        exceptions.c.class_id == sessions.c.class_id, exceptions.c.subject_id == sessions.c.subject_id,
+        exceptions.c.date == sessions.c.date, exceptions.c.student_id == students.c.id
+    ))))
+    op.drop_table('attendance_exceptions')
+    op.drop_table('attendance_sessions')
+    with op.batch_alter_table('students') as batch:
+        batch.drop_column('enrolled_version')
+    op.drop_table('class_data_versions')
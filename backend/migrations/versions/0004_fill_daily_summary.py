@@ -0,0 +1,59 @@
+"""Daily attendance summaries
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+Class stats, day details and the calendar read only attendance_daily_summary,
+one row of status counts per class, subject and day, which the app keeps up
+to date on every write. This creates the table and counts every existing
+session into it, so an upgraded database shows its full history straight
+away instead of 0% until someone runs daily_summary.py by hand. Downgrading
+drops the table.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, columns, unique)
+INDEXES = [
+    ('ix_attendance_daily_summary_id', ['id'], False),
+    ('ix_attendance_daily_summary_subject_id', ['subject_id'], False),
+    ('uq_attendance_daily_summary_class_subject_date', ['class_id', 'subject_id', 'date'], True),
+    ('ix_attendance_daily_summary_class_date', ['class_id', 'date'], False),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    import daily_summary
+
+    op.create_table(
+        'attendance_daily_summary',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('class_id', sa.Integer(), sa.ForeignKey('classes.id')),
+        sa.Column('subject_id', sa.Integer(), sa.ForeignKey('subjects.id')),
+        sa.Column('date', sa.Date()),
+        sa.Column('present', sa.Integer()),
+        sa.Column('absent', sa.Integer()),
+        sa.Column('od', sa.Integer()),
+        sa.Column('leave', sa.Integer()),
+        sa.Column('total', sa.Integer()),
+    )
+    for name, columns, unique in INDEXES:
+        op.create_index(name, 'attendance_daily_summary', columns, unique=unique)
+    conn = op.get_bind()
+    conn.execute(daily_summary.fill_statement(conn.dialect.name))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('attendance_daily_summary')
@@ -0,0 +1,68 @@
+"""students.roll_suffix for short roll lookups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+Roster lookups match the short rolls typed in chat ("7") by the numeric
+value of a roll number's trailing digits. This adds that column, indexed
+with the class, and fills it for existing students. Suffixes are computed in
+Python (models.roll_suffix), in id order and in batches; the app sets them
+on insert. Downgrading drops the column.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    import models
+
+    op.add_column('students', sa.Column('roll_suffix', sa.BigInteger()))
+    op.create_index('ix_students_class_roll_suffix', 'students', ['class_id', 'roll_suffix'])
+
+    conn = op.get_bind()
+    students = sa.table('students', sa.column('id'), sa.column('roll_number'), sa.column('roll_suffix'))
+    stmt = (
+        students.update()
+        .where(students.c.id == sa.bindparam('student_id'))
+        .values(roll_suffix=sa.bindparam('suffix'))
+    )
+    last_id, total = 0, 0
+    while True:
+        rows = conn.execute(
+            sa.select(students.c.id, students.c.roll_number)
+            .where(students.c.id > last_id, students.c.roll_suffix.is_(None))
+            .order_by(students.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        # Rolls without trailing digits have no suffix and stay NULL
+        params = [
+            {'student_id': sid, 'suffix': models.roll_suffix(roll)}
+            for sid, roll in rows if models.roll_suffix(roll) is not None
+        ]
+        if params:
+            conn.execute(stmt, params)
+        last_id = rows[-1][0]
+        total += len(params)
+    print(f"Backfilled roll_suffix for {total} students.")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_students_class_roll_suffix', table_name='students')
+    with op.batch_alter_table('students') as batch:
+        batch.drop_column('roll_suffix')
@@ -1,7 +1,30 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean, Table, DateTime
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, ForeignKey, Date, Boolean, Table, DateTime, Index, select
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
+import re
+
+_ROLL_SUFFIX_RE = re.compile(r'(\d+)$')
+
+def roll_suffix(roll_number):
+    """Numeric value of the trailing digits of a roll number ('25CS007' -> 7)."""
+    match = _ROLL_SUFFIX_RE.search(roll_number or "")
+    return int(match.group(1)) if match else None
+
+def _roll_suffix_default(context):
+    return roll_suffix(context.get_current_parameters().get("roll_number"))
+
+def _enrolled_version_default(context):
+    """
+    The version the inserting transaction's bump of the class will reach.
+    Inserts made after that bump set enrolled_version to its result instead,
+    as roster_import does.
+    """
+    class_id = context.get_current_parameters().get("class_id")
+    version = context.connection.execute(
+        select(ClassDataVersion.version).where(ClassDataVersion.class_id == class_id)
+    ).scalar()
+    return (version or 0) + 1
 
 class User(Base):
     __tablename__ = "users"
@@ -17,7 +40,7 @@ class Faculty(Base):
     __tablename__ = "faculty"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     name = Column(String(100))
     department = Column(String(100))
 
@@ -43,6 +66,12 @@ class FacultySubject(Base):
     subject_id = Column(Integer, ForeignKey("subjects.id"))
     class_id = Column(Integer, ForeignKey("classes.id"))
 
+    # A teacher's assignments, and a class's subjects (optionally for one teacher)
+    __table_args__ = (
+        Index("ix_faculty_subjects_faculty_id", "faculty_id"),
+        Index("ix_faculty_subjects_class_faculty", "class_id", "faculty_id"),
+    )
+
     faculty = relationship("Faculty", back_populates="assignments")
     subject = relationship("Subject", back_populates="assignments")
     class_ = relationship("Class")
@@ -52,11 +81,10 @@ class Class(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=True, index=True)
-    advisor_id = Column(Integer, ForeignKey("faculty.id"), nullable=True)
+    advisor_id = Column(Integer, ForeignKey("faculty.id"), nullable=True, index=True)
     
     advisor = relationship("Faculty", back_populates="advised_classes")
     students = relationship("Student", back_populates="student_class")
-    attendance_records = relationship("Attendance", back_populates="class_")
     chat_messages = relationship("ChatMessage", back_populates="class_")
 
 class Student(Base):
@@ -64,27 +92,86 @@ class Student(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     roll_number = Column(String(20), index=True)
+    # Trailing digits of roll_number, so short rolls typed in chat ("7") resolve with an index seek
+    roll_suffix = Column(BigInteger, default=_roll_suffix_default)
     reg_number = Column(String(20), unique=True, nullable=True)
     name = Column(String(100))
     class_id = Column(Integer, ForeignKey("classes.id"))
+    # The class's data version when the student joined it (see AttendanceSession)
+    enrolled_version = Column(BigInteger, default=_enrolled_version_default, server_default="0", nullable=False)
+
+    __table_args__ = (
+        Index("ix_students_class_roll_suffix", "class_id", "roll_suffix"),
+        # Rosters and registers, listed in roll number order
+        Index("ix_students_class_roll_number", "class_id", "roll_number"),
+    )
 
     student_class = relationship("Class", back_populates="students")
-    attendance_records = relationship("Attendance", back_populates="student")
 
-class Attendance(Base):
-    __tablename__ = "attendance"
+class AttendanceSession(Base):
+    """
+    One taken session: a class, subject and day. There is no period, so a
+    subject taught twice on a day shares one session. filled_through is the
+    class's data version (ClassDataVersion) when auto-present last filled it.
+    Students of the class with enrolled_version <= filled_through are Present
+    unless they have an AttendanceException; the others only have a record if
+    they have an exception. Students are stamped with the version the bump of
+    the transaction that adds them reaches, so students added after the
+    session was filled are not counted in it, whatever their ids.
+    """
+    __tablename__ = "attendance_sessions"
+
+    class_id = Column(Integer, ForeignKey("classes.id"), primary_key=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    filled_through = Column(BigInteger, nullable=True)  # NULL: nobody was auto-filled
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class AttendanceException(Base):
+    """A student's status in a session, when it is not the implied Present (attendance_status code)."""
+    __tablename__ = "attendance_exceptions"
+
+    # The session's key first, so a session's exceptions are one index range
+    class_id = Column(Integer, ForeignKey("classes.id"), primary_key=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    status_code = Column(SmallInteger, nullable=False)
+    # The legacy status as written, when it was not one attendance_status knows (status_code OTHER)
+    status_text = Column(String(10), nullable=True)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class AttendanceDailySummary(Base):
+    """Status counts for one class, subject and day, kept in step with attendance by daily_summary.py."""
+    __tablename__ = "attendance_daily_summary"
 
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(Date, index=True)
-    status = Column(String(10)) # Present, Absent, OD
-    student_id = Column(Integer, ForeignKey("students.id"), index=True)
-    class_id = Column(Integer, ForeignKey("classes.id"), index=True)
+    class_id = Column(Integer, ForeignKey("classes.id"))
     subject_id = Column(Integer, ForeignKey("subjects.id"), index=True)
+    date = Column(Date)
+    present = Column(Integer, default=0)
+    absent = Column(Integer, default=0)
+    od = Column(Integer, default=0)
+    leave = Column(Integer, default=0)
+    total = Column(Integer, default=0)  # Every record, including unrecognised statuses
+
+    __table_args__ = (
+        Index("uq_attendance_daily_summary_class_subject_date", "class_id", "subject_id", "date", unique=True),
+        # Day details: every subject of a class on one day
+        Index("ix_attendance_daily_summary_class_date", "class_id", "date"),
+    )
 
-    student = relationship("Student", back_populates="attendance_records")
-    class_ = relationship("Class", back_populates="attendance_records")
     subject = relationship("Subject")
 
+class ClassDataVersion(Base):
+    """Counter bumped by every write to a class's data; read endpoints derive their ETags from it."""
+    __tablename__ = "class_data_versions"
+
+    class_id = Column(Integer, ForeignKey("classes.id"), primary_key=True)
+    version = Column(BigInteger, default=0, nullable=False)
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -96,6 +183,11 @@ class ChatMessage(Base):
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     faculty_id = Column(Integer, ForeignKey("faculty.id"), nullable=True)
 
+    # Serves chat history pages: one class and subject, walked by (timestamp, id)
+    __table_args__ = (
+        Index("ix_chat_messages_class_subject_timestamp_id", "class_id", "subject_id", "timestamp", "id"),
+    )
+
     class_ = relationship("Class", back_populates="chat_messages")
     subject = relationship("Subject")
     faculty = relationship("Faculty", back_populates="chat_messages")
@@ -111,6 +203,12 @@ class SessionLog(Base):
     faculty_id = Column(Integer, ForeignKey("faculty.id"), index=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Session logs of a class and subject, and of a class on one day
+        Index("ix_session_logs_class_subject_date", "class_id", "subject_id", "date"),
+        Index("ix_session_logs_class_date", "class_id", "date"),
+    )
+
     class_ = relationship("Class")
     subject = relationship("Subject")
     faculty = relationship("Faculty")
@@ -0,0 +1,114 @@
+"""
+Async data access for the chat, history and attendance endpoints.
+
+Every function takes an AsyncSession from database.get_async_db, so database
+round trips are awaited instead of blocking the uvicorn event loop. Callers
+own the transaction and commit.
+"""
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import bulk_attendance
+import daily_summary
+import data_version
+import database
+
+
+def _dialect(db: AsyncSession) -> str:
+    return db.bind.dialect.name
+
+
+# --- ATTENDANCE WRITES ---
+# Each write also adds its changes to the daily summary row it touched, in the same transaction.
+async def write_attendance(db: AsyncSession, class_id: int, subject_id: int, day: date,
+                           statuses: Dict[int, str], fill_present: bool = False) -> int:
+    """
+    Writes `statuses` ({student_id: status}) for a session and, if
+    fill_present, marks every other student without a record Present.
+    Returns how many students were marked Present that way.
+    """
+    if not statuses and not fill_present:
+        return 0
+    dialect = _dialect(db)
+    lock = bulk_attendance.lock_statement(dialect, class_id, subject_id, day)
+    filled_through, version = (await db.execute(lock)).one()
+    filled = 0
+    # With nobody enrolled since the last fill, there is nothing to fill
+    if fill_present and (filled_through is None or version > filled_through):
+        stmt = bulk_attendance.fill_statement(class_id, subject_id, day, filled_through, version, list(statuses))
+        filled = (await db.execute(stmt)).scalar_one()
+    if statuses or filled:
+        await db.execute(daily_summary.delta_statement(
+            dialect, class_id, subject_id, day, statuses, filled_through, filled
+        ))
+    if statuses:
+        await db.execute(bulk_attendance.upsert_statement(dialect, class_id, subject_id, day, statuses))
+    return filled
+
+
+async def bump_data_version(db: AsyncSession, class_id: int) -> int:
+    """Returns the class's new version."""
+    database.mark_written(class_id)
+    return (await db.execute(data_version.bump_statement(_dialect(db), [class_id]))).scalar_one()
+
+
+# --- ATTENDANCE READS ---
+# Answered from the cached class/subject register (attendance_matrix.py).
+async def students_with_status(db: AsyncSession, class_id: int, subject_id: int, day: date, status: str) -> List[str]:
+    """Names of the students marked `status` for a subject on a day."""
+    import attendance_matrix
+    register = await attendance_matrix.get_register_async(db, class_id, subject_id)
+    return register.names_with_status(day, status)
+
+
+async def attendance_sheet(db: AsyncSession, class_id: int, subject_id: int) -> dict:
+    """Register grid for a class and subject: every student against every session date."""
+    import attendance_matrix
+    register = await attendance_matrix.get_register_async(db, class_id, subject_id)
+    return register.sheet()
+
+
+# --- CHAT ---
+async def chat_history(db: AsyncSession, class_id: int, subject_id: int, limit: int,
+                       before: Optional[int] = None, after: Optional[int] = None) -> Tuple[List[models.ChatMessage], bool]:
+    """
+    One page of chat history, newest first, and whether more messages lie beyond
+    it. `before` and `after` are message id cursors: the page holds the messages
+    just older (or newer) than that message.
+    Pages are keyset scans of the (class_id, subject_id, timestamp, id) index, so
+    their cost does not grow with the length of the history.
+    """
+    msg = models.ChatMessage
+    stmt = select(msg).where(msg.class_id == class_id, msg.subject_id == subject_id)
+
+    cursor = before if before is not None else after
+    if cursor is not None:
+        cursor_ts = select(msg.timestamp).where(msg.id == cursor).scalar_subquery()
+        # The plain range bound lets the planner seek the index before filtering ties
+        if before is not None:
+            stmt = stmt.where(
+                msg.timestamp <= cursor_ts,
+                or_(msg.timestamp < cursor_ts, and_(msg.timestamp == cursor_ts, msg.id < cursor))
+            )
+        else:
+            stmt = stmt.where(
+                msg.timestamp >= cursor_ts,
+                or_(msg.timestamp > cursor_ts, and_(msg.timestamp == cursor_ts, msg.id > cursor))
+            )
+
+    # One extra row tells whether another page exists
+    if after is not None:
+        # The oldest messages after the cursor, flipped to newest first
+        stmt = stmt.order_by(msg.timestamp.asc(), msg.id.asc())
+    else:
+        stmt = stmt.order_by(msg.timestamp.desc(), msg.id.desc())
+    page = list((await db.execute(stmt.limit(limit + 1))).scalars())
+    has_more = len(page) > limit
+    page = page[:limit]
+    if after is not None:
+        page.reverse()
+    return page, has_more
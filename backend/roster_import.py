@@ -0,0 +1,239 @@
+"""
+Streaming roster import for /upload_csv/{class_id}, from CSV or XLSX.
+
+Rows are read one at a time (csv over the spooled upload, openpyxl in
+read-only mode), so an upload is never held in memory as a whole. They are
+validated, normalized and handled in chunks of CHUNK_SIZE: one query loads
+the class's students with those roll numbers (and anyone already holding
+their reg numbers), then a single bulk INSERT adds the new students and a
+single bulk UPDATE renames the changed ones. The class's data version is
+bumped before the first insert, and new students are stamped with it
+(models.Student.enrolled_version).
+
+Invalid rows are skipped and listed in the report by spreadsheet row number
+(the header is row 1); every valid row is imported in one transaction.
+"""
+import csv
+import io
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+import data_version
+import models
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+
+# Column -> normalized header spellings (lowercase, letters and digits only)
+HEADERS = {
+    "roll": {"rollnumber", "rollno", "roll", "rollnum"},
+    "reg": {"regnumber", "regno", "reg", "registernumber", "registrationnumber"},
+    "name": {"name", "studentname"},
+}
+# Lengths of the students columns, and their names in error messages
+MAX_LENGTHS = {"roll": 20, "reg": 20, "name": 100}
+LABELS = {"roll": "Roll number", "reg": "Reg number", "name": "Name"}
+
+XLSX_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+class RosterFileError(ValueError):
+    """The upload cannot be read as a roster at all (unknown format or missing columns)."""
+
+
+# --- READING ---
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Spreadsheets store numeric roll numbers as floats
+    return " ".join(str(value).split())
+
+
+def _columns(header) -> Dict[str, int]:
+    positions = {}
+    for i, title in enumerate(header):
+        key = "".join(ch for ch in _cell(title).lower() if ch.isalnum())
+        for column, spellings in HEADERS.items():
+            if key in spellings and column not in positions:
+                positions[column] = i
+    missing = [c for c in ("roll", "name") if c not in positions]
+    if missing:
+        raise RosterFileError(
+            "Missing column(s): " + ", ".join(missing) + ". Expected \"Roll Number\", \"Name\" and optionally \"Reg Number\"."
+        )
+    return positions
+
+
+def _csv_rows(file: BinaryIO) -> Iterator[tuple]:
+    yield from csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+
+
+def _xlsx_rows(file: BinaryIO) -> Iterator[tuple]:
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_roster(file: BinaryIO, filename: Optional[str]) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yields (row number, {"roll", "reg", "name"}) for every non-blank row after the header."""
+    name = (filename or "").lower()
+    if name.endswith(".xls"):
+        raise RosterFileError("Legacy .xls files are not supported; save the sheet as .xlsx or .csv.")
+    rows = _xlsx_rows(file) if name.endswith(XLSX_EXTENSIONS) else _csv_rows(file)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise RosterFileError("The file is empty.")
+    except UnicodeDecodeError:
+        raise RosterFileError("CSV files must be UTF-8 encoded.")
+    positions = _columns(header)
+    try:
+        for number, row in enumerate(rows, start=2):
+            values = {c: _cell(row[i]) if i < len(row) else "" for c, i in positions.items()}
+            if any(values.values()):
+                yield number, values
+    except UnicodeDecodeError:
+        raise RosterFileError("CSV files must be UTF-8 encoded.")
+
+
+# --- VALIDATION ---
+def _normalize(values: Dict[str, str]) -> Tuple[Optional[dict], Optional[str]]:
+    """(student fields, None) for a valid row, (None, error) otherwise."""
+    roll = values["roll"].replace(" ", "")
+    reg = values.get("reg", "").replace(" ", "") or None
+    name = values["name"]
+    if not roll:
+        return None, "Missing roll number"
+    if not name:
+        return None, "Missing name"
+    for column, value in (("roll", roll), ("reg", reg), ("name", name)):
+        if value and len(value) > MAX_LENGTHS[column]:
+            return None, f"{LABELS[column]} longer than {MAX_LENGTHS[column]} characters"
+    return {"roll_number": roll, "reg_number": reg, "name": name}, None
+
+
+# --- IMPORT ---
+class RosterImport:
+    def __init__(self, db: Session, class_id: int):
+        self.db = db
+        self.class_id = class_id
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors: List[dict] = []
+        self.error_count = 0
+        # The class's data version, once this import has bumped it
+        self.version: Optional[int] = None
+        self._first_row_of_roll: Dict[str, int] = {}
+        self._first_row_of_reg: Dict[str, int] = {}
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.created or self.updated)
+
+    def error(self, row: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def add_chunk(self, chunk: List[Tuple[int, Dict[str, str]]]) -> None:
+        students = []
+        for row, values in chunk:
+            student, problem = _normalize(values)
+            if problem is None:
+                first = self._first_row_of_roll.setdefault(student["roll_number"], row)
+                if first != row:
+                    problem = f"Duplicate roll number {student['roll_number']} (first on row {first})"
+            if problem is None and student["reg_number"]:
+                first = self._first_row_of_reg.setdefault(student["reg_number"], row)
+                if first != row:
+                    problem = f"Duplicate reg number {student['reg_number']} (first on row {first})"
+            if problem is not None:
+                self.error(row, problem)
+            else:
+                students.append((row, student))
+        if students:
+            self._apply(students)
+
+    def _apply(self, students: List[Tuple[int, dict]]) -> None:
+        s = models.Student
+        rolls = [student["roll_number"] for _, student in students]
+        regs = [student["reg_number"] for _, student in students if student["reg_number"]]
+        existing = self.db.execute(
+            select(s.id, s.roll_number, s.reg_number, s.name, s.class_id).where(or_(
+                and_(s.class_id == self.class_id, s.roll_number.in_(rolls)),
+                s.reg_number.in_(regs)
+            ))
+        ).all()
+        by_roll = {r.roll_number: r for r in existing if r.class_id == self.class_id}
+        reg_owner = {r.reg_number: r.id for r in existing if r.reg_number}
+
+        inserts, updates = [], []
+        for row, student in students:
+            current = by_roll.get(student["roll_number"])
+            reg = student["reg_number"]
+            owner = reg_owner.get(reg) if reg else None
+            if owner is not None and (current is None or owner != current.id):
+                self.error(row, f"Reg number {reg} already belongs to another student")
+                continue
+            if current is None:
+                inserts.append({
+                    **student,
+                    "roll_suffix": models.roll_suffix(student["roll_number"]),
+                    "class_id": self.class_id
+                })
+                continue
+            changes = {}
+            if current.name != student["name"]:
+                changes["name"] = student["name"]
+            if reg and current.reg_number != reg:
+                changes["reg_number"] = reg
+            if changes:
+                updates.append({"id": current.id, **changes})
+            else:
+                self.unchanged += 1
+
+        if inserts:
+            # Bumped before inserting, so new students are stamped with the version
+            # their commit publishes and earlier auto-present fills do not cover them
+            if self.version is None:
+                self.version = data_version.bump(self.db, self.class_id)
+            for student in inserts:
+                student["enrolled_version"] = self.version
+            self.db.execute(insert(s), inserts)
+            self.created += len(inserts)
+        # Bulk UPDATE by primary key, grouped by the columns that change
+        for keys in {tuple(sorted(u)) for u in updates}:
+            self.db.execute(update(s), [u for u in updates if tuple(sorted(u)) == keys])
+        self.updated += len(updates)
+
+    def report(self) -> dict:
+        return {
+            "message": f"Imported {self.created} new and {self.updated} updated students"
+                       + (f", {self.error_count} rows skipped" if self.error_count else ""),
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "error_count": self.error_count,
+            "errors": self.errors
+        }
+
+
+def import_roster(db: Session, class_id: int, file: BinaryIO, filename: Optional[str]) -> RosterImport:
+    """Reads and applies the roster without committing. Raises RosterFileError for unreadable files."""
+    result = RosterImport(db, class_id)
+    chunk = []
+    for item in read_roster(file, filename):
+        chunk.append(item)
+        if len(chunk) >= CHUNK_SIZE:
+            result.add_chunk(chunk)
+            chunk = []
+    if chunk:
+        result.add_chunk(chunk)
+    return result
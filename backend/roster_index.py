@@ -0,0 +1,182 @@
+"""
+In-process roster index used to resolve the short roll numbers typed in chat.
+
+Each class roster is loaded lazily with one query and kept in memory, keyed by
+full roll number, reg number and numeric roll suffix ("7" -> 25CS007). Like
+attendance_matrix, a cached roster remembers the class's data version
+(data_version.py) it was loaded at, and every lookup checks it with a
+primary-key read, so rosters changed by another worker, a script such as
+snapshot.py or an upload are reloaded. upload_csv also drops the class
+from this worker's cache straight away.
+"""
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+
+# With the cache off, rolls are resolved per message with an indexed query on
+# (class_id, roll_suffix) instead of keeping every roster in memory.
+ROSTER_CACHE_ENABLED = os.getenv("ROSTER_CACHE_ENABLED", "true").lower() != "false"
+
+
+class RosterEntry(NamedTuple):
+    id: int
+    roll_number: str
+    reg_number: Optional[str]
+
+
+class ResolvedRolls(NamedTuple):
+    students: Dict[str, int]            # roll as typed -> student id
+    ambiguous: Dict[str, List[str]]     # roll as typed -> matching roll numbers
+
+
+class RosterIndex:
+    def __init__(self, entries: Iterable[RosterEntry], version: int = 0):
+        self.version = version
+        self.by_roll: Dict[str, RosterEntry] = {}
+        self.by_reg: Dict[str, RosterEntry] = {}
+        self.by_suffix: Dict[int, List[RosterEntry]] = {}
+        for entry in entries:
+            if entry.roll_number:
+                self.by_roll[entry.roll_number] = entry
+            if entry.reg_number:
+                self.by_reg[entry.reg_number] = entry
+            suffix = models.roll_suffix(entry.roll_number)
+            if suffix is not None:
+                self.by_suffix.setdefault(suffix, []).append(entry)
+
+    def __len__(self):
+        return len(self.by_roll)
+
+    def match(self, roll: str) -> List[RosterEntry]:
+        """Candidates for `roll`. An exact roll or reg number wins over suffix matches."""
+        if roll in self.by_roll:
+            return [self.by_roll[roll]]
+        if roll in self.by_reg:
+            return [self.by_reg[roll]]
+        if roll.isdigit():
+            return self.by_suffix.get(int(roll), [])
+        return []
+
+    def resolve(self, rolls: Iterable[str]) -> ResolvedRolls:
+        students, ambiguous = {}, {}
+        for roll in rolls:
+            candidates = self.match(roll)
+            if len(candidates) == 1:
+                students[roll] = candidates[0].id
+            elif len(candidates) > 1:
+                ambiguous[roll] = sorted(c.roll_number for c in candidates)
+        return ResolvedRolls(students, ambiguous)
+
+
+_rosters: Dict[int, RosterIndex] = {}
+_lock = threading.Lock()
+
+
+def _version_query(class_id: int):
+    return select(models.ClassDataVersion.version).where(models.ClassDataVersion.class_id == class_id)
+
+
+def _roster_query(class_id: int):
+    return (
+        select(models.Student.id, models.Student.roll_number, models.Student.reg_number)
+        .where(models.Student.class_id == class_id)
+    )
+
+
+def _candidate_query(class_id: int, rolls: List[str]):
+    # Only the rows that can match, found through the (class_id, roll_suffix) index
+    suffixes = {int(r) for r in rolls if r.isdigit()}
+    return (
+        select(models.Student.id, models.Student.roll_number, models.Student.reg_number)
+        .where(
+            models.Student.class_id == class_id,
+            or_(
+                models.Student.roll_suffix.in_(suffixes),
+                models.Student.roll_number.in_(rolls),
+                models.Student.reg_number.in_(rolls)
+            )
+        )
+    )
+
+
+def _lookup(class_id: int, version: int) -> Optional[RosterIndex]:
+    roster = _rosters.get(class_id)
+    if roster is not None and roster.version == version:
+        return roster
+    return None
+
+
+def _cache(class_id: int, version: int, rows) -> RosterIndex:
+    roster = RosterIndex((RosterEntry(*row) for row in rows), version)
+    with _lock:
+        _rosters[class_id] = roster
+    return roster
+
+
+def get_roster(db: Session, class_id: int) -> RosterIndex:
+    """Return the cached roster for a class, reloading it if the class changed since it was cached."""
+    version = db.execute(_version_query(class_id)).scalar() or 0
+    roster = _lookup(class_id, version)
+    if roster is None:
+        roster = _cache(class_id, version, db.execute(_roster_query(class_id)).all())
+    return roster
+
+
+async def get_roster_async(db: AsyncSession, class_id: int) -> RosterIndex:
+    version = (await db.execute(_version_query(class_id))).scalar() or 0
+    roster = _lookup(class_id, version)
+    if roster is None:
+        roster = _cache(class_id, version, (await db.execute(_roster_query(class_id))).all())
+    return roster
+
+
+def on_commit(class_id: int, version: int) -> None:
+    """
+    Bring the class's cached roster to `version` after a committed write that
+    left its students alone. A roster that missed another write in between is
+    dropped instead.
+    """
+    with _lock:
+        roster = _rosters.get(class_id)
+        if roster is None:
+            return
+        if roster.version == version - 1:
+            roster.version = version
+        else:
+            del _rosters[class_id]
+
+
+def invalidate(class_id: Optional[int] = None) -> None:
+    """Drop the cached roster of one class, or of every class when class_id is None."""
+    with _lock:
+        if class_id is None:
+            _rosters.clear()
+        else:
+            _rosters.pop(class_id, None)
+
+
+def resolve_rolls(db: Session, class_id: int, rolls: Iterable[str]) -> ResolvedRolls:
+    """Map rolls typed by a teacher to student ids, reporting ambiguous suffixes."""
+    rolls = list(rolls)
+    if not rolls:
+        return ResolvedRolls({}, {})
+    if ROSTER_CACHE_ENABLED:
+        return get_roster(db, class_id).resolve(rolls)
+    rows = db.execute(_candidate_query(class_id, rolls)).all()
+    return RosterIndex(RosterEntry(*row) for row in rows).resolve(rolls)
+
+
+async def resolve_rolls_async(db: AsyncSession, class_id: int, rolls: Iterable[str]) -> ResolvedRolls:
+    rolls = list(rolls)
+    if not rolls:
+        return ResolvedRolls({}, {})
+    if ROSTER_CACHE_ENABLED:
+        return (await get_roster_async(db, class_id)).resolve(rolls)
+    rows = (await db.execute(_candidate_query(class_id, rolls))).all()
+    return RosterIndex(RosterEntry(*row) for row in rows).resolve(rolls)
@@ -1,6 +1,88 @@
 import re
-from typing import List, Dict, Any, Tuple, Optional
-from datetime import date
+from typing import List, Dict, Any, Optional
+
+import attendance_status
+
+# --- GRAMMAR ---
+# A message is read by one compiled tokenizer (TOKEN_RE) in a single
+# left-to-right scan. Each token is a run of roll numbers (with the status
+# keyword right after it, or ending in a range), a status keyword, a query or
+# an exception; parse() decides the intent from the tokens it has seen: the
+# first query wins outright, otherwise the first exception, then the first
+# range, then the statuses and numbers. Intent keywords match anywhere in the
+# text, not only as whole words ("allshow absent" is a query), and no token
+# can start inside another, so the scan finds the same matches as searching
+# for each pattern on its own.
+
+STATUS_MAP = {
+    'present': ['present', 'here', 'attended', 'came', 'in class', 'p'],
+    'absent': ['absent', 'not present', 'missing', 'away', 'skip', 'skipped', 'a'],
+    'od': ['od', 'on duty', 'official duty', 'on-duty', 'duty', 'o'],
+    'leave': ['leave', 'on leave', 'sick', 'medical', 'emergency', 'l']
+}
+
+# Keyword -> canonical status name (attendance_status) for O(1) lookup
+STATUS_LOOKUP = {kw: attendance_status.canonical(std) for std, keywords in STATUS_MAP.items() for kw in keywords}
+
+_STATUS_WORD = r'absent|present|od|on\s*duty|leave'
+
+# "Session N" suffix added by the frontend
+SESSION_SUFFIX_RE = re.compile(r'\s*Session\s*\d+\s*$', re.IGNORECASE)
+
+# "Log: [content]", "Logged: [content]" or "Session Log: [content]"
+LOG_RE = re.compile(r'^(?:session\s+)?log(?:ged)?:\s*(.*)', re.IGNORECASE | re.DOTALL)
+
+TOKEN_RE = re.compile(
+    # Every token starts with a digit or one of these letters; the lookahead
+    # lets the scan step over other characters without trying each branch
+    r'(?=[\dwslaeop])(?:'
+    # Roll numbers, a run of them at a time ("1, 2, 3"), with the status keyword
+    # right after them or a range: "Roll 1 to 10 on duty" (the "roll numbers"
+    # before it changes nothing)
+    r'(\d+(?:[\s,]+\d+)*)(?:\s+(?:to|-|through)\s+(\d+)\s+(' + _STATUS_WORD + r')'
+    r'|[\s,]+(' + _STATUS_WORD + r'|p|a|o|l)\b)?'
+    # Status keyword: "101 absent, 102, 103 OD"
+    r'|\b(' + _STATUS_WORD + r'|p|a|o|l)\b'
+    # Query: "Who is absent?", "Which students are present?", "Show OD students"
+    r'|(?:who|which|show|list)\s*(?:students?|are|were|is|was)?\s*(' + _STATUS_WORD + r')'
+    r'(?:\s+(?:on|for)?\s*(today|yesterday|\d{4}-\d{2}-\d{2}))?'
+    # Exception: "Everyone [Status] except [Rolls]"
+    r'|(?:everyone|all|whole\s*class)\s+(?:is|are|was|were)?\s*(present|absent)\s+except\s+([\d,\s&and]+)'
+    r')',
+    re.IGNORECASE
+)
+
+NUMBER_RE = re.compile(r'\d+')
+
+
+def _status(keyword: str) -> str:
+    """Status named by a matched keyword, in any case or spacing."""
+    s = keyword.lower()
+    status = STATUS_LOOKUP.get(s)
+    if status is not None:
+        return status
+    if 'duty' in s: return 'OD'
+    if 'leave' in s: return 'Leave'
+    if 'abs' in s: return 'Absent'
+    if 'pres' in s: return 'Present'
+    return 'Absent'
+
+
+# Keywords as the tokenizer returns them in the usual spellings
+STATUS_WORDS = {
+    spelling: _status(word)
+    for word in ('absent', 'present', 'od', 'on duty', 'leave', 'p', 'a', 'o', 'l')
+    for spelling in (word, word.upper(), word.capitalize(), word.title())
+}
+
+
+def _strip_session_suffix(message: str) -> str:
+    # The suffix always ends in a digit, so skip the regex when it cannot match
+    tail = message.rstrip()
+    if tail and tail[-1].isdecimal():
+        message = SESSION_SUFFIX_RE.sub('', message)
+    return message.strip()
+
 
 class SmartAttendanceParser:
     """
@@ -11,29 +93,19 @@ class SmartAttendanceParser:
     3. Multi-status Attendance ("1, 2 absent, 3 OD, 4, 5 present")
     4. Exceptions ("Everyone present except 10, 11")
     5. Ranges ("Roll 1 to 10 on duty")
-    """
 
-    STATUS_MAP = {
-        'present': ['present', 'here', 'attended', 'came', 'in class', 'p'],
-        'absent': ['absent', 'not present', 'missing', 'away', 'skip', 'skipped', 'a'],
-        'od': ['od', 'on duty', 'official duty', 'on-duty', 'duty', 'o'],
-        'leave': ['leave', 'on leave', 'sick', 'medical', 'emergency', 'l']
-    }
+    The parser holds no per-request state; share one instance (default_parser).
+    """
 
-    def __init__(self):
-        # Normalize status keywords for faster lookup
-        self.status_lookup = {}
-        for std, keywords in self.STATUS_MAP.items():
-            for kw in keywords:
-                self.status_lookup[kw] = std.capitalize()
+    STATUS_MAP = STATUS_MAP
+    status_lookup = STATUS_LOOKUP
 
     def parse(self, message: str, class_id: int, subject_id: int) -> Dict[str, Any]:
         # 1. Clean message - Remove "Session N" suffix added by frontend
-        message = re.sub(r'\s*Session\s*\d+\s*$', '', message, flags=re.IGNORECASE).strip()
-        
+        message = _strip_session_suffix(message)
+
         # 2. Check for Session Logging Intent
-        # Pattern: "Log: [content]" or "Logged: [content]" or "Session Log: [content]"
-        log_match = re.match(r'^(?:session\s+)?log(?:ged)?:\s*(.*)', message, re.IGNORECASE | re.DOTALL)
+        log_match = LOG_RE.match(message)
         if log_match:
             content = log_match.group(1).strip()
             if content:
@@ -43,127 +115,108 @@ class SmartAttendanceParser:
                     'confidence': 1.0
                 }
 
-        # 3. Check for Queries
-        # Pattern: "Who is absent?", "Which students are present?", "Show OD students"
-        query_pattern = re.compile(r'(?:who|which|show|list)\s*(?:students?|are|were|is|was)?\s*(absent|present|od|on\s*duty|leave)(?:\s+(?:on|for)?\s*(today|yesterday|\d{4}-\d{2}-\d{2}))?\s*\??', re.IGNORECASE)
-        query_match = query_pattern.search(message)
-        if query_match:
-            status_str = query_match.group(1)
-            date_str = query_match.group(2)
-            return {
-                'pattern_type': 'query',
-                'status': self._normalize_status(status_str),
-                'query_date': date_str,
-                'class_id': class_id,
-                'subject_id': subject_id,
-                'confidence': 1.0
-            }
+        # 3. One scan over the tokens. Numbers wait in `numbers` from `marked`
+        # on until a status keyword claims them; the last mention of a roll wins.
+        entries = {}
+        numbers = []
+        marked = 0
+        first_status = None
+        exception = span = None
+        for rolls, last, span_status, claimed, keyword, query, query_date, base, listed in TOKEN_RE.findall(message):
+            if rolls:
+                # Only digits, commas and whitespace: split, don't search
+                run = rolls.replace(',', ' ').split()
+                numbers += run
+                if last:
+                    if span is None:
+                        # A range starts at the last roll of the run
+                        span = int(run[-1]), int(last), STATUS_WORDS.get(span_status) or _status(span_status)
+                    continue
+                keyword = claimed
+            elif query:
+                # Queries win over everything else
+                return self._query(STATUS_WORDS.get(query) or _status(query), query_date or None, class_id, subject_id)
+            elif base:
+                if exception is None:
+                    exception = base.lower(), NUMBER_RE.findall(listed)
+                continue
+            if keyword:
+                status = STATUS_WORDS.get(keyword) or _status(keyword)
+                if first_status is None:
+                    first_status = status
+                for roll in numbers[marked:]:
+                    entries[roll] = status
+                marked = len(numbers)
 
-        # 4. Handle "Everyone [Status] except [Rolls]"
-        exception_pattern = re.compile(r'(?:everyone|all|whole\s*class)\s+(?:is|are|was|were)?\s*(present|absent)\s+except\s+([\d,\s&and]+)', re.IGNORECASE)
-        exc_match = exception_pattern.search(message)
-        if exc_match:
-            base_status = exc_match.group(1).lower()
-            except_rolls = self._extract_numbers(exc_match.group(2))
-            # If everyone is present except X, then X is absent
-            result_status = 'Absent' if base_status == 'present' else 'Present'
-            return {
-                'pattern_type': 'exception',
-                'roll_numbers': except_rolls,
-                'status': result_status,
-                'class_id': class_id,
-                'subject_id': subject_id,
-                'confidence': 0.9,
-                'note': f"Marking exceptions as {result_status}. Others assumed {base_status.capitalize()}."
-            }
+        if exception:
+            return self._exception(*exception, class_id, subject_id)
+        if span:
+            return self._range(*span, class_id, subject_id)
+        return self._entries(entries, numbers, first_status, class_id, subject_id)
+
+    def _query(self, status: str, query_date: Optional[str], class_id: int, subject_id: int) -> Dict[str, Any]:
+        return {
+            'pattern_type': 'query',
+            'status': status,
+            'query_date': query_date,
+            'class_id': class_id,
+            'subject_id': subject_id,
+            'confidence': 1.0
+        }
+
+    def _exception(self, base_status: str, except_rolls: List[str], class_id: int, subject_id: int) -> Dict[str, Any]:
+        # If everyone is present except X, then X is absent
+        result_status = 'Absent' if base_status == 'present' else 'Present'
+        return {
+            'pattern_type': 'exception',
+            'roll_numbers': except_rolls,
+            'status': result_status,
+            'class_id': class_id,
+            'subject_id': subject_id,
+            'confidence': 0.9,
+            'note': f"Marking exceptions as {result_status}. Others assumed {base_status.capitalize()}."
+        }
+
+    def _range(self, start: int, end: int, status: str, class_id: int, subject_id: int) -> Dict[str, Any]:
+        return {
+            'pattern_type': 'range',
+            'roll_numbers': list(map(str, range(start, end + 1))),
+            'status': status,
+            'class_id': class_id,
+            'subject_id': subject_id,
+            'confidence': 1.0
+        }
 
-        # 5. Handle Ranges ("1 to 10 absent")
-        range_pattern = re.compile(r'(?:roll\s*numbers?\s*)?(\d+)\s+(?:to|-|through)\s+(\d+)\s+(absent|present|od|on\s*duty|leave)', re.IGNORECASE)
-        range_match = range_pattern.search(message)
-        if range_match:
-            start, end = int(range_match.group(1)), int(range_match.group(2))
-            status_str = range_match.group(3)
-            rolls = [str(i) for i in range(start, end + 1)]
+    def _entries(self, entries: Dict[str, str], numbers: List[str], first_status: Optional[str],
+                 class_id: int, subject_id: int) -> Dict[str, Any]:
+        # 4. Multi-status entries ("101 absent, 102, 103 OD, 104 present")
+        if entries:
             return {
-                'pattern_type': 'range',
-                'roll_numbers': rolls,
-                'status': self._normalize_status(status_str),
+                'pattern_type': 'multiple',
+                'entries': [{'roll_number': roll, 'status': status} for roll, status in entries.items()],
                 'class_id': class_id,
                 'subject_id': subject_id,
                 'confidence': 1.0
             }
 
-        # 6. Robust Multi-status Parsing
-        # Example: "101 absent, 102, 103 OD, 104 present"
-        status_regex = r'\b(absent|present|od|on\s*duty|leave|p|a|o|l)\b'
-        parts = re.split(status_regex, message, flags=re.IGNORECASE)
-        
-        entries = []
-        # re.split with groups returns [text, status, text, status...]
-        for i in range(0, len(parts) - 1, 2):
-            text_context = parts[i]
-            status_found = parts[i+1]
-            
-            rolls = self._extract_numbers(text_context)
-            status = self._normalize_status(status_found)
-            
-            for r in rolls:
-                entries.append({'roll_number': r, 'status': status})
-        
-        if entries:
-            # Deduplicate - last mention wins
-            final_map = {}
-            for entry in entries:
-                final_map[entry['roll_number']] = entry['status']
-            
+        # 5. Final Fallback: a status and any numbers ("absent 5, 6")
+        if first_status is not None and numbers:
             return {
-                'pattern_type': 'multiple',
-                'entries': [{'roll_number': r, 'status': s} for r, s in final_map.items()],
+                'pattern_type': 'fallback',
+                'roll_numbers': numbers,
+                'status': first_status,
                 'class_id': class_id,
                 'subject_id': subject_id,
-                'confidence': 1.0
+                'confidence': 0.8
             }
 
-        # 7. Final Fallback: Just look for a status and any numbers
-        possible_status = re.search(status_regex, message, re.IGNORECASE)
-        if possible_status:
-            status = self._normalize_status(possible_status.group(1))
-            rolls = self._extract_numbers(message)
-            if rolls:
-                return {
-                    'pattern_type': 'fallback',
-                    'roll_numbers': rolls,
-                    'status': status,
-                    'class_id': class_id,
-                    'subject_id': subject_id,
-                    'confidence': 0.8
-                }
-
         return {
             'error': "I couldn't understand that. You can say '101 absent', 'Log: Today we started SQL', or 'Who is absent today?'",
             'confidence': 0.0
         }
 
-    def _extract_numbers(self, text: str) -> List[str]:
-        # Clean text by removing any non-numeric and non-separator characters
-        # But keep spaces and commas
-        clean = re.sub(r'[^\d\s,]', ' ', text)
-        return re.findall(r'\b\d+\b', clean)
-
-    def _normalize_status(self, status_str: str) -> str:
-        s = status_str.lower().strip()
-        # Direct lookup
-        if s in self.status_lookup:
-            return self.status_lookup[s]
-        
-        # Partial match
-        if 'duty' in s: return 'OD'
-        if 'leave' in s: return 'Leave'
-        if 'abs' in s: return 'Absent'
-        if 'pres' in s: return 'Present'
-        
-        return 'Absent' # Default
-
 class AdvancedAttendanceParser(SmartAttendanceParser):
     """Placeholder for future enhancements like spell check."""
     pass
+
+default_parser = AdvancedAttendanceParser()
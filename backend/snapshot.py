@@ -0,0 +1,276 @@
+"""
+Whole-database snapshots, for backups and for moving data between Supabase
+and a local SQLite file:
+
+    python snapshot.py dump attmate.ndjson.gz [--url URL]
+    python snapshot.py restore attmate.ndjson.gz [--url URL] [--replace]
+
+Without --url both use the database the app would (database.py).
+
+A snapshot is gzipped NDJSON: a header line, then for every table in
+models.py, parents before children, a {"table", "columns"} line followed by
+one JSON array per row. Tables are read through server-side cursors and
+written as they are read, so neither side holds a table in memory.
+
+restore migrates the target to the latest schema and loads everything in one
+transaction: COPY on PostgreSQL, batched executemany on SQLite. It then moves
+PostgreSQL sequences past the restored ids and bumps every class's data
+version, so running apps drop their cached registers. It also reads the
+legacy database_export.json document. Per-student attendance rows in older
+snapshots are folded into sessions (attendance_fold.py).
+"""
+import argparse
+import gzip
+import io
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import Date, DateTime, Integer, create_engine, delete, exists, insert, select, text
+
+import attendance_fold
+import data_version
+import migrate
+import models
+
+FORMAT = "attmate-snapshot"
+VERSION = 1
+BATCH_SIZE = 5000
+
+Batch = Tuple[str, List[str], List[list]]
+
+
+def engine_for(url):
+    if url:
+        return create_engine(url)
+    from database import engine
+    return engine
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _report(name: str, rows: int, seconds: float) -> None:
+    rate = rows / seconds if seconds else 0
+    print(f"  {name:<26} {rows:>10,} rows  {seconds:6.2f} s  {rate:>12,.0f} rows/s")
+
+
+# --- DUMP ---
+def dump(path: str, url: str = None) -> int:
+    engine = engine_for(url)
+    started = time.perf_counter()
+    total = 0
+    encode = json.JSONEncoder(default=_json_default, separators=(",", ":")).encode
+    with engine.connect() as conn, gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as out:
+        revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar() \
+            if engine.dialect.has_table(conn, "alembic_version") else None
+        out.write(encode({
+            "format": FORMAT, "version": VERSION, "created": datetime.utcnow(),
+            "dialect": engine.dialect.name, "revision": revision
+        }) + "\n")
+        print(f"Dumping {engine.url.render_as_string()} to {path}")
+        for table in models.Base.metadata.sorted_tables:
+            table_started = time.perf_counter()
+            out.write(encode({"table": table.name, "columns": [c.name for c in table.columns]}) + "\n")
+            result = conn.execution_options(stream_results=True, yield_per=BATCH_SIZE).execute(
+                select(*table.columns).order_by(*table.primary_key.columns)
+            )
+            rows = 0
+            for partition in result.partitions():
+                out.write("".join(encode(list(row)) + "\n" for row in partition))
+                rows += len(partition)
+            total += rows
+            _report(table.name, rows, time.perf_counter() - table_started)
+    _report("total", total, time.perf_counter() - started)
+    return total
+
+
+# --- READING ---
+def _snapshot_batches(lines: Iterator[str]) -> Iterator[Batch]:
+    header = json.loads(next(lines))
+    if header.get("format") != FORMAT or header.get("version") != VERSION:
+        raise SystemExit("Not an AttMate snapshot (version %s)." % VERSION)
+    table, columns, batch = None, None, []
+    for line in lines:
+        item = json.loads(line)
+        if isinstance(item, dict):
+            if batch:
+                yield table, columns, batch
+            table, columns, batch = item["table"], item["columns"], []
+            continue
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            yield table, columns, batch
+            batch = []
+    if batch:
+        yield table, columns, batch
+
+
+def _legacy_batches(path: str) -> Iterator[Batch]:
+    """database_export.json: {table: [row objects]}, from before roll_suffix and status_code existed."""
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    for table in [*models.Base.metadata.sorted_tables, attendance_fold.LEGACY_TABLE]:
+        rows = document.get(table.name) or []
+        if not rows:
+            continue
+        for row in rows:
+            if table.name == "students":
+                row.setdefault("roll_suffix", models.roll_suffix(row.get("roll_number")))
+        columns = [c.name for c in table.columns if c.name in rows[0]]
+        for i in range(0, len(rows), BATCH_SIZE):
+            yield table.name, columns, [[row.get(c) for c in columns] for row in rows[i:i + BATCH_SIZE]]
+
+
+def read_batches(path: str) -> Iterator[Batch]:
+    if path.endswith(".json"):
+        return _legacy_batches(path)
+    return _snapshot_batches(iter(gzip.open(path, "rt", encoding="utf-8")))
+
+
+# --- RESTORE ---
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy(conn, table: str, columns: List[str], rows: List[list]) -> None:
+    data = io.StringIO("".join("\t".join(_copy_value(v) for v in row) + "\n" for row in rows))
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN', data)
+    finally:
+        cursor.close()
+
+
+def _converters(table, columns: List[str]):
+    """SQLAlchemy's SQLite Date and DateTime types only accept Python objects, not ISO strings."""
+    converters = []
+    for name in columns:
+        column_type = table.columns[name].type
+        if isinstance(column_type, DateTime):
+            converters.append(datetime.fromisoformat)
+        elif isinstance(column_type, Date):
+            converters.append(date.fromisoformat)
+        else:
+            converters.append(None)
+    return converters
+
+
+def _executemany(conn, table, columns: List[str], rows: List[list]) -> None:
+    converters = _converters(table, columns)
+    params = [
+        {name: (convert(value) if convert and value is not None else value)
+         for name, convert, value in zip(columns, converters, row)}
+        for row in rows
+    ]
+    conn.execute(insert(table), params)
+
+
+def _reset_sequences(conn) -> None:
+    for table in models.Base.metadata.sorted_tables:
+        pk = list(table.primary_key.columns)
+        if len(pk) != 1 or pk[0].foreign_keys or not isinstance(pk[0].type, Integer):
+            continue
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', '{pk[0].name}'), "
+            f"COALESCE(MAX({pk[0].name}), 1), MAX({pk[0].name}) IS NOT NULL) FROM {table.name}"
+        ))
+
+
+def load(engine, batches: Iterator[Batch], replace: bool = False) -> int:
+    """
+    Bulk-load (table, columns, rows) batches into an empty database in one
+    transaction, after migrating it. Batches may come in any order that puts
+    parent rows first. Shared by restore and generate_dataset.py.
+    """
+    postgres = engine.dialect.name == "postgresql"
+    tables = {t.name: t for t in models.Base.metadata.sorted_tables}
+
+    with engine.connect() as conn:
+        migrate.upgrade(connection=conn)
+        conn.commit()
+
+    started = time.perf_counter()
+    total = 0
+    with engine.begin() as conn:
+        occupied = [name for name, t in tables.items() if conn.execute(select(exists().select_from(t))).scalar()]
+        if occupied and not replace:
+            raise SystemExit(f"Target database is not empty ({', '.join(occupied)}). Pass --replace to overwrite it.")
+        for table in reversed(models.Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+
+        counts, timings = {}, {}
+        legacy = stamp = False
+        for name, columns, rows in batches:
+            if name == "students" and "enrolled_version" not in columns:
+                stamp = True  # Legacy exports have no enrollment versions
+            table = tables.get(name)
+            if table is None and name == attendance_fold.LEGACY_TABLE.name:
+                # Per-student rows from before revision 0003: staged, then folded into sessions
+                table = attendance_fold.LEGACY_TABLE
+                if not legacy:
+                    table.create(conn)
+                    legacy = True
+            if table is None:
+                continue  # Table dropped since the snapshot was taken
+            known = [i for i, c in enumerate(columns) if c in table.columns]
+            if len(known) != len(columns):
+                columns = [columns[i] for i in known]
+                rows = [[row[i] for i in known] for row in rows]
+            batch_started = time.perf_counter()
+            if postgres:
+                _copy(conn, name, columns, rows)
+            else:
+                _executemany(conn, table, columns, rows)
+            counts[name] = counts.get(name, 0) + len(rows)
+            timings[name] = timings.get(name, 0) + time.perf_counter() - batch_started
+
+        if stamp:
+            attendance_fold.stamp_enrollments(conn)
+        if legacy:
+            attendance_fold.fold(conn)
+            attendance_fold.LEGACY_TABLE.drop(conn)
+        if postgres:
+            _reset_sequences(conn)
+        conn.execute(data_version.bump_all_statement(engine.dialect.name))
+
+    for name in tables:
+        if name in counts:
+            _report(name, counts[name], timings[name])
+            total += counts[name]
+    _report("total", total, time.perf_counter() - started)
+    return total
+
+
+def restore(path: str, url: str = None, replace: bool = False) -> int:
+    engine = engine_for(url)
+    print(f"Restoring {path} into {engine.url.render_as_string()}")
+    return load(engine, read_batches(path), replace)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    dump_parser = commands.add_parser("dump", help="write every table to a snapshot file")
+    dump_parser.add_argument("path")
+    dump_parser.add_argument("--url", help="source database (default: the app's)")
+    restore_parser = commands.add_parser("restore", help="load a snapshot (or database_export.json)")
+    restore_parser.add_argument("path")
+    restore_parser.add_argument("--url", help="target database (default: the app's)")
+    restore_parser.add_argument("--replace", action="store_true", help="delete the target's existing rows first")
+    args = arg_parser.parse_args()
+    if args.command == "dump":
+        dump(args.path, args.url)
+    else:
+        restore(args.path, args.url, args.replace)
@@ -0,0 +1,151 @@
+"""
+Soak test: the connection pools keep serving through a database restart.
+
+Worker threads (sync engine) and coroutines (async engine) run small queries
+in a loop against DATABASE_URL, with the pool settings from database.py.
+After --warmup seconds every server connection is dropped: by
+--restart-command (for example "docker restart supabase-db") or, by default,
+by terminating this database's other backends with pg_terminate_backend,
+which is what clients see when the server restarts or Supabase recycles
+connections. The run then continues for --duration seconds.
+
+Prints errors per second and the pool metrics, and exits 1 unless queries
+succeed again within --max-recovery seconds and keep succeeding:
+
+    DATABASE_URL=postgresql://... python soak_pool.py [--workers 8] [--warmup 10] [--duration 30]
+
+PostgreSQL only; point it at a database whose connections may be killed.
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+import database
+import metrics
+
+QUERY = text("SELECT count(*) FROM pg_stat_activity")
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ok = Counter()
+        self.errors = Counter()
+        self.last_error = {}
+
+    def record(self, second: int, error: Exception = None) -> None:
+        with self.lock:
+            if error is None:
+                self.ok[second] += 1
+            else:
+                self.errors[second] += 1
+                self.last_error[second] = f"{type(error).__name__}: {str(error).splitlines()[0][:120]}"
+
+
+def sync_worker(started: float, stop: threading.Event, results: Results) -> None:
+    while not stop.is_set():
+        try:
+            with database.engine.connect() as conn:
+                conn.execute(QUERY).scalar()
+            results.record(int(time.perf_counter() - started))
+        except Exception as e:
+            results.record(int(time.perf_counter() - started), e)
+            time.sleep(0.1)
+        time.sleep(0.02)
+
+
+async def async_worker(started: float, stop: threading.Event, results: Results) -> None:
+    while not stop.is_set():
+        try:
+            async with database.async_engine.connect() as conn:
+                (await conn.execute(QUERY)).scalar()
+            results.record(int(time.perf_counter() - started))
+        except Exception as e:
+            results.record(int(time.perf_counter() - started), e)
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.02)
+
+
+def async_workers(count: int, started: float, stop: threading.Event, results: Results) -> None:
+    async def main():
+        await asyncio.gather(*[async_worker(started, stop, results) for _ in range(count)])
+        await database.async_engine.dispose()
+    asyncio.run(main())
+
+
+def drop_connections(command: str = None) -> None:
+    if command:
+        subprocess.run(command, shell=True, check=True)
+        return
+    # A separate, unpooled engine, so the pools under test are left alone
+    killer = create_engine(database.engine.url, poolclass=NullPool)
+    with killer.begin() as conn:
+        terminated = conn.execute(text(
+            "SELECT count(pg_terminate_backend(pid)) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND usename = current_user AND pid <> pg_backend_pid()"
+        )).scalar()
+    killer.dispose()
+    print(f"Terminated {terminated} connections.")
+
+
+def main(args) -> int:
+    if database.engine.dialect.name != "postgresql":
+        raise SystemExit("soak_pool.py needs DATABASE_URL to point at PostgreSQL.")
+    metrics.instrument(database.labelled_engines())
+    print(f"Soaking {database.engine.url.render_as_string()} with pool_size={database.DB_POOL_SIZE}, "
+          f"max_overflow={database.DB_MAX_OVERFLOW}, pre_ping={database.DB_POOL_PRE_PING}, "
+          f"pgbouncer={database.uses_pgbouncer(database.engine.url)}")
+
+    results, stop = Results(), threading.Event()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=sync_worker, args=(started, stop, results)) for _ in range(args.workers)]
+    threads.append(threading.Thread(target=async_workers, args=(args.workers, started, stop, results)))
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.warmup)
+    restart = int(time.perf_counter() - started)
+    drop_connections(args.restart_command)
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    end = int(time.perf_counter() - started)
+    print(f"{'second':>6} {'ok':>6} {'errors':>6}")
+    for second in range(end + 1):
+        marker = "  <- connections dropped" if second == restart else ""
+        print(f"{second:>6} {results.ok[second]:>6} {results.errors[second]:>6}{marker}  {results.last_error.get(second, '')}")
+
+    # Recovered at the first second after the restart with successes and no errors
+    recovered = next((s for s in range(restart, end + 1) if results.ok[s] and not results.errors[s]), None)
+    late_errors = sum(n for s, n in results.errors.items() if recovered is not None and s > recovered)
+    print()
+    print("\n".join(line for line in metrics.render().splitlines() if line.startswith("attmate_db_pool") and "_bucket" not in line))
+    print()
+    if recovered is None or recovered - restart > args.max_recovery:
+        print(f"FAIL: no recovery within {args.max_recovery} s of dropping the connections.")
+        return 1
+    if late_errors:
+        print(f"FAIL: {late_errors} errors after recovering at {recovered - restart} s.")
+        return 1
+    print(f"Recovered {recovered - restart} s after dropping the connections, "
+          f"with {sum(results.errors.values())} failed queries in total.")
+    return 0
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--workers", type=int, default=8, help="sync threads, and as many async coroutines")
+    arg_parser.add_argument("--warmup", type=float, default=10, help="seconds before dropping connections")
+    arg_parser.add_argument("--duration", type=float, default=30, help="seconds to run after dropping them")
+    arg_parser.add_argument("--max-recovery", type=int, default=5, help="seconds allowed until queries succeed again")
+    arg_parser.add_argument("--restart-command", help="shell command that restarts the database server")
+    sys.exit(main(arg_parser.parse_args()))
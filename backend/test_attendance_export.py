@@ -0,0 +1,166 @@
+"""
+/export/attendance streams: the rows of the CSV and XLSX downloads (filled
+sessions, exceptions and kept status text), the class, subject and date
+filters, and csv_stream flushing in CSV_FLUSH_BYTES pieces while rows are
+still being read. database.py reads its URL at import, so conftest.py runs
+this module in its own process:
+
+    python -m pytest test_attendance_export.py
+"""
+import os
+import tempfile
+from datetime import date, datetime
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-export-"), "attmate.db")
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["WARMUP_ENABLED"] = "false"
+
+import asyncio
+import csv
+import io
+
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from sqlalchemy import insert
+
+import attendance_export
+import attendance_status
+import data_version
+import database
+import migrate
+import models
+import repository
+from main import app
+
+with database.engine.connect() as conn:
+    migrate.upgrade(connection=conn)
+    conn.commit()
+
+with database.SessionLocal() as db:
+    db.add_all([models.Class(id=1, name="CSE-A"), models.Class(id=2, name="CSE-B"),
+                models.Subject(id=1, name="DBMS"), models.Subject(id=2, name="OS")])
+    db.add_all([models.Student(id=n, roll_number=f"10{n}", reg_number=f"REG{n}", name=f"Student {n}", class_id=1)
+                for n in range(1, 4)])
+    db.add_all([models.Student(id=n, roll_number=f"20{n}", name=f"Student {n}", class_id=2) for n in (4, 5)])
+    db.flush()
+    # Adding students bumps their class, which publishes their enrolled_version
+    data_version.bump(db, 1)
+    data_version.bump(db, 2)
+    db.commit()
+
+
+def _write(class_id, subject_id, day, statuses, fill_present=False):
+    async def write():
+        async with database.AsyncSessionLocal() as db:
+            await repository.write_attendance(db, class_id, subject_id, day, statuses, fill_present)
+            await repository.bump_data_version(db, class_id)
+            await db.commit()
+        await database.async_engine.dispose()
+    asyncio.run(write())
+
+
+_write(1, 1, date(2026, 1, 5), {2: "Absent"}, fill_present=True)
+_write(1, 1, date(2026, 1, 6), {1: "OD"})
+_write(1, 2, date(2026, 1, 5), {3: "Leave"}, fill_present=True)
+_write(2, 1, date(2026, 1, 5), {}, fill_present=True)
+# A status kept as written by an older snapshot
+with database.engine.begin() as conn:
+    key = {"class_id": 2, "subject_id": 1, "date": date(2026, 1, 7)}
+    conn.execute(insert(models.AttendanceSession), [key])
+    conn.execute(insert(models.AttendanceException), [
+        {**key, "student_id": 5, "status_code": attendance_status.OTHER, "status_text": "Sick"}
+    ])
+
+ROWS = [
+    ["CSE-A", "DBMS", "2026-01-05", "101", "REG1", "Student 1", "Present"],
+    ["CSE-A", "DBMS", "2026-01-05", "102", "REG2", "Student 2", "Absent"],
+    ["CSE-A", "DBMS", "2026-01-05", "103", "REG3", "Student 3", "Present"],
+    ["CSE-A", "DBMS", "2026-01-06", "101", "REG1", "Student 1", "OD"],
+    ["CSE-A", "OS", "2026-01-05", "101", "REG1", "Student 1", "Present"],
+    ["CSE-A", "OS", "2026-01-05", "102", "REG2", "Student 2", "Present"],
+    ["CSE-A", "OS", "2026-01-05", "103", "REG3", "Student 3", "Leave"],
+    ["CSE-B", "DBMS", "2026-01-05", "204", "", "Student 4", "Present"],
+    ["CSE-B", "DBMS", "2026-01-05", "205", "", "Student 5", "Present"],
+    ["CSE-B", "DBMS", "2026-01-07", "205", "", "Student 5", "Sick"],
+]
+
+
+def _csv_rows(client, **params):
+    response = client.get("/export/attendance", params=params)
+    assert response.status_code == 200, response.text
+    header, *rows = csv.reader(io.StringIO(response.content.decode("utf-8")))
+    assert header == attendance_export.HEADER
+    return response, rows
+
+
+def test_csv_download():
+    with TestClient(app) as client:
+        response, rows = _csv_rows(client)
+    assert response.headers["content-type"] == attendance_export.MEDIA_TYPES["csv"]
+    assert response.headers["content-disposition"] == 'attachment; filename="attendance.csv"'
+    assert rows == ROWS
+
+
+def test_filters():
+    with TestClient(app) as client:
+        assert _csv_rows(client, class_id=2)[1] == ROWS[7:]
+        assert _csv_rows(client, class_id=[1, 2], subject_id=2)[1] == ROWS[4:7]
+        response, rows = _csv_rows(client, class_id=1, start_date="2026-01-06", end_date="2026-01-07")
+        assert rows == [ROWS[3]]
+        disposition = response.headers["content-disposition"]
+        assert disposition == 'attachment; filename="attendance_2026-01-06_2026-01-07.csv"'
+        assert _csv_rows(client, start_date="2026-02-01")[1] == []
+        backwards = {"start_date": "2026-01-07", "end_date": "2026-01-05"}
+        assert client.get("/export/attendance", params=backwards).status_code == 400
+        assert client.get("/export/attendance", params={"format": "pdf"}).status_code == 422
+
+
+def test_xlsx_download():
+    with TestClient(app) as client:
+        response = client.get("/export/attendance", params={"format": "xlsx"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == attendance_export.MEDIA_TYPES["xlsx"]
+    sheet = load_workbook(io.BytesIO(response.content), read_only=True)["Attendance"]
+    header, *rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+    assert header == attendance_export.HEADER
+    # Dates are real date cells, empty reg numbers empty cells
+    assert [
+        [c.date().isoformat() if isinstance(c, datetime) else ("" if c is None else c) for c in row] for row in rows
+    ] == ROWS
+
+
+def test_csv_stream_flushes_while_reading():
+    consumed = []
+
+    def rows():
+        for n in range(20000):
+            consumed.append(n)
+            yield ["CSE-A", "DBMS", date(2026, 1, 5), f"{n:05d}", "", f"Student {n}", "Present"]
+
+    stream = attendance_export.csv_stream(rows())
+    first = next(stream)
+    # The first piece goes out as soon as it is full, long before the last row is read
+    assert len(first) >= attendance_export.CSV_FLUSH_BYTES
+    assert len(consumed) < 20000
+    chunks = [first] + list(stream)
+    assert all(len(chunk) >= attendance_export.CSV_FLUSH_BYTES for chunk in chunks[:-1])
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert len(lines) == 20001
+    assert lines[-1] == "CSE-A,DBMS,2026-01-05,19999,,Student 19999,Present"
+
+
+def test_xlsx_stream_chunks():
+    chunks = list(attendance_export.xlsx_stream(iter([ROWS[0]] * 500), chunk_size=4096))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 4096 for chunk in chunks)
+    sheet = load_workbook(io.BytesIO(b"".join(chunks)), read_only=True)["Attendance"]
+    assert sum(1 for _ in sheet.iter_rows()) == 501
+
+
+if __name__ == "__main__":
+    test_csv_download()
+    test_filters()
+    test_xlsx_download()
+    test_csv_stream_flushes_while_reading()
+    test_xlsx_stream_chunks()
+    print("Attendance export OK.")
@@ -0,0 +1,259 @@
+"""
+Session storage: attendance written as sessions plus exception rows, through
+repository.write_attendance as /chat/ writes it, reads back the same through
+the register, the daily summary and the export, and legacy per-student rows
+fold into it. database.py reads its URL at import, so conftest.py runs this
+module in its own process:
+
+    python -m pytest test_attendance_sessions.py
+"""
+import os
+import tempfile
+from datetime import date
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-sessions-"), "attmate.db")
+os.environ.pop("DATABASE_READ_URL", None)
+
+import asyncio
+import io
+import random
+
+from sqlalchemy import delete, func, insert, select
+
+import attendance_export
+import attendance_fold
+import attendance_matrix
+import daily_summary
+import data_version
+import database
+import migrate
+import models
+import repository
+import roster_import
+
+with database.engine.connect() as conn:
+    migrate.upgrade(connection=conn)
+    conn.commit()
+
+with database.SessionLocal() as db:
+    db.add_all([models.Class(id=1, name="CSE-A"), models.Class(id=2, name="CSE-B"), models.Class(id=3, name="CSE-C"),
+                models.Subject(id=1, name="DBMS")])
+    db.add_all([models.Student(id=n, roll_number=f"10{n}", name=f"Student {n}", class_id=1) for n in range(1, 6)])
+    db.commit()
+
+DAY = date(2026, 1, 5)
+
+
+def _write(class_id, subject_id, day, statuses, fill_present=False) -> int:
+    """One /chat/ write: the marks, auto-present and the version bump, committed."""
+    async def write():
+        async with database.AsyncSessionLocal() as db:
+            filled = await repository.write_attendance(db, class_id, subject_id, day, statuses, fill_present)
+            await repository.bump_data_version(db, class_id)
+            await db.commit()
+        await database.async_engine.dispose()
+        return filled
+    return asyncio.run(write())
+
+
+def _register(class_id=1):
+    with database.SessionLocal() as db:
+        register = attendance_matrix.get_register(db, class_id, 1)
+        return {s["id"]: s["attendance"].get(DAY.isoformat()) for s in register.sheet()["students"]}
+
+
+def _summary(class_id=1):
+    with database.SessionLocal() as db:
+        row = db.execute(select(models.AttendanceDailySummary).where(
+            models.AttendanceDailySummary.class_id == class_id, models.AttendanceDailySummary.date == DAY
+        )).scalar_one()
+        return row.present, row.absent, row.od, row.total
+
+
+def _scalar(stmt):
+    with database.SessionLocal() as db:
+        return db.execute(stmt).scalar()
+
+
+def _exported(class_id=1):
+    return {row[3]: row[6] for row in attendance_export.register_rows([class_id], 1, DAY, DAY)}
+
+
+def _add_student(class_id, student_id, roll_number):
+    with database.SessionLocal() as db:
+        db.add(models.Student(id=student_id, roll_number=roll_number, name=f"Student {student_id}", class_id=class_id))
+        db.flush()
+        data_version.bump(db, class_id)
+        db.commit()
+
+
+def test_marks_fill_and_late_students():
+    # Marking alone implies nothing about the others
+    assert _write(1, 1, DAY, {2: "Absent"}) == 0
+    assert _scalar(select(models.AttendanceSession.filled_through)) is None
+    assert _register() == {1: "-", 2: "A", 3: "-", 4: "-", 5: "-"}
+    assert _summary() == (0, 1, 0, 1)
+
+    # Auto-present fills the three students without a record, without a row each
+    assert _write(1, 1, DAY, {4: "OD"}, fill_present=True) == 3
+    assert _scalar(select(func.count()).select_from(models.AttendanceException)) == 2
+    assert _register() == {1: "P", 2: "A", 3: "P", 4: "O", 5: "P"}
+    assert _summary() == (3, 1, 1, 5)
+
+    # A student who joins afterwards is not marked by the earlier fill...
+    _add_student(1, 6, "106")
+    assert _register()[6] == "-"
+    assert _summary() == (3, 1, 1, 5)
+    assert "106" not in _exported()
+
+    # ...until the next auto-present, which counts only them
+    assert _write(1, 1, DAY, {1: "Absent"}, fill_present=True) == 1
+    assert _register() == {1: "A", 2: "A", 3: "P", 4: "O", 5: "P", 6: "P"}
+    assert _summary() == (3, 2, 1, 6)
+    assert _exported() == {
+        "101": "Absent", "102": "Absent", "103": "Present", "104": "OD", "105": "Present", "106": "Present"
+    }
+
+    # With nothing left to fill the session is not rewritten
+    assert _write(1, 1, DAY, {3: "Absent"}, fill_present=True) == 0
+    assert _summary() == (2, 3, 1, 6)
+
+
+def test_students_added_after_a_fill_whatever_their_ids():
+    _add_student(3, 30, "3030")
+    _add_student(3, 31, "3031")
+    assert _write(3, 1, DAY, {}, fill_present=True) == 2
+
+    with database.SessionLocal() as db:
+        # A lower id than everyone the session filled
+        db.add(models.Student(id=25, roll_number="3025", name="Student 25", class_id=3))
+        db.flush()
+        data_version.bump(db, 3)
+        # SQLite hands the highest id out again once it is deleted
+        db.execute(delete(models.Student).where(models.Student.id == 31))
+        db.commit()
+        result = roster_import.import_roster(db, 3, io.BytesIO(b"Roll Number,Name\n3099,Student 99\n"), "roster.csv")
+        assert result.created == 1 and result.version is not None
+        db.commit()
+    assert _scalar(select(models.Student.id).where(models.Student.roll_number == "3099")) == 31
+
+    assert _register(3) == {25: "-", 30: "P", 31: "-"}
+    # The student was deleted behind the app's back, which only a rebuild counts
+    daily_summary.rebuild_class(3)
+    assert _summary(3) == (1, 0, 0, 1)
+    assert _exported(3) == {"3030": "Present"}
+
+    # The next auto-present fills both
+    assert _write(3, 1, DAY, {}, fill_present=True) == 2
+    assert _summary(3) == (3, 0, 0, 3)
+
+
+def test_summary_deltas_match_recounts():
+    rng = random.Random(4)
+    with database.SessionLocal() as db:
+        db.add(models.Class(id=4, name="CSE-D"))
+        db.commit()
+    for n in range(40, 48):
+        _add_student(4, n, f"40{n}")
+    days = [date(2026, 2, d) for d in (2, 3)]
+    for step in range(60):
+        if step % 15 == 14:
+            _add_student(4, 48 + step, f"4{48 + step}")
+        roster = list(range(40, 48)) + [48 + s for s in range(14, step + 1, 15)]
+        marks = {sid: rng.choice(["Present", "Absent", "OD", "Leave"]) for sid in rng.sample(roster, rng.randint(0, 3))}
+        _write(4, 1, rng.choice(days), marks, fill_present=rng.random() < 0.4)
+
+    def summaries():
+        with database.SessionLocal() as db:
+            summary = models.AttendanceDailySummary
+            return db.execute(select(
+                summary.date, summary.present, summary.absent, summary.od, summary.leave, summary.total
+            ).where(summary.class_id == 4).order_by(summary.date)).all()
+
+    written = summaries()
+    daily_summary.rebuild_class(4)
+    assert written == summaries()
+
+
+def test_registers_patched_after_commit():
+    with database.SessionLocal() as db:
+        db.add(models.Class(id=5, name="CSE-E"))
+        db.commit()
+    for n in range(120, 124):
+        _add_student(5, n, f"5{n}")
+
+    def committed(statuses, day=DAY, fill_present=False):
+        """A write, then the on_commit /chat/ runs; returns the cached register and a fresh load."""
+        _write(5, 1, day, statuses, fill_present)
+        version = _scalar(select(models.ClassDataVersion.version).where(models.ClassDataVersion.class_id == 5))
+        attendance_matrix.on_commit(5, version, 1, day, statuses, fill_present)
+        with database.SessionLocal() as db:
+            cached = attendance_matrix.get_register(db, 5, 1)
+            fresh = attendance_matrix.Register.build(
+                version, db.execute(attendance_matrix._students_query(5)).all(),
+                db.execute(attendance_matrix._cells_query(5, 1)).all()
+            )
+        assert cached.sheet() == fresh.sheet()
+        return cached
+
+    first = committed({120: "Absent"})
+    # Later writes of the same day patch the cached cells in place
+    codes = first.codes
+    assert committed({121: "OD"}, fill_present=True) is first
+    assert committed({122: "Absent"}) is first
+    assert first.codes is codes
+    # A new day is inserted into a copy
+    assert committed({123: "Absent"}, day=date(2026, 1, 2)) is not first
+
+
+# Last: stamping renumbers the students of every class
+def test_fold_legacy_rows():
+    day = date(2026, 1, 6)
+    with database.SessionLocal() as db:
+        db.add_all([models.Student(id=n, roll_number=f"20{n}", name=f"Student {n}", class_id=2) for n in range(11, 15)])
+        db.commit()
+    legacy = attendance_fold.LEGACY_TABLE
+    rows = [
+        # Everyone recorded: the Present rows fold into filled_through
+        (11, 1, day, "Absent"), (12, 1, day, "Present"), (13, 1, day, "present"), (14, 1, day, "P"),
+        # A later duplicate wins
+        (11, 1, day, "Present"), (12, 1, day, "Leave"),
+        # Only some recorded: the Present row after the gap stays an exception, and an
+        # unknown status keeps its text
+        (11, 1, DAY, "Present"), (13, 1, DAY, "Present"), (14, 1, DAY, "Sick"),
+    ]
+    with database.engine.connect() as conn:
+        legacy.create(conn)
+        conn.execute(insert(legacy), [
+            {"student_id": s, "subject_id": subj, "date": d, "status": name, "class_id": 2}
+            for s, subj, d, name in rows
+        ])
+        attendance_fold.stamp_enrollments(conn)
+        assert attendance_fold.fold(conn) == (9, 2, 3)
+        legacy.drop(conn)
+        # Filled through the enrollment versions of 14 and 11, the class's 4th and 1st students
+        sessions = dict(conn.execute(
+            select(models.AttendanceSession.date, models.AttendanceSession.filled_through)
+            .where(models.AttendanceSession.class_id == 2)
+        ).all())
+        assert sessions == {day: 4, DAY: 1}
+        conn.commit()
+
+    exported = {(row[2], row[3]): row[6] for row in attendance_export.register_rows([2], 1)}
+    assert exported == {
+        (day, "2011"): "Present", (day, "2012"): "Leave", (day, "2013"): "Present", (day, "2014"): "Present",
+        (DAY, "2011"): "Present", (DAY, "2013"): "Present", (DAY, "2014"): "Sick",
+    }
+
+    # Marking the student again replaces the legacy text with the new status
+    _write(2, 1, DAY, {14: "Absent"})
+    assert {row[3]: row[6] for row in attendance_export.register_rows([2], 1, DAY, DAY)}["2014"] == "Absent"
+
+
+if __name__ == "__main__":
+    test_marks_fill_and_late_students()
+    test_students_added_after_a_fill_whatever_their_ids()
+    test_summary_deltas_match_recounts()
+    test_registers_patched_after_commit()
+    test_fold_legacy_rows()
+    print("Attendance sessions OK.")
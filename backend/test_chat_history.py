@@ -0,0 +1,104 @@
+"""
+Chat history pages (repository.chat_history): newest first, keyset cursors
+in both directions, has_more from the one extra row, and a stable order for
+messages sharing a timestamp. database.py reads its URL at import, so
+conftest.py runs this module in its own process:
+
+    python -m pytest test_chat_history.py
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-history-"), "attmate.db")
+os.environ.pop("DATABASE_READ_URL", None)
+
+import asyncio
+
+import database
+import migrate
+import models
+import repository
+
+with database.engine.connect() as conn:
+    migrate.upgrade(connection=conn)
+    conn.commit()
+
+START = datetime(2026, 1, 5, 9, 0)
+# Minutes after START, in id order: ties, and ids that do not follow the clock
+MINUTES = [0, 1, 1, 1, 2, 5, 3, 3, 4, 5, 5, 6]
+
+with database.SessionLocal() as db:
+    db.add_all([models.Class(id=1, name="CSE-A"), models.Subject(id=1, name="DBMS"), models.Subject(id=2, name="OS")])
+    for n, minutes in enumerate(MINUTES, start=1):
+        db.add(models.ChatMessage(id=n, message_text=f"m{n}", message_type="user", class_id=1, subject_id=1,
+                                  timestamp=START + timedelta(minutes=minutes)))
+        # Another subject's messages at the same times are never listed
+        db.add(models.ChatMessage(id=100 + n, message_text=f"o{n}", message_type="user", class_id=1, subject_id=2,
+                                  timestamp=START + timedelta(minutes=minutes)))
+    db.commit()
+
+# Newest first: by timestamp, then id
+NEWEST_FIRST = sorted(range(1, len(MINUTES) + 1), key=lambda n: (MINUTES[n - 1], n), reverse=True)
+
+
+def _page(limit, before=None, after=None):
+    async def read():
+        async with database.AsyncSessionLocal() as db:
+            messages, has_more = await repository.chat_history(db, 1, 1, limit, before, after)
+        await database.async_engine.dispose()
+        return [m.id for m in messages], has_more
+    return asyncio.run(read())
+
+
+def test_latest_page_and_has_more_edge():
+    total = len(MINUTES)
+    assert _page(5) == (NEWEST_FIRST[:5], True)
+    # The extra row decides has_more: exactly `limit` messages left is the last page
+    assert _page(total - 1) == (NEWEST_FIRST[:-1], True)
+    assert _page(total) == (NEWEST_FIRST, False)
+    assert _page(total + 1) == (NEWEST_FIRST, False)
+    assert _page(3, before=NEWEST_FIRST[-4]) == (NEWEST_FIRST[-3:], False)
+    assert _page(2, before=NEWEST_FIRST[-4]) == (NEWEST_FIRST[-3:-1], True)
+    assert _page(3, after=NEWEST_FIRST[3]) == (NEWEST_FIRST[:3], False)
+    assert _page(2, after=NEWEST_FIRST[3]) == (NEWEST_FIRST[1:3], True)
+
+
+def test_before_cursor_walks_back_across_ties():
+    for limit in (1, 2, 3, 5):
+        page, has_more = _page(limit)
+        seen = list(page)
+        while has_more:
+            page, has_more = _page(limit, before=seen[-1])
+            seen += page
+        assert seen == NEWEST_FIRST
+
+
+def test_after_cursor_catches_up_across_ties():
+    for limit in (1, 2, 3, 5):
+        # From the oldest message, each page is the oldest `limit` newer ones, shown newest first
+        seen = [NEWEST_FIRST[-1]]
+        has_more = True
+        while has_more:
+            page, has_more = _page(limit, after=seen[0])
+            assert page == sorted(page, key=NEWEST_FIRST.index)
+            seen = page + seen
+        assert seen == NEWEST_FIRST
+
+
+def test_equal_timestamps_keep_id_order():
+    # Messages 6, 10 and 11 share minute 5, and 2-4 share minute 1
+    assert [n for n in NEWEST_FIRST if MINUTES[n - 1] == 5] == [11, 10, 6]
+    assert [n for n in NEWEST_FIRST if MINUTES[n - 1] == 1] == [4, 3, 2]
+    assert _page(len(MINUTES)) == _page(len(MINUTES))
+    # A cursor inside a tie splits it by id
+    assert _page(2, before=10) == ([6, 9], True)
+    assert _page(1, after=3) == ([4], True)
+
+
+if __name__ == "__main__":
+    test_latest_page_and_has_more_edge()
+    test_before_cursor_walks_back_across_ties()
+    test_after_cursor_catches_up_across_ties()
+    test_equal_timestamps_keep_id_order()
+    print("Chat history OK.")
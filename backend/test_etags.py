@@ -0,0 +1,129 @@
+"""
+Conditional GETs: class read endpoints tag their responses with the class
+data version and answer a matching If-None-Match with an empty 304 until
+the class is written to, and /teacher/bootstrap likewise over all of a
+teacher's classes. database.py reads its URL at import, so conftest.py
+runs this module in its own process:
+
+    python -m pytest test_etags.py
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-etags-"), "attmate.db")
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["WARMUP_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import database
+import migrate
+import models
+from main import app
+
+with database.engine.connect() as conn:
+    migrate.upgrade(connection=conn)
+    conn.commit()
+
+with database.SessionLocal() as db:
+    db.add_all([models.Class(id=1, name="CSE-A"), models.Class(id=2, name="CSE-B"), models.Subject(id=1, name="DBMS")])
+    db.add_all([models.Student(id=n, roll_number=f"10{n}", name=f"Student {n}", class_id=1) for n in range(1, 4)])
+    db.add(models.Student(id=9, roll_number="209", name="Student 9", class_id=2))
+    db.add_all([models.User(id=1, email="t@example.com", password="x", role="teacher"),
+                models.Faculty(id=1, user_id=1, name="Dr. T", department="CSE"),
+                models.FacultySubject(faculty_id=1, subject_id=1, class_id=1)])
+    db.commit()
+
+SHEET = "/teacher/attendance-sheet/1/1"
+CALENDAR = "/teacher/calendar/1/1"
+
+
+def _mark(client, student_id, class_id, status, day="2026-01-05"):
+    response = client.post("/teacher/update-attendance", json={
+        "student_id": student_id, "class_id": class_id, "subject_id": 1, "date": day, "status": status
+    })
+    assert response.status_code == 200
+
+
+def _counting_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    for engine in database.labelled_engines().values():
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return statements, before_cursor_execute
+
+
+def test_not_modified_until_the_class_is_written():
+    with TestClient(app) as client:
+        first = client.get(SHEET)
+        assert first.status_code == 200
+        tag = first.headers["etag"]
+        assert tag.startswith('W/"1-')
+        assert first.headers["cache-control"] == "no-cache"
+
+        statements, listener = _counting_statements()
+        try:
+            cached = client.get(SHEET, headers={"If-None-Match": tag})
+        finally:
+            for engine in database.labelled_engines().values():
+                event.remove(engine, "before_cursor_execute", listener)
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == tag
+        # The version lookup only: no attendance query
+        assert len(statements) == 1
+
+        # Another class's write leaves the tag alone
+        _mark(client, 9, 2, "Absent")
+        assert client.get(SHEET, headers={"If-None-Match": tag}).status_code == 304
+
+        _mark(client, 2, 1, "Absent")
+        fresh = client.get(SHEET, headers={"If-None-Match": tag})
+        assert fresh.status_code == 200
+        assert fresh.headers["etag"] != tag
+        student = next(s for s in fresh.json()["students"] if s["id"] == 2)
+        assert student["attendance"] == {"2026-01-05": "A"}
+        assert client.get(SHEET, headers={"If-None-Match": fresh.headers["etag"]}).status_code == 304
+
+
+def test_if_none_match_lists_and_wildcards():
+    with TestClient(app) as client:
+        tag = client.get(CALENDAR).headers["etag"]
+        strong = tag.removeprefix("W/")
+        assert client.get(CALENDAR, headers={"If-None-Match": f'W/"1-0", {strong}'}).status_code == 304
+        assert client.get(CALENDAR, headers={"If-None-Match": "*"}).status_code == 304
+        assert client.get(CALENDAR, headers={"If-None-Match": 'W/"2-1"'}).status_code == 200
+
+
+def test_bootstrap_tagged_by_the_teachers_classes():
+    bootstrap = "/teacher/bootstrap?user_id=1"
+    with TestClient(app) as client:
+        first = client.get(bootstrap)
+        assert first.status_code == 200
+        tag = first.headers["etag"]
+        assert client.get(bootstrap, headers={"If-None-Match": tag}).status_code == 304
+        # Class 2 is not on the teacher's screen
+        _mark(client, 9, 2, "OD", day="2026-01-06")
+        assert client.get(bootstrap, headers={"If-None-Match": tag}).status_code == 304
+        _mark(client, 3, 1, "Absent", day="2026-01-06")
+        fresh = client.get(bootstrap, headers={"If-None-Match": tag})
+        assert fresh.status_code == 200
+        assert fresh.headers["etag"] != tag
+        # Advising a class adds it to the screen, and changes the tag
+        with database.SessionLocal() as db:
+            db.get(models.Class, 2).advisor_id = 1
+            db.commit()
+        advised = client.get(bootstrap, headers={"If-None-Match": fresh.headers["etag"]})
+        assert advised.status_code == 200
+        assert advised.json()["advisory_class"] == {"id": 2, "name": "CSE-B"}
+
+
+if __name__ == "__main__":
+    test_not_modified_until_the_class_is_written()
+    test_if_none_match_lists_and_wildcards()
+    test_bootstrap_tagged_by_the_teachers_classes()
+    print("ETags OK.")
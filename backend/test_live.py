@@ -0,0 +1,144 @@
+"""
+Live updates (live.py): the hub's bounded queues, which send a subscriber
+that falls QUEUE_SIZE events behind a single resync and drop it, and the
+write endpoints, which publish only once their transaction has committed.
+database.py reads its URL at import, so conftest.py runs this module in its
+own process:
+
+    python -m pytest test_live.py
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-live-"), "attmate.db")
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["WARMUP_ENABLED"] = "false"
+
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import database
+import live
+import migrate
+import models
+import repository
+from main import app
+
+with database.engine.connect() as conn:
+    migrate.upgrade(connection=conn)
+    conn.commit()
+
+with database.SessionLocal() as db:
+    db.add_all([models.Class(id=1, name="CSE-A"), models.Subject(id=1, name="DBMS")])
+    db.add_all([models.Student(id=n, roll_number=f"25CS00{n}", name=f"Student {n}", class_id=1) for n in range(1, 4)])
+    db.commit()
+
+DAY = "2026-01-05"
+
+
+def test_full_queue_resyncs_and_drops_the_subscriber():
+    async def run():
+        hub = live.Hub()
+        slow, fast = hub.subscribe(1, 1), hub.subscribe(1, 1)
+        other = hub.subscribe(1, 2)
+        received = []
+        for n in range(live.QUEUE_SIZE + 1):
+            hub.publish(1, 1, {"n": n})
+            received.append(json.loads(await fast.next()))
+        # The slow subscriber's backlog is replaced by the resync marker
+        assert slow.queue.qsize() == 1
+        assert await slow.next() is None
+        hub.publish(1, 1, {"n": "after"})
+        assert slow.queue.empty()
+        # Everyone else keeps every event, and other channels get none
+        assert received == [{"n": n} for n in range(live.QUEUE_SIZE + 1)]
+        assert json.loads(await fast.next()) == {"n": "after"}
+        assert other.queue.empty()
+        hub.unsubscribe(fast)
+        hub.unsubscribe(other)
+        assert hub._channels == {}
+    asyncio.run(run())
+
+
+class StalledWebSocket:
+    """A WebSocket whose client stops reading: the first send blocks until released."""
+
+    def __init__(self):
+        self.sent = []
+        self.released = asyncio.Event()
+        self.closed = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        await self.released.wait()
+        self.sent.append(data)
+
+    async def receive_text(self):
+        await self.closed.wait()
+        raise WebSocketDisconnect()
+
+    async def close(self):
+        self.closed.set()
+
+
+def test_stalled_websocket_gets_resync():
+    async def run():
+        websocket = StalledWebSocket()
+        served = asyncio.create_task(live.serve_websocket(websocket, 1, 1))
+        await asyncio.sleep(0)
+        # One event held by the stalled send, QUEUE_SIZE queued, then one too many
+        for n in range(live.QUEUE_SIZE + 2):
+            live.hub.publish(1, 1, {"n": n})
+            await asyncio.sleep(0)
+        assert (1, 1) not in live.hub._channels
+        websocket.released.set()
+        await asyncio.wait_for(served, timeout=5)
+        return websocket.sent
+    assert asyncio.run(run()) == [json.dumps({"n": 0}), live.RESYNC]
+
+
+def test_writes_publish_after_commit(monkeypatch):
+    published = []
+    publish = live.hub.publish
+
+    def publish_and_check(class_id, subject_id, event):
+        # Read on another connection: only committed rows are visible there
+        with database.SessionLocal() as db:
+            code = db.execute(select(models.AttendanceException.status_code).where(
+                models.AttendanceException.student_id == 2
+            )).scalar()
+        published.append((event["type"], code))
+        publish(class_id, subject_id, event)
+
+    monkeypatch.setattr(live.hub, "publish", publish_and_check)
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/1/1") as websocket:
+            client.post("/chat/", params={"class_id": 1, "subject_id": 1, "message": "2 absent"})
+            events = [json.loads(websocket.receive_text()) for _ in range(3)]
+    assert [e["type"] for e in events] == ["message", "message", "attendance"]
+    assert events[2]["entries"] == [{"student_id": 2, "status": "Absent"}]
+    # Every event was published with the write already committed
+    assert published == [("message", 2), ("message", 2), ("attendance", 2)]
+
+
+def test_failed_writes_publish_nothing(monkeypatch):
+    published = []
+    monkeypatch.setattr(live.hub, "publish", lambda *args: published.append(args))
+
+    async def fail(db, class_id):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(repository, "bump_data_version", fail)
+    with TestClient(app) as client:
+        with pytest.raises(RuntimeError):
+            client.post("/teacher/update-attendance", json={
+                "student_id": 3, "class_id": 1, "subject_id": 1, "date": DAY, "status": "OD"
+            })
+    assert published == []
@@ -1,44 +1,98 @@
-import sys
-import os
+"""
+SmartAttendanceParser against the results of the regex parser it replaced
+(one re.search per intent, in priority order): every expected value below is
+what that parser returned, with statuses spelled the way attendance_status
+spells them. bench_parser.py --baseline compares any message the same way.
+"""
+from smart_parser import AdvancedAttendanceParser, default_parser
 
-# Add the current directory to sys.path to import smart_parser
-sys.path.append(os.getcwd())
+CLASS_ID, SUBJECT_ID = 3, 12
+
+ERROR = {
+    'error': "I couldn't understand that. You can say '101 absent', 'Log: Today we started SQL', or 'Who is absent today?'",
+    'confidence': 0.0
+}
+
+
+def _log(content):
+    return {'pattern_type': 'log', 'content': content, 'confidence': 1.0}
+
+
+def _query(status, query_date=None):
+    return {'pattern_type': 'query', 'status': status, 'query_date': query_date,
+            'class_id': CLASS_ID, 'subject_id': SUBJECT_ID, 'confidence': 1.0}
+
+
+def _exception(rolls, status, others):
+    return {'pattern_type': 'exception', 'roll_numbers': rolls, 'status': status,
+            'class_id': CLASS_ID, 'subject_id': SUBJECT_ID, 'confidence': 0.9,
+            'note': f"Marking exceptions as {status}. Others assumed {others}."}
+
+
+def _range(rolls, status):
+    return {'pattern_type': 'range', 'roll_numbers': rolls, 'status': status,
+            'class_id': CLASS_ID, 'subject_id': SUBJECT_ID, 'confidence': 1.0}
+
+
+def _multiple(*entries):
+    return {'pattern_type': 'multiple', 'entries': [{'roll_number': r, 'status': s} for r, s in entries],
+            'class_id': CLASS_ID, 'subject_id': SUBJECT_ID, 'confidence': 1.0}
+
+
+def _fallback(rolls, status):
+    return {'pattern_type': 'fallback', 'roll_numbers': rolls, 'status': status,
+            'class_id': CLASS_ID, 'subject_id': SUBJECT_ID, 'confidence': 0.8}
+
+
+CASES = [
+    ("Log: Today we covered React Hooks and State Management", _log("Today we covered React Hooks and State Management")),
+    ("101 absent, 102 present, 103 OD Session 1", _multiple(("101", "Absent"), ("102", "Present"), ("103", "OD"))),
+    ("Who is absent today?", _query("Absent", "today")),
+    ("Everyone present except 115, 116", _exception(["115", "116"], "Absent", "Present")),
+    ("Roll 1 to 5 absent", _range(["1", "2", "3", "4", "5"], "Absent")),
+    ("144, 145 od", _multiple(("144", "OD"), ("145", "OD"))),
+    ("Just 133 absent please", _multiple(("133", "Absent"))),
+    # The "Session N" suffix is dropped before anything else
+    ("Session Log: covered joins Session 2", _log("covered joins")),
+    ("log:   Session 4", ERROR),
+    # Intent keywords match inside words, and queries win over everything
+    ("allshow absent", _query("Absent")),
+    ("whoabsent", _query("Absent")),
+    ("Which students on duty for 2026-01-05?", _query("OD", "2026-01-05")),
+    ("who is Absent ON 2026-01-05", _query("Absent", "2026-01-05")),
+    ("Show OD students", _query("OD")),
+    ("list leave yesterday", _query("Leave", "yesterday")),
+    ("1 to 3 absent, who is present", _query("Present")),
+    # Only one noun fits between the question word and the status
+    ("Which students are on duty for 2026-01-05?", _fallback(["2026", "01", "05"], "OD")),
+    ("whole class absent except 3 and 4", _exception(["3", "4"], "Present", "Absent")),
+    ("5 absent, everyone present except 7", _exception(["7"], "Absent", "Present")),
+    ("Roll numbers 10 - 12 od", _range(["10", "11", "12"], "OD")),
+    ("1, 2 to 4 leave", _range(["2", "3", "4"], "Leave")),
+    # Numbers go to the next status keyword; the last mention of a roll wins
+    ("5a 6 p, 7", _multiple(("5", "Present"), ("6", "Present"))),
+    ("101 absent 102, 101 present", _multiple(("101", "Present"), ("102", "Present"))),
+    ("1,2,3 A 4 l", _multiple(("1", "Absent"), ("2", "Absent"), ("3", "Absent"), ("4", "Leave"))),
+    ("absent 5, 6", _fallback(["5", "6"], "Absent")),
+    ("onduty 9", _fallback(["9"], "OD")),
+    ("hello there", ERROR),
+]
 
-from smart_parser import AdvancedAttendanceParser
 
 def test_parser():
-    parser = AdvancedAttendanceParser()
-    class_id = 3
-    subject_id = 12
-    
-    test_cases = [
-        "Log: Today we covered React Hooks and State Management",
-        "101 absent, 102 present, 103 OD Session 1",
-        "Who is absent today?",
-        "Everyone present except 115, 116",
-        "Roll 1 to 5 absent",
-        "144, 145 od",
-        "Just 133 absent please"
-    ]
-    
-    print(f"{'INPUT':<60} | {'RESULT'}")
-    print("-" * 100)
-    for tc in test_cases:
-        result = parser.parse(tc, class_id, subject_id)
-        pt = result.get('pattern_type', 'ERROR')
-        print(f"{tc:<60} | {pt}")
-        if pt == 'multiple':
-            print(f"  -> Entries: {result['entries']}")
-        elif pt == 'log':
-            print(f"  -> Content: {result['content']}")
-        elif pt == 'query':
-            print(f"  -> Status: {result['status']}, Date: {result['query_date']}")
-        elif pt == 'exception':
-            print(f"  -> Roll Numbers: {result['roll_numbers']}, Status: {result['status']}")
-        elif pt == 'range':
-            print(f"  -> Roll Numbers: {result['roll_numbers']}, Status: {result['status']}")
-        elif 'error' in result:
-            print(f"  -> Error: {result['error']}")
+    for message, expected in CASES:
+        assert default_parser.parse(message, CLASS_ID, SUBJECT_ID) == expected, message
+
+
+def test_parser_is_stateless():
+    # /chat/ shares default_parser; a fresh parser gives the same results
+    fresh = AdvancedAttendanceParser()
+    for message, expected in CASES:
+        assert fresh.parse(message, CLASS_ID, SUBJECT_ID) == expected, message
+        assert default_parser.parse(message, CLASS_ID, SUBJECT_ID) == expected, message
+
 
 if __name__ == "__main__":
     test_parser()
+    test_parser_is_stateless()
+    print("Parser OK.")
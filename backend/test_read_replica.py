@@ -0,0 +1,97 @@
+"""
+Read replica routing: two SQLite files stand in for the primary and the
+replica. database.py reads its URLs at import, so conftest.py runs this
+module in its own process:
+
+    python -m pytest test_read_replica.py
+"""
+import os
+import tempfile
+import time
+
+_dir = tempfile.mkdtemp(prefix="attmate-replica-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_dir, "primary.db")
+os.environ["DATABASE_READ_URL"] = "sqlite:///" + os.path.join(_dir, "replica.db")
+os.environ["READ_YOUR_WRITES_SECONDS"] = "0.5"
+os.environ["WARMUP_ENABLED"] = "false"
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import data_version
+import database
+import migrate
+import models
+
+# Each file gets its own copy of the class, named after the database it lives in
+for name, engine in (("primary", database.engine), ("replica", database.read_engine)):
+    with engine.connect() as conn:
+        migrate.upgrade(connection=conn)
+        conn.commit()
+    with Session(engine) as db:
+        db.add(models.Class(id=1, name=f"{name}-1"))
+        db.add(models.Class(id=2, name=f"{name}-2"))
+        db.commit()
+
+app = FastAPI()
+
+
+@app.get("/classes/{class_id}")
+def class_name(class_id: int, db: Session = Depends(database.get_read_db)):
+    return db.get(models.Class, class_id).name
+
+
+@app.get("/classes/{class_id}/async")
+async def class_name_async(class_id: int, db=Depends(database.get_async_read_db)):
+    return (await db.get(models.Class, class_id)).name
+
+
+client = TestClient(app)
+
+
+def _write(class_id):
+    with database.SessionLocal() as db:
+        data_version.bump(db, class_id)
+        db.commit()
+
+
+def test_reads_go_to_the_replica():
+    assert database.read_engine is not database.engine
+    assert client.get("/classes/1").json() == "replica-1"
+    assert client.get("/classes/1/async").json() == "replica-1"
+
+
+def test_reads_after_a_write_go_to_the_primary():
+    _write(1)
+    assert client.get("/classes/1").json() == "primary-1"
+    assert client.get("/classes/1/async").json() == "primary-1"
+    # Other classes are unaffected
+    assert client.get("/classes/2").json() == "replica-2"
+    # Reads across all classes see the write too
+    with database.read_sessionmaker(None)() as db:
+        assert db.get(models.Class, 2).name == "primary-2"
+
+    time.sleep(database.READ_YOUR_WRITES_SECONDS)
+    assert client.get("/classes/1").json() == "replica-1"
+
+
+def test_bump_all_sends_every_class_to_the_primary():
+    with database.SessionLocal() as db:
+        data_version.bump_all(db)
+        db.commit()
+    assert client.get("/classes/2").json() == "primary-2"
+    time.sleep(database.READ_YOUR_WRITES_SECONDS)
+    assert client.get("/classes/2").json() == "replica-2"
+
+
+def test_metrics_label_the_read_pools():
+    assert {"sync", "async", "read", "async-read"} <= set(database.labelled_engines())
+
+
+if __name__ == "__main__":
+    test_reads_go_to_the_replica()
+    test_reads_after_a_write_go_to_the_primary()
+    test_bump_all_sends_every_class_to_the_primary()
+    test_metrics_label_the_read_pools()
+    print("Read replica routing OK.")
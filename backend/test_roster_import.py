@@ -0,0 +1,157 @@
+"""
+Roster uploads through /upload_csv/{class_id}: the per-row error report,
+rows handled in CHUNK_SIZE chunks with one lookup and one bulk insert each,
+duplicates caught across chunk boundaries, and XLSX files. database.py reads
+its URL at import, so conftest.py runs this module in its own process:
+
+    python -m pytest test_roster_import.py
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-roster-"), "attmate.db")
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["WARMUP_ENABLED"] = "false"
+
+import csv
+import io
+
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+from sqlalchemy import event, select
+
+import database
+import migrate
+import models
+import roster_import
+from main import app
+
+with database.engine.connect() as conn:
+    migrate.upgrade(connection=conn)
+    conn.commit()
+
+with database.SessionLocal() as db:
+    db.add_all([models.Class(id=1, name="CSE-A"), models.Class(id=2, name="CSE-B"), models.Class(id=3, name="CSE-C")])
+    db.add(models.Student(id=1, roll_number="900", reg_number="TAKEN", name="Other Class", class_id=2))
+    db.commit()
+
+ROWS = 2500  # three chunks of CHUNK_SIZE (1000)
+
+
+def _csv(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Roll No", "Reg. No", "Student Name"])
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _upload(client, class_id, content, filename="roster.csv"):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(" ".join(statement.split()))
+
+    event.listen(database.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.post(f"/upload_csv/{class_id}", files={"file": (filename, content)})
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200, response.text
+    return response.json(), statements
+
+
+def _students(class_id):
+    with database.SessionLocal() as db:
+        return db.execute(
+            select(models.Student.roll_number, models.Student.name, models.Student.enrolled_version)
+            .where(models.Student.class_id == class_id)
+        ).all()
+
+
+def test_large_upload_reports_rows_across_chunks():
+    assert roster_import.CHUNK_SIZE == 1000
+    # Spreadsheet row n (the header is row 1) is rows[n - 2]
+    rows = [[f"R{n:04d}", f"G{n:04d}", f"Student {n}"] for n in range(2, ROWS + 2)]
+    rows[5 - 2][2] = ""                       # missing name
+    rows[1001 - 2][0] = "R" * 21              # last row of the first chunk, too long
+    rows[1002 - 2][0] = "R0002"               # first row of the second chunk, duplicates row 2
+    rows[2001 - 2][1] = "TAKEN"               # another class's student's reg number
+    rows[2300 - 2][1] = "G1500"               # duplicates row 1500's reg number
+    rows[2400 - 2] = ["", "", ""]             # blank: skipped, still numbered
+    expected_errors = [
+        {"row": 5, "error": "Missing name"},
+        {"row": 1001, "error": "Roll number longer than 20 characters"},
+        {"row": 1002, "error": "Duplicate roll number R0002 (first on row 2)"},
+        {"row": 2001, "error": "Reg number TAKEN already belongs to another student"},
+        {"row": 2300, "error": "Duplicate reg number G1500 (first on row 1500)"},
+    ]
+
+    with TestClient(app) as client:
+        report, statements = _upload(client, 1, _csv(rows))
+
+    created = ROWS - 1 - len(expected_errors)
+    assert report["errors"] == expected_errors
+    assert report["error_count"] == len(expected_errors)
+    assert (report["created"], report["updated"], report["unchanged"]) == (created, 0, 0)
+    assert report["message"] == f"Imported {created} new and 0 updated students, 5 rows skipped"
+    # One lookup and one bulk insert per chunk, and a single version bump
+    assert sum(s.startswith("SELECT students.id") for s in statements) == 3
+    assert sum(s.startswith("INSERT INTO students") for s in statements) == 3
+    assert sum(s.startswith("INSERT INTO class_data_versions") for s in statements) == 1
+
+    students = _students(1)
+    assert len(students) == created
+    assert {version for _, _, version in students} == {1}
+    names = {roll: name for roll, name, _ in students}
+    assert names["R0002"] == "Student 2" and "R1002" not in names and "R1001" not in names
+
+
+def test_reupload_updates_and_counts_unchanged():
+    rows = [[f"R{n:04d}", "", f"Student {n}"] for n in range(2, 1202)]
+    rows[999 - 2][2] = "Renamed 999"
+    rows[1003 - 2][2] = "Renamed 1003"
+    with TestClient(app) as client:
+        report, statements = _upload(client, 1, _csv(rows))
+    assert report["errors"] == []
+    # Rows 5, 1001 and 1002 were skipped by the first upload, so they are new now
+    assert (report["created"], report["updated"], report["unchanged"]) == (3, 2, 1195)
+    assert sum(s.startswith("UPDATE students") for s in statements) == 2
+    names = {roll: name for roll, name, _ in _students(1)}
+    assert names["R0999"] == "Renamed 999" and names["R1003"] == "Renamed 1003"
+
+
+def test_error_report_is_capped():
+    rows = [[f"X{n}", "", ""] for n in range(roster_import.MAX_REPORTED_ERRORS + 100)]
+    with TestClient(app) as client:
+        report, _ = _upload(client, 3, _csv(rows))
+    assert report["error_count"] == roster_import.MAX_REPORTED_ERRORS + 100
+    assert len(report["errors"]) == roster_import.MAX_REPORTED_ERRORS
+    assert report["errors"][-1] == {"row": roster_import.MAX_REPORTED_ERRORS + 1, "error": "Missing name"}
+    assert report["created"] == 0
+
+
+def test_xlsx_upload():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Roll Number", "Name"])
+    sheet.append([3001.0, "  Spaced   Name "])  # numeric rolls arrive as floats
+    sheet.append([3002, None])
+    sheet.append([3003, "Third"])
+    content = io.BytesIO()
+    workbook.save(content)
+    with TestClient(app) as client:
+        report, _ = _upload(client, 3, content.getvalue(), "roster.xlsx")
+        assert report["errors"] == [{"row": 3, "error": "Missing name"}]
+        assert report["created"] == 2
+        bad = client.post("/upload_csv/3", files={"file": ("roster.xls", b"")})
+        assert bad.status_code == 400
+    assert sorted((roll, name) for roll, name, _ in _students(3)) == [("3001", "Spaced Name"), ("3003", "Third")]
+
+
+if __name__ == "__main__":
+    test_large_upload_reports_rows_across_chunks()
+    test_reupload_updates_and_counts_unchanged()
+    test_error_report_is_capped()
+    test_xlsx_upload()
+    print("Roster import OK.")
@@ -0,0 +1,76 @@
+"""
+SQLite production mode: connection pragmas and write_queue's group commits,
+on a throwaway SQLite file. database.py reads its URL at import, so
+conftest.py runs this module in its own process:
+
+    python -m pytest test_write_queue.py
+"""
+import asyncio
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="attmate-writes-"), "attmate.db")
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["SQLITE_WRITE_QUEUE"] = "true"
+
+from sqlalchemy import event, func, select, text
+
+import database
+import migrate
+import models
+import write_queue
+
+with database.engine.connect() as conn:
+    migrate.upgrade(connection=conn)
+    conn.commit()
+
+
+def test_pragmas():
+    with database.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -database.SQLITE_CACHE_SIZE_MB * 1024
+
+
+def test_concurrent_writes_share_a_commit():
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(database.async_write_engine.sync_engine, "commit", on_commit)
+
+    def add_class(name):
+        async def job(db):
+            db.add(models.Class(name=name))
+            await db.flush()
+            return name
+        return job
+
+    async def failing(db):
+        db.add(models.Class(name="group-0"))  # duplicate name
+        await db.flush()
+
+    async def main():
+        async with database.AsyncSessionLocal() as db:
+            jobs = [write_queue.run(db, add_class(f"group-{n}")) for n in range(10)]
+            return await asyncio.gather(*jobs, write_queue.run(db, failing), return_exceptions=True)
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        event.remove(database.async_write_engine.sync_engine, "commit", on_commit)
+
+    assert results[:10] == [f"group-{n}" for n in range(10)]
+    assert isinstance(results[10], Exception)
+    # All eleven were queued before the writer ran: one commit, without the failed one
+    assert len(commits) == 1
+    with database.SessionLocal() as db:
+        assert db.execute(select(func.count()).where(models.Class.name.like("group-%"))).scalar() == 10
+
+
+if __name__ == "__main__":
+    test_pragmas()
+    test_concurrent_writes_share_a_commit()
+    print("SQLite writer OK.")
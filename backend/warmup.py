@@ -0,0 +1,88 @@
+"""
+Background warm-up after startup, so the first teacher does not pay for it.
+
+The app starts serving immediately; this then opens WARMUP_CONNECTIONS
+pooled connections on both engines, runs the chat parser once (importing
+it and compiling its patterns) and loads every class roster into
+roster_index. Failures are printed and ignored: everything here also
+happens lazily on first use.
+
+    WARMUP_ENABLED=false    skip it (tests, one-off scripts)
+"""
+import asyncio
+import os
+import time
+
+from sqlalchemy import select, text
+
+import database
+import models
+import roster_index
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() != "false"
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "2"))
+
+
+def _warm_sync_pool() -> None:
+    # Held open together, so the pool keeps WARMUP_CONNECTIONS distinct connections
+    connections = [database.engine.connect() for _ in range(WARMUP_CONNECTIONS)]
+    try:
+        for conn in connections:
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+async def _warm_async_pool() -> None:
+    connections = [await database.async_engine.connect() for _ in range(WARMUP_CONNECTIONS)]
+    try:
+        for conn in connections:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            await conn.close()
+
+
+def _warm_parser() -> None:
+    from smart_parser import default_parser
+    default_parser.parse("1, 2 absent, 3 od", 0, 0)
+
+
+def _warm_rosters() -> int:
+    if not roster_index.ROSTER_CACHE_ENABLED:
+        return 0
+    with database.SessionLocal() as db:
+        class_ids = db.execute(select(models.Class.id)).scalars().all()
+        for class_id in class_ids:
+            roster_index.get_roster(db, class_id)
+    return len(class_ids)
+
+
+async def run() -> None:
+    started = time.perf_counter()
+    steps = [
+        ("sync pool", lambda: asyncio.to_thread(_warm_sync_pool)),
+        ("async pool", _warm_async_pool),
+        ("parser", lambda: asyncio.to_thread(_warm_parser)),
+        ("rosters", lambda: asyncio.to_thread(_warm_rosters)),
+    ]
+    done = []
+    for name, step in steps:
+        try:
+            await step()
+            done.append(name)
+        except Exception as e:
+            print(f"WARNING: Warm-up of {name} failed: {e}")
+    print(f"INFO: Warmed up {', '.join(done) or 'nothing'} in {time.perf_counter() - started:.2f} s.")
+
+
+# The event loop only holds tasks weakly
+_task = None
+
+
+def start() -> None:
+    """Schedule run() on the running event loop without waiting for it."""
+    global _task
+    if WARMUP_ENABLED:
+        _task = asyncio.get_running_loop().create_task(run())
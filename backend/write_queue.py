@@ -0,0 +1,108 @@
+"""
+Group commits for the attendance writes on SQLite.
+
+SQLite allows one writer at a time. Instead of every request opening its own
+write transaction and queueing on the database lock (or failing with
+"database is locked"), requests hand their writes to run(), and one writer
+task per process applies them on database.async_write_engine's single
+connection. Writes that arrive while a commit is in progress are applied
+together, each in its own savepoint, and committed at once: one fsync for
+the whole batch, and a failing write only rolls back its own savepoint.
+Reads keep their own connections and run in parallel (WAL).
+
+On PostgreSQL, or with SQLITE_WRITE_QUEUE=false, run() applies the writes in
+the request's session and commits it.
+
+    SQLITE_WRITE_BATCH=64    most writes committed together
+"""
+import asyncio
+import contextvars
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database
+
+SQLITE_WRITE_BATCH = int(os.getenv("SQLITE_WRITE_BATCH", "64"))
+
+T = TypeVar("T")
+Job = Callable[[AsyncSession], Awaitable[T]]
+
+
+async def run(db: AsyncSession, job: Job) -> T:
+    """
+    Apply `job`'s writes and commit them; returns what the job returned.
+    The job may run in another session than `db`, after the request's own
+    reads: it must only use the session it is given.
+    """
+    if database.async_write_engine is None:
+        result = await job(db)
+        await db.commit()
+        return result
+    return await _writer().submit(job)
+
+
+class _Writer:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # Started in an empty context, so the writer's own statements are not
+        # billed to the request that happened to start it (metrics.py)
+        self.task = contextvars.Context().run(loop.create_task, self._run())
+
+    async def submit(self, job: Job) -> T:
+        future = self.loop.create_future()
+        # Each job runs in its caller's context, so metrics count its statements against the caller
+        await self.queue.put((job, future, contextvars.copy_context()))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < SQLITE_WRITE_BATCH and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                # The commit failed: none of the batch was written
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _commit(self, batch: List[Tuple[Job, asyncio.Future, contextvars.Context]]) -> None:
+        applied = []
+        async with database.AsyncWriteSessionLocal() as db:
+            for job, future, context in batch:
+                if future.cancelled():
+                    continue
+                try:
+                    result = await context.run(self.loop.create_task, _apply(db, job, savepoint=len(batch) > 1))
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+                applied.append((future, result))
+            if applied:
+                await db.commit()
+        for future, result in applied:
+            if not future.done():
+                future.set_result(result)
+
+
+async def _apply(db: AsyncSession, job: Job, savepoint: bool) -> T:
+    if not savepoint:
+        return await job(db)
+    async with db.begin_nested():
+        return await job(db)
+
+
+_current: Optional[_Writer] = None
+
+
+def _writer() -> _Writer:
+    """This event loop's writer (test clients may run each request on a new loop)."""
+    global _current
+    loop = asyncio.get_running_loop()
+    if _current is None or _current.loop is not loop or _current.task.done():
+        _current = _Writer(loop)
+    return _current
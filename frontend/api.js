@@ -9,6 +9,40 @@ const api = axios.create({
     headers: {
         'Content-Type': 'application/json',
     },
+    // 304 Not Modified is answered from the ETag cache below
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+});
+
+// Class data endpoints return an ETag that only changes when the class is
+// written to. Keep the last body per URL and revalidate with If-None-Match,
+// so refocusing a screen over unchanged data costs an empty 304.
+const etagCache = new Map();
+
+api.interceptors.request.use((config) => {
+    if (config.method === 'get') {
+        const cached = etagCache.get(api.getUri(config));
+        if (cached) {
+            config.headers['If-None-Match'] = cached.etag;
+        }
+    }
+    return config;
+});
+
+api.interceptors.response.use((response) => {
+    const { config } = response;
+    if (config.method !== 'get') {
+        return response;
+    }
+    const key = api.getUri(config);
+    const cached = etagCache.get(key);
+    if (response.status === 304 && cached) {
+        return { ...response, status: 200, data: cached.data };
+    }
+    const etag = response.headers.etag;
+    if (etag) {
+        etagCache.set(key, { etag, data: response.data });
+    }
+    return response;
 });
 
 export default api;
@@ -5,6 +5,19 @@ const AuthContext = createContext(null);
 
 export const AuthProvider = ({ children }) => {
     const [user, setUser] = useState(null);
+    // Teacher home data (classes, advisory class, stats) fetched once after login
+    const [bootstrap, setBootstrap] = useState(null);
+
+    const loadBootstrap = async (userId) => {
+        try {
+            const response = await api.get(`/teacher/bootstrap?user_id=${userId}`);
+            setBootstrap(response.data);
+            return response.data;
+        } catch (error) {
+            console.error('Failed to load teacher bootstrap:', error);
+            return null;
+        }
+    };
 
     const login = async (email, password, role) => {
         try {
@@ -16,6 +29,9 @@ export const AuthProvider = ({ children }) => {
 
             if (response.data) {
                 const userData = response.data;
+                if (userData.role === 'teacher') {
+                    await loadBootstrap(userData.id);
+                }
                 setUser(userData);
                 return { success: true, role: userData.role };
             }
@@ -31,10 +47,11 @@ export const AuthProvider = ({ children }) => {
 
     const logout = () => {
         setUser(null);
+        setBootstrap(null);
     };
 
     return (
-        <AuthContext.Provider value={{ user, login, logout }}>
+        <AuthContext.Provider value={{ user, login, logout, bootstrap, loadBootstrap }}>
             {children}
         </AuthContext.Provider>
     );
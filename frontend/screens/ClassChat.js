@@ -4,6 +4,7 @@ import { SafeAreaView } from 'react-native-safe-area-context';
 import { useRoute, useNavigation } from '@react-navigation/native';
 import { COLORS, GLOBAL_STYLES } from '../styles/theme';
 import api from '../api';
+import { subscribeToChannel } from '../services/live';
 
 export default function ClassChat() {
     const route = useRoute();
@@ -14,7 +15,13 @@ export default function ClassChat() {
     const [showConfirm, setShowConfirm] = useState(false);
     const [loading, setLoading] = useState(true);
     const [currentSession, setCurrentSession] = useState(1);
+    const [hasOlder, setHasOlder] = useState(false);
+    const [loadingOlder, setLoadingOlder] = useState(false);
     const scrollRef = useRef();
+    // Set while an older page is prepended, so the view does not jump to the bottom
+    const prependingRef = useRef(false);
+    // Older pages are only fetched once the teacher scrolls, not during the initial scroll to the end
+    const userScrolledRef = useRef(false);
     const keyboardHeight = useRef(new Animated.Value(0)).current;
 
     useEffect(() => {
@@ -51,11 +58,26 @@ export default function ClassChat() {
         loadChatHistory();
     }, [classId, subjectId]);
 
+    // Messages sent by co-teachers (and our own, echoed back) arrive live
+    useEffect(() => {
+        return subscribeToChannel(classId, subjectId, (event) => {
+            if (event.type === 'message') {
+                setMessages(prev => (
+                    prev.some(msg => msg.id === event.message.id) ? prev : [...prev, event.message]
+                ));
+            } else if (event.type === 'resync') {
+                loadChatHistory();
+            }
+        });
+    }, [classId, subjectId]);
+
     const loadChatHistory = async () => {
         try {
             setLoading(true);
+            // Latest page, newest first; the chat shows oldest at the top
             const response = await api.get(`/chat/history/${classId}/${subjectId}`);
-            setMessages(response.data.messages || []);
+            setMessages((response.data.messages || []).slice().reverse());
+            setHasOlder(!!response.data.has_more);
             if (response.data.current_session) {
                 setCurrentSession(response.data.current_session);
             }
@@ -67,6 +89,30 @@ export default function ClassChat() {
         }
     };
 
+    const loadOlderMessages = async () => {
+        const oldest = messages.find(msg => typeof msg.id === 'number');
+        if (!hasOlder || loadingOlder || !oldest) return;
+        try {
+            setLoadingOlder(true);
+            const response = await api.get(`/chat/history/${classId}/${subjectId}`, {
+                params: { before: oldest.id },
+            });
+            prependingRef.current = true;
+            setMessages(prev => [...(response.data.messages || []).slice().reverse(), ...prev]);
+            setHasOlder(!!response.data.has_more);
+        } catch (error) {
+            console.error('Failed to load older messages:', error);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
+    const handleScroll = (e) => {
+        if (userScrolledRef.current && e.nativeEvent.contentOffset.y < 60) {
+            loadOlderMessages();
+        }
+    };
+
     const formatTime = (timestamp) => {
         try {
             const date = new Date(timestamp);
@@ -97,11 +143,14 @@ export default function ClassChat() {
             const response = await api.post(`/chat/?message=${encodeURIComponent(messageToSend)}&class_id=${classId}&subject_id=${subjectId}`);
 
             // Update user message with server ID and timestamp
-            setMessages(prev => prev.map(msg =>
-                msg.id === tempId
-                    ? { ...msg, id: response.data.user_message_id, timestamp: response.data.timestamp }
-                    : msg
-            ));
+            // The live channel may already have delivered this message
+            setMessages(prev => prev
+                .filter(msg => msg.id !== response.data.user_message_id)
+                .map(msg =>
+                    msg.id === tempId
+                        ? { ...msg, id: response.data.user_message_id, timestamp: response.data.timestamp }
+                        : msg
+                ));
 
             // Add system response
             const systemMsg = {
@@ -110,7 +159,9 @@ export default function ClassChat() {
                 type: 'system',
                 timestamp: response.data.timestamp
             };
-            setMessages(prev => [...prev, systemMsg]);
+            setMessages(prev => (
+                prev.some(msg => msg.id === systemMsg.id) ? prev : [...prev, systemMsg]
+            ));
 
             if (!response.data.response.includes("Could not parse")) {
                 setShowConfirm(true);
@@ -173,10 +224,21 @@ export default function ClassChat() {
                         style={[styles.chatArea, { flex: 1 }]}
                         contentContainerStyle={styles.chatContent}
                         showsVerticalScrollIndicator={true}
-
-
-                        onContentSizeChange={() => scrollRef.current?.scrollToEnd({ animated: true })}
+                        onScroll={handleScroll}
+                        onScrollBeginDrag={() => { userScrolledRef.current = true; }}
+                        scrollEventThrottle={200}
+                        maintainVisibleContentPosition={{ minIndexForVisible: 1 }}
+                        onContentSizeChange={() => {
+                            if (prependingRef.current) {
+                                prependingRef.current = false;
+                                return;
+                            }
+                            scrollRef.current?.scrollToEnd({ animated: true });
+                        }}
                     >
+                        {loadingOlder && (
+                            <ActivityIndicator size="small" color={COLORS.accent} />
+                        )}
                         {loading ? (
                             <View style={styles.loadingContainer}>
                                 <ActivityIndicator size="large" color={COLORS.accent} />
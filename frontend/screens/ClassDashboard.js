@@ -10,7 +10,7 @@ import BottomNav from '../components/BottomNav';
 export default function ClassDashboard() {
     const navigation = useNavigation();
     const route = useRoute();
-    const { user } = useAuth();
+    const { user, bootstrap } = useAuth();
     const [loading, setLoading] = useState(true);
     const [stats, setStats] = useState({ overall: 0, subjects: [] });
 
@@ -31,8 +31,11 @@ export default function ClassDashboard() {
 
             let targetId = currentClassId;
 
-            // If no classId passed (e.g. from Tab), fetch advisory class
-            if (!targetId) {
+            // If no classId passed (e.g. from Tab), use the advisory class from the login bootstrap
+            if (!targetId && bootstrap) {
+                targetId = bootstrap.advisory_class?.id || null;
+                if (targetId) setCurrentClassId(targetId);
+            } else if (!targetId) {
                 try {
                     const res = await api.get(`/teacher/my-advisory-class?user_id=${user.id}`);
                     if (res.data) {
@@ -46,6 +49,12 @@ export default function ClassDashboard() {
             }
 
             if (targetId) {
+                // Show the bootstrap stats straight away; the fetch revalidates them (usually a 304)
+                const cached = bootstrap?.stats?.[targetId];
+                if (cached) {
+                    setStats(cached);
+                    setLoading(false);
+                }
                 fetchClassStats(targetId);
             } else {
                 setLoading(false);
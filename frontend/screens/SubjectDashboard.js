@@ -6,6 +6,7 @@ import { COLORS, GLOBAL_STYLES } from '../styles/theme';
 import { useAuth } from '../context/AuthContext';
 import api from '../api';
 import CalendarView from '../components/CalendarView';
+import { subscribeToChannel } from '../services/live';
 
 const { width } = Dimensions.get('window');
 
@@ -78,6 +79,15 @@ export default function SubjectDashboard() {
     );
 
 
+    // Attendance marked elsewhere (chat, co-teachers) refreshes an open sheet
+    useEffect(() => {
+        return subscribeToChannel(classId, subjectId, (event) => {
+            if (event.type === 'attendance' || event.type === 'resync') {
+                setLastFetched(prev => ({ ...prev, sheet: null }));
+            }
+        });
+    }, [classId, subjectId]);
+
     const fetchAttendanceSheet = async () => {
         setLoading(true);
         try {
@@ -9,9 +9,9 @@ import BottomNav from '../components/BottomNav';
 
 export default function TeacherHome() {
     const navigation = useNavigation();
-    const { user } = useAuth();
-    const [classes, setClasses] = useState([]);
-    const [loading, setLoading] = useState(true);
+    const { user, bootstrap, loadBootstrap } = useAuth();
+    const [classes, setClasses] = useState(bootstrap?.classes || []);
+    const [loading, setLoading] = useState(!bootstrap);
 
     useEffect(() => {
         const fetchClasses = async () => {
@@ -21,9 +21,15 @@ export default function TeacherHome() {
                 return;
             }
             try {
-                const response = await api.get(`/teacher/my-classes?user_id=${user.id}`);
-                console.log("TeacherHome: API Response:", JSON.stringify(response.data, null, 2));
-                setClasses(response.data);
+                // Show the bootstrap fetched at login straight away, then revalidate it:
+                // its ETag makes this an empty 304 unless one of the classes changed
+                const data = await loadBootstrap(user.id);
+                if (data) {
+                    setClasses(data.classes);
+                } else {
+                    const response = await api.get(`/teacher/my-classes?user_id=${user.id}`);
+                    setClasses(response.data);
+                }
             } catch (error) {
                 console.error('TeacherHome: Failed to fetch teacher classes:', error);
             } finally {
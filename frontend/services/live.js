@@ -0,0 +1,46 @@
+import api from '../api';
+
+// Live updates for one class/subject channel over the backend WebSocket
+// (/ws/{classId}/{subjectId}). Events are JSON objects with a `type` of
+// 'message', 'attendance' or 'resync'; 'resync' means updates were missed
+// and the screen should re-fetch. Reconnects with backoff until unsubscribed.
+export function subscribeToChannel(classId, subjectId, onEvent) {
+    const url = `${api.defaults.baseURL.replace(/^http/, 'ws')}/ws/${classId}/${subjectId}`;
+    let socket = null;
+    let closed = false;
+    let retryDelay = 1000;
+    let retryTimer = null;
+    let dropped = false;
+
+    const connect = () => {
+        socket = new WebSocket(url);
+        socket.onopen = () => {
+            retryDelay = 1000;
+            if (dropped) {
+                // Anything sent while disconnected was missed
+                dropped = false;
+                onEvent({ type: 'resync' });
+            }
+        };
+        socket.onmessage = (e) => {
+            try {
+                onEvent(JSON.parse(e.data));
+            } catch (error) {
+                console.error('Bad live event:', error);
+            }
+        };
+        socket.onclose = () => {
+            if (closed) return;
+            dropped = true;
+            retryTimer = setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        };
+    };
+
+    connect();
+    return () => {
+        closed = true;
+        clearTimeout(retryTimer);
+        socket?.close();
+    };
+}